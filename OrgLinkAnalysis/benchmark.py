@@ -0,0 +1,148 @@
+# Benchmark the pipeline stages on synthetic org networks (see generate.py) of growing size:
+# ingestion, sub-graph extraction, layout, every analysis family on every graph, and rendering.
+# Each stage is measured as in a run (see instrument.py): wall and CPU time, peak resident
+# memory and, with --memory, its peak traced memory (tracing slows the stage down, so compare
+# times of runs with the same setting).
+# Results are appended to ./output/benchmarks.jsonl, and each stage is compared with the
+# previous run of the same size, so regressions show up.
+# Usage: python benchmark.py --sizes 1000 10000 --memory
+import argparse
+from compact import CompactGraph
+from datetime import datetime
+import generate
+import ingest
+import instrument
+from itertools import chain
+import json
+from layout import LayoutService
+import os
+from partition import LazySubgraphs
+import platform
+import render
+import report
+import subprocess
+import tempfile
+import networkx as graph
+
+BENCHMARK_SIZES = [1000, 10000, 100000, 1000000]
+BENCHMARK_INPUT_DIRECTORY = './output/benchmark-input'
+BENCHMARK_FILE = './output/benchmarks.jsonl'
+# stages are skipped above these numbers of nodes, where they would run for hours
+STAGE_MAX_NODES = {'layout': 100000, 'analyze': 100000, 'render': 100000}
+REGRESSION_THRESHOLD = 1.2  # flag stages this many times slower than in the previous run
+
+
+# the input files of a synthetic network with number_of_nodes nodes, generated once and reused
+def benchmark_input(number_of_nodes, input_directory=BENCHMARK_INPUT_DIRECTORY):
+    directory = os.path.join(input_directory, f'{number_of_nodes}-nodes-seed-{generate.GENERATOR_SEED}')
+    files = tuple(os.path.join(directory, name) for name in ('node.csv', 'link.csv', 'relationship.csv'))
+    if not all(os.path.exists(file) for file in files):
+        files = generate.write_network(directory, number_of_nodes)
+    return files
+
+
+# benchmark every stage on a network of number_of_nodes nodes; returns one record per stage
+# (and per graph and analysis family)
+def benchmark_size(number_of_nodes, trace_memory=False, stages=None):
+    instrument.TRACE_MEMORY = trace_memory
+    records = []
+
+    def run_stage(stage, network_name, function):
+        if stages is not None and not any(stage == name or stage.startswith(name + ' ') for name in stages):
+            return None
+        if number_of_nodes > STAGE_MAX_NODES.get(stage.split(' ')[0], number_of_nodes):
+            return None
+        with instrument.measure(stage, network_name, records) as record:
+            result = function()
+        print(f'{number_of_nodes:>9} nodes  {stage:<40} {network_name:<14} {record["wall"]:10.3f} s')
+        return result
+
+    node_file, link_file, relationship_file = benchmark_input(number_of_nodes)
+    nodes, links, original_graph, mixed_graph = \
+        run_stage('ingest', 'Mixed Graph', lambda: ingest.load_graphs(node_file, link_file, relationship_file)) or \
+        ingest.load_graphs(node_file, link_file, relationship_file)
+    run_stage('ingest (compact)', 'Mixed Graph', lambda: CompactGraph.from_csv(node_file, link_file, relationship_file))
+
+    subgraphs = LazySubgraphs(original_graph, links)
+    networks = [('Mixed Graph', mixed_graph)]
+    for link in subgraphs:
+        networks.append((link, run_stage('subgraph', link, lambda: subgraphs[link]) or subgraphs[link]))
+
+    pos = run_stage('layout', 'Mixed Graph', lambda: LayoutService(layout_file=None).layout(graph, mixed_graph))
+
+    for network_name, graph_to_analyze in networks:
+        graph_type = report.get_graph_type(graph_to_analyze)
+        context = report.AnalysisContext(graph, graph_to_analyze)  # shared by the families, as in a run
+        for section_header, report_title, analyze_function in report.ANALYSIS_FAMILIES:
+            run_stage(f'analyze {analyze_function.__name__}', network_name,
+                      lambda: analyze_function(graph, graph_type, graph_to_analyze, context=context))
+
+    if pos is not None:
+        with tempfile.TemporaryDirectory() as image_directory:
+            for network_name, graph_to_render in networks:
+                image_file = os.path.join(image_directory, 'image.png')
+                run_stage('render', network_name,
+                          lambda: render.render_graph(report.get_graph_type(graph_to_render), graph_to_render,
+                                                      network_name, pos, [image_file]))
+
+    for record in records:
+        record.update(nodes=number_of_nodes, edges=original_graph.number_of_edges())
+    return records
+
+
+# the records of the most recent earlier run, keyed by (nodes, stage, graph)
+def previous_records(benchmark_file=BENCHMARK_FILE):
+    if not os.path.exists(benchmark_file):
+        return {}
+
+    previous = {}
+    with open(benchmark_file) as benchmark_input_file:
+        for line in benchmark_input_file:
+            record = json.loads(line)
+            previous[(record['nodes'], record['stage'], record['graph'])] = record
+    return previous
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# run the benchmarks, store the records and print the stages that got slower
+def run_benchmarks(sizes=None, trace_memory=False, stages=None, benchmark_file=BENCHMARK_FILE):
+    sizes = BENCHMARK_SIZES if sizes is None else sizes
+    previous = previous_records(benchmark_file)
+    run = {'run': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+           'python': platform.python_version(), 'memory_traced': trace_memory}
+
+    records = list(chain.from_iterable(benchmark_size(number_of_nodes, trace_memory, stages)
+                                       for number_of_nodes in sizes))
+    run['run_peak_rss'] = instrument.peak_rss()  # of the whole run, in bytes
+
+    os.makedirs(os.path.dirname(benchmark_file), exist_ok=True)
+    with open(benchmark_file, 'a') as benchmark_output:
+        for record in records:
+            benchmark_output.write(json.dumps(dict(run, **record)) + '\n')
+
+    for record in records:
+        earlier = previous.get((record['nodes'], record['stage'], record['graph']))
+        if earlier is not None and earlier['memory_traced'] == trace_memory and \
+                record['wall'] > REGRESSION_THRESHOLD * earlier['wall']:
+            print(f'slower: {record["nodes"]} nodes, {record["stage"]} ({record["graph"]}): '
+                  f'{earlier["wall"]:.3f} s at {earlier["commit"]} -> {record["wall"]:.3f} s')
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time (and memory-profile) each pipeline stage.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES, help='numbers of nodes')
+    parser.add_argument('--memory', action='store_true', help='also measure peak memory (slower)')
+    parser.add_argument('--stages', nargs='+', help='only these stages (e.g. ingest subgraph "analyze '
+                                                     'analyze_centrality" layout render)')
+    parser.add_argument('--output', default=BENCHMARK_FILE)
+    arguments = parser.parse_args()
+
+    run_benchmarks(arguments.sizes, arguments.memory, arguments.stages, arguments.output)
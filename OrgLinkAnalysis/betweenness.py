@@ -0,0 +1,108 @@
+# Parallel betweenness centrality: Brandes' algorithm is a sum of per-source dependency
+# vectors, so the source nodes are split into chunks, each chunk is accumulated in a
+# worker process and the partial vectors are summed before the networkx rescaling.
+# The per-source steps follow networkx (3.x) step by step, so the sums match its results; they
+# are written out here rather than imported, as networkx keeps them private
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import numpy as np
+
+# number of worker processes for betweenness
+BETWEENNESS_WORKERS = os.cpu_count() or 1
+# number of source chunks per worker (more chunks balance uneven BFS costs)
+CHUNKS_PER_WORKER = 4
+
+# fork where available, so workers share the graph with this process instead of receiving a copy
+POOL_CONTEXT = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+# the graph of the running computation, set once per worker process
+shared_graph = None
+
+
+def share_graph(graph_to_share):
+    global shared_graph
+    shared_graph = graph_to_share
+
+
+# breadth-first search from source, counting shortest paths (Brandes): the nodes in order of
+# distance, the predecessors of each node on its shortest paths and the number of those paths
+def shortest_paths(graph_to_search, source):
+    order = []
+    predecessors = {node: [] for node in graph_to_search}
+    path_counts = dict.fromkeys(graph_to_search, 0.0)
+    path_counts[source] = 1.0
+    distance = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        next_distance = distance[node] + 1
+        node_path_count = path_counts[node]
+        for neighbor in graph_to_search[node]:
+            if neighbor not in distance:
+                queue.append(neighbor)
+                distance[neighbor] = next_distance
+            if distance[neighbor] == next_distance:
+                path_counts[neighbor] += node_path_count
+                predecessors[neighbor].append(node)
+    return order, predecessors, path_counts
+
+
+# add the dependencies of source on every other node to betweenness, farthest nodes first
+def accumulate_dependencies(betweenness, order, predecessors, path_counts, source):
+    dependency = dict.fromkeys(order, 0)
+    while order:
+        node = order.pop()
+        coefficient = (1 + dependency[node]) / path_counts[node]
+        for predecessor in predecessors[node]:
+            dependency[predecessor] += path_counts[predecessor] * coefficient
+        if node != source:
+            betweenness[node] += dependency[node]
+    return betweenness
+
+
+# un-normalized dependency sums of a chunk of source nodes, in the node order of the graph;
+# works for Graph, DiGraph and MultiDiGraph (parallel edges count once, as in networkx)
+def accumulate_chunk(sources):
+    partial_betweenness = dict.fromkeys(shared_graph, 0.0)
+    for source in sources:
+        order, predecessors, path_counts = shortest_paths(shared_graph, source)
+        partial_betweenness = accumulate_dependencies(partial_betweenness, order, predecessors, path_counts, source)
+
+    return np.fromiter(partial_betweenness.values(), dtype=np.float64, count=len(partial_betweenness))
+
+
+# rescale the summed dependencies exactly like networkx.betweenness_centrality(k=None, endpoints=False)
+def rescale(betweenness, number_of_nodes, normalized, directed):
+    if normalized:
+        if number_of_nodes > 2:
+            betweenness *= 1 / ((number_of_nodes - 1) * (number_of_nodes - 2))
+    elif not directed:
+        betweenness *= 0.5  # each unordered pair {s, t} was counted as (s, t) and (t, s)
+
+    return betweenness
+
+
+# exact (unweighted) betweenness centrality of all nodes, computed across worker processes;
+# runs in this process if it is a worker itself (no nested pools) or workers is 1
+def parallel_betweenness_centrality(graph_to_analyze, normalized=True, workers=None):
+    workers = BETWEENNESS_WORKERS if workers is None else workers
+    nodes = list(graph_to_analyze)
+
+    if workers <= 1 or multiprocessing.parent_process() is not None or len(nodes) < 2 * workers:
+        share_graph(graph_to_analyze)
+        betweenness = accumulate_chunk(nodes)
+        share_graph(None)
+    else:
+        number_of_chunks = min(len(nodes), workers * CHUNKS_PER_WORKER)
+        chunks = [nodes[chunk::number_of_chunks] for chunk in range(number_of_chunks)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT,
+                                 initializer=share_graph, initargs=(graph_to_analyze,)) as executor:
+            betweenness = np.zeros(len(nodes))
+            for partial_betweenness in executor.map(accumulate_chunk, chunks):
+                betweenness += partial_betweenness
+
+    betweenness = rescale(betweenness, len(nodes), normalized, graph_to_analyze.is_directed())
+    return dict(zip(nodes, betweenness.tolist()))
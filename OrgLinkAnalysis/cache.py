@@ -0,0 +1,147 @@
+# Content-addressed on-disk cache for analysis results and rendered images:
+# entries are keyed by a fingerprint of a (sub-)graph's nodes and edges plus the algorithm
+# and its parameters, so re-running after an input edit only redoes the graphs it changed.
+# The least recently used entries are evicted once the cache outgrows CACHE_MAX_BYTES; the size
+# is kept as a running total, so the directory is only scanned when that total is over the limit
+import hashlib
+import os
+import pickle
+import shutil
+
+CACHE_ENABLED = True
+CACHE_DIRECTORY = './output/.cache'
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+# eviction shrinks the cache to this share of CACHE_MAX_BYTES, so it runs once per many writes
+CACHE_EVICT_TO = 0.9
+
+
+# fingerprint of a graph: its type, nodes and edges with their data, in iteration order
+# (node data such as the entity objects is left out, only the labels count)
+def graph_fingerprint(graph_to_fingerprint):
+    digest = hashlib.sha256(type(graph_to_fingerprint).__name__.encode())
+    for node in graph_to_fingerprint:
+        digest.update(repr(node).encode())
+        digest.update(b'\0')
+    digest.update(b'\1')
+    for u, v, data in graph_to_fingerprint.edges(data=True):
+        digest.update(repr((u, v, sorted(data.items()))).encode())
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+# the settings of a module (its upper-case constants holding plain values), to key results on them
+def module_settings(module):
+    return {name: value for name, value in sorted(vars(module).items()) if name.isupper() and is_plain_value(value)}
+
+
+# the named settings of a module, to key results only on the settings that change them
+def named_settings(module, names):
+    return {name: getattr(module, name) for name in sorted(names)}
+
+
+# plain values have a stable repr across runs (unlike functions or other objects)
+def is_plain_value(value):
+    if isinstance(value, (bool, int, float, str, type(None))):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(is_plain_value(item) for item in value)
+    if isinstance(value, dict):
+        return all(is_plain_value(key) and is_plain_value(item) for key, item in value.items())
+    return False
+
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIRECTORY, max_bytes=CACHE_MAX_BYTES, enabled=CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.__total_bytes = None  # of the entries, scanned on the first write
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    # cache key from any number of parts (fingerprints, algorithm names, parameters)
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def __path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    # return (True, value) for a cached result, (False, None) otherwise
+    def get(self, key):
+        if not self.enabled:
+            return False, None
+
+        path = self.__path(key, '.pickle')
+        try:
+            with open(path, 'rb') as cache_file:
+                value = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False, None
+
+        os.utime(path)  # mark as recently used
+        return True, value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+
+        path = self.__path(key, '.pickle')
+        with open(path + '.tmp', 'wb') as cache_file:
+            pickle.dump(value, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.__replace(path + '.tmp', path)
+
+    # copy a cached file (e.g. a rendered image) to target_file; False if not cached
+    def restore_file(self, key, target_file):
+        if not self.enabled:
+            return False
+
+        path = self.__path(key, os.path.splitext(target_file)[1])
+        if not os.path.exists(path):
+            return False
+
+        shutil.copyfile(path, target_file)
+        os.utime(path)
+        return True
+
+    def store_file(self, key, source_file):
+        if not self.enabled or not os.path.exists(source_file):
+            return
+
+        path = self.__path(key, os.path.splitext(source_file)[1])
+        shutil.copyfile(source_file, path + '.tmp')
+        self.__replace(path + '.tmp', path)
+
+    # move a new entry in place (atomic, so readers never see half an entry), keeping the running
+    # total, and evict once the total is over max_bytes
+    def __replace(self, new_path, path):
+        if self.__total_bytes is None:
+            self.__total_bytes = self.__scan_bytes()
+        self.__total_bytes += os.path.getsize(new_path)
+        if os.path.exists(path):
+            self.__total_bytes -= os.path.getsize(path)
+        os.replace(new_path, path)
+        if self.__total_bytes > self.max_bytes:
+            self.evict()
+
+    def __scan_bytes(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                   if entry.is_file() and not entry.name.endswith('.tmp'))
+
+    # drop the least recently used entries until the cache fits in CACHE_EVICT_TO of max_bytes
+    # (scanning the directory, which other runs may have written to as well)
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                entry_stat = entry.stat()
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+
+        total_bytes = sum(size for used, size, path in entries)
+        for used, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes * CACHE_EVICT_TO:
+                break
+            os.remove(path)
+            total_bytes -= size
+        self.__total_bytes = total_bytes
@@ -0,0 +1,210 @@
+# Community detection on a CSR weighted adjacency matrix (see spectral.weighted_adjacency):
+# label propagation and Louvain-style modularity optimization, both vectorized with numpy over
+# all nodes at once, so that million-node graphs take minutes. Directed edges are taken as
+# undirected, parallel edges are summed by their Link weights and non-positive weights ignored.
+# Communities are arrays of labels, one per node (row) of the matrix
+import numpy as np
+import scipy.sparse as sparse
+
+COMMUNITY_SEED = 42
+# Louvain: the resolution of modularity (above 1 favors smaller communities), and the smallest
+# modularity gain for which another round of moves or another level is worth it
+COMMUNITY_RESOLUTION = 1.0
+MODULARITY_TOLERANCE = 1e-7
+# rounds of moves per level (Louvain) or in all (label propagation)
+MAX_COMMUNITY_ROUNDS = 100
+# share of the nodes that may move in a round: moving all nodes at once can swap labels back
+# and forth between neighbors indefinitely
+MOVE_FRACTION = 0.5
+
+
+# the symmetric matrix of edge weights between nodes: directed adjacency plus its transpose,
+# without non-positive entries
+def undirected_weights(adjacency, directed=True):
+    weights = (adjacency + adjacency.T) if directed else adjacency.copy()
+    weights = sparse.csr_matrix(weights, dtype=np.float64)
+    weights.data[weights.data < 0] = 0
+    weights.eliminate_zeros()
+    return weights
+
+
+# the weights of the off-diagonal entries (rows, columns, weights) of a symmetric matrix
+def off_diagonal(weights):
+    entries = weights.tocoo()
+    mask = entries.row != entries.col
+    return entries.row[mask], entries.col[mask], entries.data[mask]
+
+
+# the total weight from each row to each label: a csr matrix of rows x labels
+def label_weights(rows, columns, data, labels, number_of_rows):
+    return sparse.csr_matrix((data, (rows, labels[columns])), shape=(number_of_rows, number_of_rows))
+
+
+# for each row of a csr matrix with a score per entry, (best column, best score); rows without
+# entries get column -1 and score -inf. Ties go to the lowest tie_break value (or column);
+# tie_break values must differ within a row
+def row_best(matrix, scores, tie_break=None):
+    number_of_rows = matrix.shape[0]
+    entries_per_row = np.diff(matrix.indptr)
+    rows = np.repeat(np.arange(number_of_rows), entries_per_row)
+    best_column = np.full(number_of_rows, -1, dtype=np.int64)
+    best_score = np.full(number_of_rows, -np.inf)
+    if len(scores) > 0:
+        starts = matrix.indptr[:-1][entries_per_row > 0]
+        best_score[entries_per_row > 0] = np.maximum.reduceat(scores, starts)
+        tie_break = matrix.indices if tie_break is None else tie_break
+        tied = np.where(scores == best_score[rows], tie_break, np.inf)
+        first_tie = np.full(number_of_rows, np.inf)
+        first_tie[entries_per_row > 0] = np.minimum.reduceat(tied, starts)
+        best = np.flatnonzero(tied == first_tie[rows])
+        best_column[rows[best]] = matrix.indices[best]
+    return best_column, best_score
+
+
+# modularity of the given labels: the share of the weight inside communities, minus the share
+# expected if edges were placed at random, keeping the node strengths (as networkx computes it
+# for undirected graphs)
+def modularity(weights, labels, resolution=COMMUNITY_RESOLUTION):
+    total_weight = weights.sum()
+    if total_weight <= 0:
+        return 0.0
+    entries = weights.tocoo()
+    inside = entries.data[labels[entries.row] == labels[entries.col]].sum()
+    strength = np.bincount(labels, weights=np.asarray(weights.sum(axis=1)).ravel())
+    return float(inside / total_weight - resolution * np.sum((strength / total_weight) ** 2))
+
+
+# label propagation: every node starts in a community of its own, then repeatedly takes the
+# label with the largest total weight among its neighbors (ties broken at random), until no
+# node can improve. Only a random share (MOVE_FRACTION) of the nodes moves in a round
+def label_propagation(weights, seed=COMMUNITY_SEED, max_rounds=MAX_COMMUNITY_ROUNDS):
+    number_of_nodes = weights.shape[0]
+    random = np.random.default_rng(seed)
+    rows, columns, data = off_diagonal(weights)
+    labels = np.arange(number_of_nodes)
+    for _ in range(max_rounds):
+        by_label = label_weights(rows, columns, data, labels, number_of_nodes)
+        best_label, best_weight = row_best(by_label, by_label.data, random.random(len(by_label.data)))
+        own_weight = np.bincount(rows, weights=data * (labels[rows] == labels[columns]), minlength=number_of_nodes)
+        improving = best_weight > own_weight
+        if not improving.any():
+            break
+        moving = improving & (random.random(number_of_nodes) < MOVE_FRACTION)
+        labels = np.where(moving, best_label, labels)
+    return np.unique(labels, return_inverse=True)[1]
+
+
+# one level of Louvain: starting from singletons, nodes move to the neighboring community that
+# gains the most modularity. Moves are decided for all nodes at once and a random share of them
+# taken, always including the best one (alone, it surely gains); a round that does not gain is
+# undone and the share halved
+def move_nodes(weights, resolution, random, max_rounds=MAX_COMMUNITY_ROUNDS):
+    number_of_nodes = weights.shape[0]
+    strength = np.asarray(weights.sum(axis=1)).ravel()
+    total_weight = strength.sum()
+    rows, columns, data = off_diagonal(weights)
+
+    labels = np.arange(number_of_nodes)
+    current = modularity(weights, labels, resolution)
+    if total_weight <= 0:  # no edges to gain from
+        return labels, current
+    move_fraction = MOVE_FRACTION
+    for _ in range(max_rounds):
+        community_strength = np.bincount(labels, weights=strength, minlength=number_of_nodes)
+        by_label = label_weights(rows, columns, data, labels, number_of_nodes)
+
+        # modularity gain (times total_weight) of joining each neighboring community,
+        # and of staying, with the node taken out of its own community first
+        label_rows = np.repeat(np.arange(number_of_nodes), np.diff(by_label.indptr))
+        scores = by_label.data - resolution * strength[label_rows] * community_strength[by_label.indices] / total_weight
+        scores[by_label.indices == labels[label_rows]] = -np.inf
+        best_label, best_score = row_best(by_label, scores)
+        own_weight = np.bincount(rows, weights=data * (labels[rows] == labels[columns]), minlength=number_of_nodes)
+        own_score = own_weight - resolution * strength * (community_strength[labels] - strength) / total_weight
+
+        gain = best_score - own_score
+        improving = gain > MODULARITY_TOLERANCE * total_weight
+        if not improving.any():
+            break
+        moving = improving & (random.random(number_of_nodes) < move_fraction)
+        moving[np.argmax(gain)] = True
+        candidate = np.where(moving, best_label, labels)
+        candidate_modularity = modularity(weights, candidate, resolution)
+        if candidate_modularity > current:
+            modularity_gain = candidate_modularity - current
+            labels, current = candidate, candidate_modularity
+            if modularity_gain < MODULARITY_TOLERANCE:
+                break
+        else:
+            move_fraction /= 2
+
+    return np.unique(labels, return_inverse=True)[1], current
+
+
+# Louvain modularity optimization: move nodes (move_nodes), merge each community into one node
+# of a smaller weighted graph, and repeat on it while modularity improves.
+# Returns (labels, modularity, number of levels)
+def louvain(weights, resolution=COMMUNITY_RESOLUTION, seed=COMMUNITY_SEED):
+    random = np.random.default_rng(seed)
+    labels = np.arange(weights.shape[0])
+    current = modularity(weights, labels, resolution)
+    levels = 0
+    while weights.shape[0] > 1:
+        level_labels, level_modularity = move_nodes(weights, resolution, random)
+        if level_modularity - current < MODULARITY_TOLERANCE:
+            break
+        labels, current = level_labels[labels], level_modularity
+        levels += 1
+
+        # one node per community, weighted by all the weight between (and inside) communities
+        membership = sparse.csr_matrix((np.ones(len(level_labels)), (np.arange(len(level_labels)), level_labels)))
+        weights = (membership.T @ weights @ membership).tocsr()
+    return labels, current, levels
+
+
+# the communities of labels as sets of nodes, largest first
+def node_sets(nodes, labels):
+    communities = [set() for _ in range(labels.max() + 1 if len(labels) > 0 else 0)]
+    for node, label in zip(nodes, labels.tolist()):
+        communities[label].add(node)
+    return sorted(communities, key=len, reverse=True)
+
+
+# how alike two partitions of (partly) the same nodes are, over the nodes in both: normalized
+# mutual information (arithmetic mean normalization) and the adjusted Rand index, both 1 for
+# identical partitions and about 0 for unrelated ones. Partitions are lists of sets of nodes
+def partition_overlap(communities, other_communities):
+    label = {node: index for index, community in enumerate(communities) for node in community}
+    other_label = {node: index for index, community in enumerate(other_communities) for node in community}
+    common_nodes = [node for node in label if node in other_label]
+    overlap = {'common nodes': len(common_nodes), 'NMI': 0.0, 'ARI': 0.0}
+    if len(common_nodes) < 2:
+        return overlap
+
+    labels = np.unique([label[node] for node in common_nodes], return_inverse=True)[1]
+    other_labels = np.unique([other_label[node] for node in common_nodes], return_inverse=True)[1]
+    contingency = sparse.csr_matrix((np.ones(len(common_nodes)), (labels, other_labels)))
+    contingency.sum_duplicates()
+    sizes = np.asarray(contingency.sum(axis=1)).ravel()
+    other_sizes = np.asarray(contingency.sum(axis=0)).ravel()
+    number_of_nodes = len(common_nodes)
+
+    # normalized mutual information
+    entries = contingency.tocoo()
+    mutual_information = np.sum(entries.data / number_of_nodes *
+                                np.log(entries.data * number_of_nodes / (sizes[entries.row] * other_sizes[entries.col])))
+    entropy = -np.sum(sizes / number_of_nodes * np.log(sizes / number_of_nodes))
+    other_entropy = -np.sum(other_sizes / number_of_nodes * np.log(other_sizes / number_of_nodes))
+    if entropy + other_entropy > 0:
+        overlap['NMI'] = float(max(0.0, mutual_information) / ((entropy + other_entropy) / 2))
+    else:
+        overlap['NMI'] = 1.0  # both a single community
+
+    # adjusted Rand index, from the pairs of nodes put together
+    def pairs(counts):
+        return np.sum(counts * (counts - 1) / 2)
+    together, together_first, together_second = pairs(entries.data), pairs(sizes), pairs(other_sizes)
+    expected = together_first * together_second / pairs(np.array([number_of_nodes]))
+    maximum = (together_first + together_second) / 2
+    overlap['ARI'] = float((together - expected) / (maximum - expected)) if maximum != expected else 1.0
+    return overlap
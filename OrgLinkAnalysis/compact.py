@@ -0,0 +1,202 @@
+# Compact, array-backed representation of the organizational graph for very large inputs:
+# node and link labels are interned to integer ids and the input edges (relationships)
+# are held as CSR arrays sorted by source node:
+#   indptr[i]:indptr[i + 1] -- the slice of edges leaving node i
+#   indices                 -- target node id of each edge
+#   weight                  -- edge weight (the link weight)
+#   relationship            -- link id of each edge (index into link_labels)
+# networkx graphs are only built on demand, e.g. to run the analyze_* functions in report.py
+import ingest
+from mixed import MixedGraph
+from node import Node
+import networkx as graph
+import numpy as np
+import pandas as pd
+
+
+# map labels to integer ids, appending labels not seen before to the label table
+def intern_labels(labels, label_index):
+    codes = label_index.get_indexer(labels)
+    missing = codes < 0
+    if missing.any():
+        label_index = label_index.append(pd.Index(pd.unique(labels[missing])))
+        codes = label_index.get_indexer(labels)
+
+    return codes, label_index
+
+
+# the smallest of int16, int32 and int64 that holds the codes of number_of_labels labels
+def code_type(number_of_labels):
+    return next(dtype for dtype in (np.int16, np.int32, np.int64) if number_of_labels <= np.iinfo(dtype).max)
+
+
+class CompactGraph:
+    __slots__ = ('node_labels', 'node_ids', 'link_labels', 'link_directed', 'link_weights',
+                 'indptr', 'indices', 'weight', 'relationship')
+
+    def __init__(self, node_labels, node_ids, link_labels, link_directed, link_weights,
+                 sources, targets, relationships):
+        self.node_labels = np.asarray(node_labels, dtype=object)
+        self.node_ids = np.asarray(node_ids, dtype=object)
+        self.link_labels = np.asarray(link_labels, dtype=object)
+        self.link_directed = np.asarray(link_directed, dtype=bool)
+        self.link_weights = np.asarray(link_weights, dtype=np.float64)
+
+        # sort the edges by source; a stable sort keeps the input order of each node's edges
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        index_type = np.int32 if len(self.node_labels) < np.iinfo(np.int32).max else np.int64
+        self.indptr = np.zeros(len(self.node_labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.node_labels)), out=self.indptr[1:])
+        self.indices = np.asarray(targets, dtype=index_type)[order]
+        self.relationship = np.asarray(relationships, dtype=code_type(len(self.link_labels)))[order]
+        self.weight = self.link_weights[self.relationship].astype(np.float32)
+
+    # build from the csv inputs without going through networkx; pass a chunk_size
+    # to stream relationship files that do not fit in memory
+    @classmethod
+    def from_csv(cls, node_file=ingest.NODE_FILE, link_file=ingest.LINK_FILE,
+                 relationship_file=ingest.RELATIONSHIP_FILE, chunk_size=None):
+        node_df = pd.read_csv(node_file)
+        link_df = pd.read_csv(link_file).drop_duplicates(subset='Label', keep='first')
+
+        node_index = pd.Index(node_df['Label'])
+        link_index = pd.Index(link_df['Label'])
+        sources, targets, relationships = [], [], []
+        for relationship_df in ingest.read_relationships(relationship_file, chunk_size):
+            source_codes, node_index = intern_labels(relationship_df['Source'].to_numpy(), node_index)
+            target_codes, node_index = intern_labels(relationship_df['Target'].to_numpy(), node_index)
+            link_codes, link_index = intern_labels(relationship_df['Link'].to_numpy(), link_index)
+            sources.append(source_codes)
+            targets.append(target_codes)
+            relationships.append(link_codes)
+
+        # nodes and links only found in relationship.csv get no ID and the default link values
+        node_ids = node_df['ID'].tolist() + [None] * (len(node_index) - len(node_df))
+        missing_links = len(link_index) - len(link_df)
+        link_directed = link_df['Directed'].astype(bool).tolist() + [ingest.DEFAULT_DIRECTED] * missing_links
+        link_weights = link_df['Weight'].tolist() + [ingest.DEFAULT_WEIGHT] * missing_links
+
+        return cls(node_index, node_ids, link_index, link_directed, link_weights,
+                   np.concatenate(sources) if sources else [],
+                   np.concatenate(targets) if targets else [],
+                   np.concatenate(relationships) if relationships else [])
+
+    # build from the node and link objects and the original graph built by ingest.py
+    @classmethod
+    def from_networkx(cls, nodes, links, original_graph):
+        node_labels = [node.label for node in nodes]
+        node_ids = [node.get_attribute('ID') for node in nodes]
+        known_labels = set(node_labels)
+        node_labels += [node for node in original_graph if node not in known_labels]
+        node_ids += [None] * (len(node_labels) - len(node_ids))
+        node_code = {label: code for code, label in enumerate(node_labels)}
+
+        link_labels = list(dict.fromkeys(link.label for link in links))
+        first_link = {}
+        for link in links:
+            first_link.setdefault(link.label, link)
+        link_code = {label: code for code, label in enumerate(link_labels)}
+
+        sources, targets, relationships = [], [], []
+        for u, v, relationship in original_graph.edges(data='relationship'):
+            if relationship not in link_code:
+                link_code[relationship] = len(link_labels)
+                link_labels.append(relationship)
+            sources.append(node_code[u])
+            targets.append(node_code[v])
+            relationships.append(link_code[relationship])
+
+        link_directed = [first_link[label].directed if label in first_link else ingest.DEFAULT_DIRECTED
+                         for label in link_labels]
+        link_weights = [first_link[label].weight if label in first_link else ingest.DEFAULT_WEIGHT
+                        for label in link_labels]
+
+        return cls(node_labels, node_ids, link_labels, link_directed, link_weights,
+                   sources, targets, relationships)
+
+    def number_of_nodes(self):
+        return len(self.node_labels)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    # source node id of every edge, aligned with indices/weight/relationship
+    def sources(self):
+        return np.repeat(np.arange(self.number_of_nodes(), dtype=self.indices.dtype), np.diff(self.indptr))
+
+    # edges as (sources, targets, weights, relationship codes) arrays, normalized to directed
+    # (mixed) and/or restricted to one link label
+    def edge_arrays(self, relationship=None, mixed=False):
+        sources, targets = self.sources(), self.indices
+        weights, relationships = self.weight, self.relationship
+
+        if relationship is not None:
+            link_code = np.flatnonzero(self.link_labels == relationship)
+            selected = np.isin(relationships, link_code)
+            sources, targets = sources[selected], targets[selected]
+            weights, relationships = weights[selected], relationships[selected]
+
+        if mixed:  # an undirected edge becomes two directed edges
+            undirected = ~self.link_directed[relationships]
+            sources, targets = (np.concatenate([sources, targets[undirected]]),
+                                np.concatenate([targets, sources[undirected]]))
+            weights = np.concatenate([weights, weights[undirected]])
+            relationships = np.concatenate([relationships, relationships[undirected]])
+
+        return sources, targets, weights, relationships
+
+    # node degrees counted from the arrays, as in degree() of the mixed graph
+    def degree(self):
+        sources, targets, weights, relationships = self.edge_arrays(mixed=True)
+        return (np.bincount(sources, minlength=self.number_of_nodes()) +
+                np.bincount(targets, minlength=self.number_of_nodes()))
+
+    # sparse adjacency matrix (scipy csr) of the mixed graph or a relationship sub-graph;
+    # parallel edges are summed into one entry
+    def adjacency_matrix(self, relationship=None, weighted=True):
+        import scipy.sparse as sparse
+
+        mixed = relationship is None or not self.link_directed[self.link_labels == relationship].any()
+        sources, targets, weights, relationships = self.edge_arrays(relationship, mixed=mixed)
+        values = weights.astype(np.float64) if weighted else np.ones(len(sources))
+        size = self.number_of_nodes()
+        return sparse.csr_matrix((values, (sources, targets)), shape=(size, size))
+
+    # convert to networkx on demand:
+    # - relationship None: the mixed graph (a mixed.MixedGraph, all edges normalized to directed)
+    # - otherwise: the relationship sub-graph (Graph or DiGraph), as built by partition.py
+    def to_networkx(self, relationship=None):
+        if relationship is None:
+            mixed_graph = MixedGraph()
+            mixed_graph.add_nodes((label, {'entity': Node(label, ID=node_id)})
+                                  for label, node_id in zip(self.node_labels, self.node_ids))
+            sources, targets, weights, relationships = self.edge_arrays()
+            mixed_graph.add_links(self.node_labels[sources], self.node_labels[targets], self.link_labels[relationships],
+                                  self.link_weights[relationships], ~self.link_directed[relationships])
+            return mixed_graph
+
+        is_directed = bool(self.link_directed[self.link_labels == relationship].any())
+        sub_graph = graph.DiGraph() if is_directed else graph.Graph()
+        sources, targets, weights, relationships = self.edge_arrays(relationship)
+        node_codes = np.unique(np.concatenate([sources, targets]))
+        sub_graph.add_nodes_from(self.node_labels[node_codes].tolist())
+        sub_graph.add_edges_from(
+            (self.node_labels[u], self.node_labels[v],
+             {'directed': is_directed, 'weight': float(weight), 'relationship': relationship})
+            for u, v, weight in zip(sources.tolist(), targets.tolist(), self.link_weights[relationships].tolist()))
+        return sub_graph
+
+
+# run one of the analyze_* functions of report.py on a compact graph,
+# converting the mixed graph (or a relationship sub-graph) to networkx on demand
+def analyze(analyze_function, compact_graph, relationship=None):
+    networkx_graph = compact_graph.to_networkx(relationship)
+    if relationship is None:
+        graph_type = 'multi-digraph'
+    elif networkx_graph.is_directed():
+        graph_type = 'simple directed'
+    else:
+        graph_type = 'simple undirected'
+
+    return analyze_function(graph, graph_type, networkx_graph)
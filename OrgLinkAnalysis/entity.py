@@ -1,6 +1,8 @@
 # Superclass for nodes and links:
 
 class Entity:
+    # no per-instance __dict__: large org graphs hold millions of these
+    __slots__ = ('__label', '__attributes')
 
     # at min., we need a label, but allow for other named attributes
     # depending on organizational needs (**kwargs)
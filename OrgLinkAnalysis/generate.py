@@ -0,0 +1,90 @@
+# Synthetic org networks in the input csv format (node.csv, link.csv, relationship.csv), to
+# measure how the pipeline scales (see benchmark.py):
+# - scale-free degrees: each person gets a Pareto-distributed activity, and the ends of every
+#   relationship are drawn in proportion to it (a Chung-Lu graph), so a few hubs hold most links
+# - several directed and undirected link types, each with its share of the relationships
+# - parallel edges: a share of the related pairs is related again by another link type
+# Usage: python generate.py --nodes 10000 --output ./input/synthetic-10k
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# (label, directed, weight, share of the relationships)
+GENERATED_LINKS = [('Trust', 0, 5, 0.2),
+                   ('Advice', 1, 3, 0.3),
+                   ('Chat', 0, 0.5, 0.4),
+                   ('Reports To', 1, 1, 0.1)]
+AVERAGE_DEGREE = 8  # relationships per person, counting both ends
+DEGREE_EXPONENT = 2.5  # of the power-law degree distribution, P(k) ~ k^-exponent
+PARALLEL_EDGE_SHARE = 0.1  # share of the relationships that repeat a pair with another link
+GENERATOR_SEED = 42
+
+
+# person activities with a power-law tail of the given exponent (minimum 1)
+def activities(number_of_nodes, exponent, random_state):
+    return random_state.pareto(exponent - 1, number_of_nodes) + 1
+
+
+# the three input data frames of a synthetic network
+def generate_network(number_of_nodes, average_degree=AVERAGE_DEGREE, links=None, exponent=DEGREE_EXPONENT,
+                     parallel_edge_share=PARALLEL_EDGE_SHARE, seed=GENERATOR_SEED):
+    links = GENERATED_LINKS if links is None else links
+    random_state = np.random.default_rng(seed)
+
+    labels = np.array([f'Person {node_id}' for node_id in range(1, number_of_nodes + 1)], dtype=object)
+    node_df = pd.DataFrame({'ID': np.arange(1, number_of_nodes + 1), 'Label': labels})
+    link_df = pd.DataFrame({'ID': np.arange(1, len(links) + 1),
+                            'Label': [label for label, directed, weight, share in links],
+                            'Directed': [directed for label, directed, weight, share in links],
+                            'Weight': [weight for label, directed, weight, share in links]})
+
+    # distinct pairs, both ends drawn in proportion to activity, without self-loops
+    number_of_pairs = int(number_of_nodes * average_degree / 2 / (1 + parallel_edge_share))
+    probabilities = activities(number_of_nodes, exponent, random_state)
+    probabilities /= probabilities.sum()
+    sources = random_state.choice(number_of_nodes, number_of_pairs, p=probabilities)
+    targets = random_state.choice(number_of_nodes, number_of_pairs, p=probabilities)
+    pairs = np.unique(np.stack([sources, targets], axis=1)[sources != targets], axis=0)
+    pairs = random_state.permutation(pairs)
+
+    shares = np.array([share for label, directed, weight, share in links], dtype=np.float64)
+    link_codes = random_state.choice(len(links), len(pairs), p=shares / shares.sum())
+
+    # parallel edges: repeat some pairs with the next link type
+    repeated = random_state.random(len(pairs)) < parallel_edge_share
+    pairs = np.concatenate([pairs, pairs[repeated]])
+    link_codes = np.concatenate([link_codes, (link_codes[repeated] + 1) % len(links)])
+
+    link_labels = link_df['Label'].to_numpy(dtype=object)
+    relationship_df = pd.DataFrame({'Source': labels[pairs[:, 0]],
+                                    'Target': labels[pairs[:, 1]],
+                                    'Link': link_labels[link_codes]})
+    return node_df, link_df, relationship_df
+
+
+# write a synthetic network to node.csv, link.csv and relationship.csv in output_directory;
+# returns the three file paths
+def write_network(output_directory, number_of_nodes, **network_options):
+    os.makedirs(output_directory, exist_ok=True)
+    node_df, link_df, relationship_df = generate_network(number_of_nodes, **network_options)
+
+    files = tuple(os.path.join(output_directory, name) for name in ('node.csv', 'link.csv', 'relationship.csv'))
+    for data_frame, file in zip((node_df, link_df, relationship_df), files):
+        data_frame.to_csv(file, index=False)
+    return files
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic org network as input csv files.')
+    parser.add_argument('--nodes', type=int, default=1000)
+    parser.add_argument('--average-degree', type=float, default=AVERAGE_DEGREE)
+    parser.add_argument('--exponent', type=float, default=DEGREE_EXPONENT)
+    parser.add_argument('--parallel-edge-share', type=float, default=PARALLEL_EDGE_SHARE)
+    parser.add_argument('--seed', type=int, default=GENERATOR_SEED)
+    parser.add_argument('--output', default='./input/synthetic')
+    arguments = parser.parse_args()
+
+    write_network(arguments.output, arguments.nodes, average_degree=arguments.average_degree,
+                  exponent=arguments.exponent, parallel_edge_share=arguments.parallel_edge_share,
+                  seed=arguments.seed)
@@ -1,7 +1,28 @@
 # functions to visualize graphs via matplotlib (static) and plotly (dynamic)
+from matplotlib.collections import LineCollection, PolyCollection
+import heapq
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 import numpy as np
+from layout import LayoutService
+
+
+IMAGE_DIRECTORY = './output'
+
+
+# the png file of a graph's static visualization (also linked from the report)
+def image_file_path(graph_to_draw, network_name, image_directory=IMAGE_DIRECTORY):
+    image_file_name = str(graph_to_draw).replace(' ', '-')
+    image_file_name = network_name.replace(' ', '-') + '-' + image_file_name
+    return f'{image_directory}/{image_file_name}.png'
+
+
+# node positions of a graph: the given positions (normally the shared layout of the mixed
+# graph), or else the saved shared layout, extended to this graph's nodes if needed
+def shared_positions(graph, graph_to_draw, pos=None):
+    if pos is None:
+        pos = LayoutService().layout(graph, graph_to_draw)
+    return {node: pos[node] for node in graph_to_draw}
 
 
 # function to return a dictionary of (u, v) node tuples and the number between them
@@ -20,162 +41,254 @@ def number_of_edges_u_v(mixed_graph):
     return num_edges_d
 
 
-# static multi/multidigraph visualization via matplotlib:
-def build_static_multi_network(graph, mixed_graph, graph_type, network_name):
-    plt.figure(figsize=(8, 8))
-
-    # Draw nodes with node labels
-    pos = graph.fruchterman_reingold_layout(mixed_graph)  # node positions (dict.) after layout
-    round_node_size = 1000  # needed for later when we draw edges that extend to the circumference
-    graph.draw_networkx_nodes(mixed_graph, pos,
-                              node_color='orange', node_size=round_node_size,
+# batched static rendering: all edges go into one LineCollection and all arrowheads into one
+# PolyCollection, instead of one matplotlib artist per edge. Each label is still an artist of its
+# own, so at most STATIC_NODE_LABEL_LIMIT nodes are labelled (those of highest degree), and at most
+# EDGE_LABEL_LIMIT edges among them
+EDGE_LABEL_LIMIT = 200
+STATIC_NODE_LABEL_LIMIT = 200
+NODE_LABEL_LIMIT = 2000  # for the dynamic view, whose labels are all in one trace
+BEZIER_SAMPLES = 16  # points per drawn edge (straight edges need only 2)
+ROUND_NODE_SIZE = 1000  # in points^2, needed when we draw edges that extend to the circumference
+ARROW_LENGTH = 12  # in points
+FIGURE_SIZE = (8, 8)
+FIGURE_DPI = 100
+
+
+# quadratic Bézier curves for arrays of edges, with matplotlib's "arc3,rad" control points,
+# trimmed by trim_start/trim_end (in data units) at both ends; returns (edges, samples, 2)
+def bezier_curves(start_points, end_points, rad, trim_start, trim_end, samples):
+    delta = end_points - start_points
+    control_points = (start_points + end_points) / 2 + rad[:, None] * np.stack([delta[:, 1], -delta[:, 0]], axis=1)
+
+    chord = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-12)
+    t_start = np.clip(trim_start / chord, 0, 0.45)
+    t_end = np.clip(1 - trim_end / chord, 0.55, 1)
+    t = t_start[:, None] + (t_end - t_start)[:, None] * np.linspace(0, 1, samples)[None, :]
+    t = t[:, :, None]
+    return ((1 - t) ** 2 * start_points[:, None, :] + 2 * (1 - t) * t * control_points[:, None, :] +
+            t ** 2 * end_points[:, None, :])
+
+
+# triangular arrowheads at the ends of the curves, pointing along their last segment
+def arrowheads(curves, arrow_length):
+    tips = curves[:, -1, :]
+    direction = tips - curves[:, -2, :]
+    direction /= np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-12)[:, None]
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+    base = tips - arrow_length * direction
+    return np.stack([tips, base + 0.35 * arrow_length * normal, base - 0.35 * arrow_length * normal], axis=1)
+
+
+# data units per typographic point along x, once the axes limits are set
+def data_units_per_point(ax):
+    x_min, x_max = ax.get_xlim()
+    return (x_max - x_min) / (ax.get_window_extent().width * 72 / ax.figure.dpi)
+
+
+# the nodes to label: all of them, or the limit (by default STATIC_NODE_LABEL_LIMIT) nodes of
+# highest degree
+def labelled_nodes(graph_to_draw, limit=None):
+    limit = STATIC_NODE_LABEL_LIMIT if limit is None else limit
+    if graph_to_draw.number_of_nodes() <= limit:
+        return set(graph_to_draw)
+    degrees = graph_to_draw.degree()
+    return set(heapq.nlargest(limit, graph_to_draw, key=degrees.__getitem__))
+
+
+# set up a figure with the nodes (one scatter collection) and the given node labels, axes fitted to pos
+def draw_static_nodes(graph, graph_to_draw, pos, node_labels):
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE, dpi=FIGURE_DPI)
+
+    graph.draw_networkx_nodes(graph_to_draw, pos, ax=ax,
+                              node_color='orange', node_size=ROUND_NODE_SIZE,
                               node_shape='o', alpha=0.8)
-    node_labels = {node: node1.label for node, node1 in mixed_graph.nodes(data='entity')}
-    graph.draw_networkx_labels(mixed_graph, pos,
+    graph.draw_networkx_labels(graph_to_draw, pos, ax=ax,
                                labels=node_labels,
                                font_size=10, font_color='black')
 
-    # Draw edges, such that any multiple edges between two nodes are discernible
-    for u, v, key, data in mixed_graph.edges(data=True, keys=True):
-        # Retrieve the number of edges (ignoring direction) between
-        # u and v from preprocessed dictionary num_edges_d
-        num_edges = number_of_edges_u_v(mixed_graph).get((u, v), 0)  # return 0 if no edges
-
-        if num_edges == 1:  # these are the originally input directed edges
-            graph.draw_networkx_edges(mixed_graph, pos, edgelist=[(u, v, key)],
-                                      style="solid", edge_color='gray',
-                                      node_size=round_node_size, width=data['weight'],
-                                      connectionstyle=f"arc3,rad=0.1")
-            edge_labels = {(u, v, key): data['relationship']}
-            graph.draw_networkx_edge_labels(mixed_graph, pos, edge_labels=edge_labels,
-                                            font_size=7, font_color='black')
-        elif num_edges > 1:  # multiple edges between u and v
-            # gather into the edge_list all the edge keys from the graph:
-            edge_list = [(u, v, key) for key in mixed_graph[u][v]]
-
-            # for each edge/key tuple from the edge_list, draw the edge arc in a way
-            # that tries to eliminate overlays, using variable arc_style radians
-            for i, (source, target, edge_key) in enumerate(edge_list):
-                arc_style = 0.1 + 0.4 * (i / num_edges)
-                graph.draw_networkx_edges(mixed_graph, pos, edgelist=[(source, target, edge_key)],
-                                          style="solid", edge_color='gray',
-                                          node_size=round_node_size, width=data['weight'],
-                                          connectionstyle=f"arc3,rad={arc_style}")
-                edge_labels = {(source, target, edge_key): mixed_graph[source][target][edge_key]['relationship']}
-                # play with this to move label around to minimize overlays
-                label_pos = 0.1 + 0.4 * (i / num_edges) + 0.5
-                graph.draw_networkx_edge_labels(mixed_graph, pos, edge_labels=edge_labels,
-                                                label_pos=label_pos,
-                                                font_size=7, font_color='black')
-        else:  # TODO: update to include logic, if any, for orphan nodes
-            pass
-
-    plt.title(f"{network_name} ({graph_type})")
-    plt.axis('off')  # Turn off axis
+    # square limits around the layout, so that point sizes map to the same data units along x and y
+    coordinates = np.array(list(pos.values())).reshape(-1, 2)
+    if len(coordinates) > 0:
+        center = (coordinates.min(axis=0) + coordinates.max(axis=0)) / 2
+        half_range = 0.6 * max(np.ptp(coordinates[:, 0]), np.ptp(coordinates[:, 1]), 1e-3)
+        ax.set_xlim(center[0] - half_range, center[0] + half_range)
+        ax.set_ylim(center[1] - half_range, center[1] + half_range)
+    return fig, ax
+
+
+# draw arrays of edges (sources/targets as positions, one rad per edge) as a single
+# LineCollection, plus a single PolyCollection of arrowheads for directed edges
+def draw_static_edges(ax, start_points, end_points, rad, widths, directed):
+    if len(start_points) == 0:
+        return None
+
+    points = data_units_per_point(ax)
+    node_radius = np.sqrt(ROUND_NODE_SIZE) / 2 * points
+    samples = BEZIER_SAMPLES if np.any(rad != 0) else 2
+    curves = bezier_curves(start_points, end_points, rad,
+                           np.full(len(rad), node_radius), np.full(len(rad), node_radius), samples)
+
+    ax.add_collection(LineCollection(curves, colors='gray', linewidths=widths, linestyles='solid', zorder=1))
+    if directed:
+        ax.add_collection(PolyCollection(arrowheads(curves, ARROW_LENGTH * points),
+                                         facecolors='gray', edgecolors='none', zorder=1))
+    return curves
+
+
+# place the labels of the selected edges (indices into curves) at label_pos along their curves
+def draw_static_edge_labels(ax, curves, label_pos, labels, selected):
+    if curves is None or len(selected) == 0:
+        return
+
+    selected = np.asarray(selected)
+    indices = np.clip(np.rint(label_pos[selected] * (curves.shape[1] - 1)).astype(int), 0, curves.shape[1] - 1)
+    label_points = curves[selected, indices]
+    for (x, y), edge in zip(label_points.tolist(), selected.tolist()):
+        label = labels[edge]
+        ax.text(x, y, label, fontsize=7, color='black', ha='center', va='center', zorder=2,
+                bbox=dict(boxstyle='round', ec='white', fc='white', alpha=0.7, lw=0))
+
+
+# save (to output_file, by default the graph's image_file_path), then release the figure
+# so memory does not grow with every rendered graph
+def save_static_figure(fig, ax, graph_to_draw, graph_type, network_name, output_file=None):
+    ax.set_title(f"{network_name} ({graph_type})")
+    ax.axis('off')  # Turn off axis
     # plt.show()  # comment out for larger graphs
-    image_file_name = str(mixed_graph).replace(' ', '-')
-    image_file_name = network_name.replace(' ', '-') + '-' + image_file_name
-    plt.savefig(f'./output/{image_file_name}.png')
+    fig.savefig(output_file or image_file_path(graph_to_draw, network_name))
+    plt.close(fig)
 
 
-# Static visualization for Graph/DiGraph types:
-def build_static_network(graph, simple_graph, graph_type, network_name):
-    plt.figure(figsize=(8, 8))
-
-    # Draw nodes with node labels
-    pos = graph.spring_layout(simple_graph)  # Use a layout algorithm suitable for the graph type
-    round_node_size = 1000
-    graph.draw_networkx_nodes(simple_graph, pos,
-                              node_color='orange', node_size=round_node_size,
-                              node_shape='o', alpha=0.8)
+# static multi/multidigraph visualization via matplotlib:
+def build_static_multi_network(graph, mixed_graph, graph_type, network_name, pos=None, output_file=None):
+    pos = shared_positions(graph, mixed_graph, pos)  # node positions (dict.) after layout
+    labelled = labelled_nodes(mixed_graph)
+    node_labels = {node: entity.label if entity is not None else str(node)
+                   for node, entity in mixed_graph.nodes(data='entity') if node in labelled}
+    fig, ax = draw_static_nodes(graph, mixed_graph, pos, node_labels)
+
+    # Draw edges, such that any multiple edges between two nodes are discernible: the number
+    # of edges (ignoring direction) between u and v is counted once for the whole graph, and
+    # the i-th of several edges from u to v bends by a growing arc radius
+    num_edges_d = number_of_edges_u_v(mixed_graph)
+    edge_index_d = {}
+    start_points, end_points, rad, label_pos, widths, labels = [], [], [], [], [], []
+    labelled_edges = []  # the edges among labelled nodes
+    for edge, (u, v, data) in enumerate(mixed_graph.edges(data=True)):
+        num_edges = num_edges_d[(u, v)]
+        i = edge_index_d.get((u, v), 0)
+        edge_index_d[(u, v)] = i + 1
+        if u in labelled and v in labelled and len(labelled_edges) < EDGE_LABEL_LIMIT:
+            labelled_edges.append(edge)
+
+        start_points.append(pos[u])
+        end_points.append(pos[v])
+        widths.append(data['weight'])
+        labels.append(data['relationship'])
+        if num_edges == 1:  # these are the originally input directed edges
+            rad.append(0.1)
+            label_pos.append(0.5)
+        else:  # multiple edges between u and v
+            # variable arc radians and label positions, to minimize overlays
+            rad.append(0.1 + 0.4 * (i / num_edges))
+            label_pos.append(0.1 + 0.4 * (i / num_edges) + 0.5)
 
-    # Extract node labels from the graph
-    node_labels = {node: simple_graph.nodes[node].get('label', str(node)) for node in simple_graph.nodes()}
-    graph.draw_networkx_labels(simple_graph, pos,
-                               labels=node_labels,
-                               font_size=10, font_color='black')
+    curves = draw_static_edges(ax, np.array(start_points).reshape(-1, 2), np.array(end_points).reshape(-1, 2),
+                               np.array(rad), widths, directed=True)
+    draw_static_edge_labels(ax, curves, np.array(label_pos), labels, labelled_edges)
 
-    # Draw edges with no edge labels (since it's a simple graph)
-    for u, v, data in simple_graph.edges(data=True):
-        # if simple_graph.is_directed():
-        #     edge_label = {(u, v): data['relationship']}
-        # else:
-        #     edge_label = {(min(u, v), max(u, v)): data['relationship']}  # Handle undirected graphs
-
-        # Draw each edge separately
-        graph.draw_networkx_edges(simple_graph, pos, edgelist=[(u, v)],
-                                  style="solid", edge_color='gray',
-                                  node_size=round_node_size,
-                                  width=data.get('weight', 1.0))
-
-        # graph.draw_networkx_edge_labels(simple_graph, pos, edge_labels=edge_label,
-        #                                 font_size=7, font_color='black',
-        #                                 label_pos=0.5, verticalalignment='center')
-
-    plt.title(f"{network_name} ({graph_type})")
-    plt.axis('off')  # Turn off axis
-    # plt.show()  # comment out for larger graphs
-    image_file_name = str(simple_graph).replace(' ', '-')
-    image_file_name = network_name.replace(' ', '-') + '-' + image_file_name
-    plt.savefig(f'./output/{image_file_name}.png')
+    save_static_figure(fig, ax, mixed_graph, graph_type, network_name, output_file)
 
 
-# dynamic multi/multidigraph visualization via plotly:
-def build_dynamic_multi_network(graph, mixed_graph, graph_type, network_name):
-    # plotly code below -- experimental but not as nice as matplot lib for curves
-    fig = go.Figure()
-    pos = graph.fruchterman_reingold_layout(mixed_graph)  # try this layout
-    for node in mixed_graph.nodes():
-        x, y = pos[node]
-        fig.add_trace(go.Scatter(x=[x],
-                                 y=[y],
-                                 mode='markers+text',
-                                 marker=dict(size=10, color='blue'),
-                                 text=node,
-                                 name=node,
-                                 textposition='bottom center',
-                                 hoverinfo='text'))
-
-    for u, v, key, data in mixed_graph.edges(data=True, keys=True):
-        # Retrieve the number of edges (ignoring direction) between
-        # u and v from preprocessed dictionary num_edges_d
-        num_edges = number_of_edges_u_v(mixed_graph).get((u, v), 0)  # return 0 if no edges
-
-        if num_edges == 1:
-            # Single edge case, draw a straight line
-            x0, y0 = pos[u]
-            x1, y1 = pos[v]
-            fig.add_trace(go.Scatter(x=[x0, x1],
-                                     y=[y0, y1],
-                                     mode='lines+text',
-                                     line=dict(width=data['weight'], color='gray'),
-                                     text=data['relationship'],
-                                     textposition='top center',
-                                     hoverinfo='text'))
-        else:
-            # Multiple edges, draw arcs
-            edge_list = [(u, v, key) for key in mixed_graph[u][v]]
-            for i, (source, target, edge_key) in enumerate(edge_list):
-                arc_style = 0.5 * (1 - np.cos(np.pi * (i + 1) / (num_edges + 1)))
-
-                x0, y0 = pos[u]
-                x1, y1 = pos[v]
-
-                # Calculate control points for Bézier curve
-                # TODO make this a smoother Bézier line
-                cx, cy = 0.5 * (x0 + x1), 0.5 * (y0 + y1)  # set to mid-point of (x0, y0) and (x1, y1)
-                control_x = cx + arc_style * (y1 - y0)
-                control_y = cy - arc_style * (x0 - x1)
-
-                # Create Bézier curve path
-                fig.add_trace(go.Scatter(x=[x0, control_x, x1],
-                                         y=[y0, control_y, y1],
-                                         mode='lines+text',
-                                         line=dict(width=mixed_graph[source][target][edge_key]['weight'], color='gray'),
-                                         text=mixed_graph[source][target][edge_key]['relationship'],
-                                         textposition='top center',
-                                         hoverinfo='text'))
+# Static visualization for Graph/DiGraph types:
+def build_static_network(graph, simple_graph, graph_type, network_name, pos=None, output_file=None):
+    pos = shared_positions(graph, simple_graph, pos)
 
+    # Extract node labels from the graph
+    node_labels = {node: simple_graph.nodes[node].get('label', str(node)) for node in labelled_nodes(simple_graph)}
+    fig, ax = draw_static_nodes(graph, simple_graph, pos, node_labels)
+
+    # Draw straight edges with no edge labels (since it's a simple graph)
+    edges = list(simple_graph.edges(data='weight', default=1.0))
+    draw_static_edges(ax,
+                      np.array([pos[u] for u, v, weight in edges]).reshape(-1, 2),
+                      np.array([pos[v] for u, v, weight in edges]).reshape(-1, 2),
+                      np.zeros(len(edges)),
+                      [weight for u, v, weight in edges],
+                      directed=simple_graph.is_directed())
+
+    save_static_figure(fig, ax, simple_graph, graph_type, network_name, output_file)
+
+
+# batched dynamic rendering: all nodes go into one WebGL (Scattergl) trace and the edges of each
+# relationship into one gap-separated line trace, instead of one plotly trace per node and edge;
+# the figure is written to a self-contained html file rather than shown
+DYNAMIC_BEZIER_SAMPLES = 12  # points per curved edge
+DYNAMIC_NODE_TRIM = 0.01  # edge ends stop short of the node centers, as a fraction of the layout size
+DYNAMIC_ARROW_LENGTH = 0.015  # as a fraction of the layout size
+
+
+# the html file of a graph's dynamic visualization
+def html_file_path(graph_to_draw, network_name, image_directory=IMAGE_DIRECTORY):
+    return image_file_path(graph_to_draw, network_name, image_directory)[:-len('.png')] + '.html'
+
+
+# one Scattergl trace for all the nodes, with labels as text (below NODE_LABEL_LIMIT) and hover text
+def dynamic_node_trace(graph_to_draw, pos, node_labels):
+    coordinates = np.array([pos[node] for node in graph_to_draw]).reshape(-1, 2)
+    labels = [node_labels[node] for node in graph_to_draw]
+    show_labels = graph_to_draw.number_of_nodes() <= NODE_LABEL_LIMIT
+    return go.Scattergl(x=coordinates[:, 0], y=coordinates[:, 1],
+                        mode='markers+text' if show_labels else 'markers',
+                        marker=dict(size=10, color='blue'),
+                        text=labels if show_labels else None,
+                        hovertext=labels,
+                        textposition='bottom center',
+                        hoverinfo='text',
+                        name='nodes')
+
+
+# line coordinates of arrays of edges, one NaN-separated sequence: each edge is a Bézier curve
+# (straight if its rad is 0), followed by a two-stroke arrowhead for directed edges
+def dynamic_edge_lines(start_points, end_points, rad, directed, layout_size):
+    trim = np.full(len(rad), DYNAMIC_NODE_TRIM * layout_size)
+    samples = DYNAMIC_BEZIER_SAMPLES if np.any(rad != 0) else 2
+    curves = bezier_curves(start_points, end_points, rad, trim, trim, samples)
+
+    gap = np.full((len(curves), 1, 2), np.nan)
+    pieces = [curves, gap]
+    if directed:
+        heads = arrowheads(curves, DYNAMIC_ARROW_LENGTH * layout_size)
+        pieces += [heads[:, [1, 0, 2], :], gap]  # wing, tip, wing
+    lines = np.concatenate(pieces, axis=1).reshape(-1, 2)
+
+    # NaN (as None would in a list) breaks the line; numpy arrays also skip plotly's per-point
+    # validation and are written as compact binary arrays
+    lines = lines.astype(np.float32)  # ample precision on screen, half the file size
+    return lines[:, 0], lines[:, 1]
+
+
+# one Scattergl line trace per relationship; a trace has one width, the (per link) weight
+def dynamic_edge_traces(start_points, end_points, rad, widths, relationships, directed, layout_size):
+    traces = []
+    relationships = np.asarray(relationships, dtype=object)
+    widths = np.asarray(widths, dtype=np.float64)
+    for relationship in dict.fromkeys(relationships.tolist()):  # in order of appearance
+        selected = relationships == relationship
+        x, y = dynamic_edge_lines(start_points[selected], end_points[selected], rad[selected], directed,
+                                  layout_size)
+        traces.append(go.Scattergl(x=x, y=y,
+                                   mode='lines',
+                                   line=dict(width=float(widths[selected].mean()), color='gray'),
+                                   hoverinfo='name',
+                                   name=str(relationship)))
+    return traces
+
+
+# lay out and save the figure to its html file, by default the graph's html_file_path
+# (plotly.js included, so it opens offline)
+def save_dynamic_figure(fig, graph_to_draw, graph_type, network_name, output_file=None):
     fig.update_layout(
         title=f"{network_name} ({graph_type})",
         showlegend=False,
@@ -184,60 +297,62 @@ def build_dynamic_multi_network(graph, mixed_graph, graph_type, network_name):
         xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
         yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
     )
+    fig.write_html(output_file or html_file_path(graph_to_draw, network_name), include_plotlyjs=True)
 
-    fig.show()
 
+# the larger side of the layout's bounding box, to scale trims and arrowheads
+def layout_extent(pos):
+    coordinates = np.array(list(pos.values())).reshape(-1, 2)
+    if len(coordinates) == 0:
+        return 1.0
+    return max(np.ptp(coordinates[:, 0]), np.ptp(coordinates[:, 1]), 1e-3)
 
-# Function to build dynamic (plotly) visualizations for simple graphs
-def build_dynamic_network(graph, mixed_graph, graph_type, network_name):
-    # Initialize the figure
-    fig = go.Figure()
-
-    # Compute layout (adjust layout method as per the graph type)
-    if isinstance(mixed_graph, graph.Graph):
-        pos = graph.spring_layout(mixed_graph)  # Example layout for undirected graphs
-    elif isinstance(mixed_graph, graph.DiGraph):
-        pos = graph.fruchterman_reingold_layout(mixed_graph)  # Example layout for directed graphs
-    else:
-        raise ValueError("Unsupported graph type. Supported types are Graph and DiGraph.")
-
-    # Add nodes
-    for node in mixed_graph.nodes():
-        x, y = pos[node]
-        fig.add_trace(go.Scatter(x=[x], y=[y],
-                                 mode='markers+text',
-                                 marker=dict(size=10, color='blue'),
-                                 text=node,
-                                 name=node,
-                                 textposition='bottom center',
-                                 hoverinfo='text'))
-
-    # Add edges (no labels necessary, since these are simple graphs)
+
+# dynamic multi/multidigraph visualization via plotly:
+def build_dynamic_multi_network(graph, mixed_graph, graph_type, network_name, pos=None, output_file=None):
+    pos = shared_positions(graph, mixed_graph, pos)
+    node_labels = {node: entity.label if entity is not None else str(node)
+                   for node, entity in mixed_graph.nodes(data='entity')}
+
+    # as for the static rendering: the number of edges (ignoring direction) between u and v is
+    # counted once for the whole graph, single edges are straight and the i-th of several edges
+    # from u to v bends by a growing arc radius
+    num_edges_d = number_of_edges_u_v(mixed_graph)
+    edge_index_d = {}
+    start_points, end_points, rad, widths, relationships = [], [], [], [], []
     for u, v, data in mixed_graph.edges(data=True):
-        num_edges = mixed_graph.number_of_edges(u, v)
-
-        if num_edges == 1:
-            # Single edge case, draw a straight line
-            x0, y0 = pos[u]
-            x1, y1 = pos[v]
-            fig.add_trace(go.Scatter(x=[x0, x1], y=[y0, y1],
-                                     mode='lines+text',
-                                     line=dict(width=data.get('weight', 1), color='gray'),
-                                     #  text=data.get('relationship', ''),
-                                     textposition='top center',
-                                     hoverinfo='text'))
-        else:
-            raise ValueError(
-                "Error: Supported types are Graph and DiGraph. Use build_dynamic_multi_network() for multigraphs.")
-
-    # Update layout and display the figure
-    fig.update_layout(
-        title=f"{network_name} ({graph_type})",
-        showlegend=False,
-        hovermode='closest',
-        margin=dict(b=0, l=0, r=0, t=40),
-        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
-    )
+        num_edges = num_edges_d[(u, v)]
+        i = edge_index_d.get((u, v), 0)
+        edge_index_d[(u, v)] = i + 1
+
+        start_points.append(pos[u])
+        end_points.append(pos[v])
+        widths.append(data['weight'])
+        relationships.append(data['relationship'])
+        rad.append(0 if num_edges == 1 else 0.5 * (1 - np.cos(np.pi * (i + 1) / (num_edges + 1))))
+
+    fig = go.Figure(dynamic_edge_traces(np.array(start_points).reshape(-1, 2), np.array(end_points).reshape(-1, 2),
+                                        np.array(rad, dtype=np.float64), widths, relationships,
+                                        directed=mixed_graph.is_directed(), layout_size=layout_extent(pos)))
+    fig.add_trace(dynamic_node_trace(mixed_graph, pos, node_labels))
+    save_dynamic_figure(fig, mixed_graph, graph_type, network_name, output_file)
+
+
+# Function to build dynamic (plotly) visualizations for simple graphs
+def build_dynamic_network(graph, simple_graph, graph_type, network_name, pos=None, output_file=None):
+    if simple_graph.is_multigraph():
+        raise ValueError(
+            "Error: Supported types are Graph and DiGraph. Use build_dynamic_multi_network() for multigraphs.")
+    pos = shared_positions(graph, simple_graph, pos)
+    node_labels = {node: simple_graph.nodes[node].get('label', str(node)) for node in simple_graph.nodes()}
 
-    fig.show()
+    # straight edges, all in one trace (no labels necessary, since these are simple graphs)
+    edges = list(simple_graph.edges(data='weight', default=1.0))
+    fig = go.Figure(dynamic_edge_traces(np.array([pos[u] for u, v, weight in edges]).reshape(-1, 2),
+                                        np.array([pos[v] for u, v, weight in edges]).reshape(-1, 2),
+                                        np.zeros(len(edges)),
+                                        [weight for u, v, weight in edges],
+                                        [network_name] * len(edges),
+                                        directed=simple_graph.is_directed(), layout_size=layout_extent(pos)))
+    fig.add_trace(dynamic_node_trace(simple_graph, pos, node_labels))
+    save_dynamic_figure(fig, simple_graph, graph_type, network_name, output_file)
@@ -0,0 +1,307 @@
+# Incremental maintenance of the graphs for relationship.csv deltas: added and removed
+# relationship rows update original_graph, mixed_graph and the lazy sub-graphs in place,
+# and the cheap metrics are kept up to date as edges come and go:
+# - degree centrality of the mixed graph
+# - (weakly) connected components of the mixed graph, via union-find
+# - closed and possible directed triplets of the mixed graph, hence its clustering and
+#   transitivity as the report computes them for a multi-digraph
+# - number of edges per relationship
+# Expensive metrics (betweenness, closeness, paths, ...) are only flagged as stale for the
+# components (and relationships) a delta touched. main.py applies delta files (--added,
+# --removed) this way before the analysis: the maintained metrics seed the mixed graph's
+# analysis (see known_results), and the result cache, keyed by graph fingerprints, recomputes
+# only the graphs the delta changed, i.e. the mixed graph and the stale relationships; within
+# a graph the expensive metrics are recomputed whole, not per stale component
+from collections import Counter
+import ingest
+import numpy as np
+from partition import LazySubgraphs
+import pandas as pd
+import sys
+
+
+# disjoint sets of nodes with path compression and union by size. The sets are trees of
+# elements, one per node; a part split off a set gets new elements, so splitting costs the size
+# of the part only (the old elements stay behind, linking the rest of the set)
+class UnionFind:
+    def __init__(self):
+        self.__element = {}  # node -> its element
+        self.__parent = []  # element -> parent element
+        self.__size = {}  # root element -> number of nodes in its set
+
+    def __new_element(self, parent=None):
+        element = len(self.__parent)
+        self.__parent.append(element if parent is None else parent)
+        return element
+
+    def add(self, node):
+        if node not in self.__element:
+            self.__element[node] = self.__new_element()
+            self.__size[self.__element[node]] = 1
+
+    # the root element of the set of node
+    def find(self, node):
+        element = root = self.__element[node]
+        while self.__parent[root] != root:
+            root = self.__parent[root]
+        while self.__parent[element] != root:  # compress the path
+            self.__parent[element], element = root, self.__parent[element]
+        return root
+
+    def union(self, u, v):
+        root_u, root_v = self.find(u), self.find(v)
+        if root_u == root_v:
+            return root_u
+        if self.__size[root_u] < self.__size[root_v]:
+            root_u, root_v = root_v, root_u
+        self.__parent[root_v] = root_u
+        self.__size[root_u] += self.__size.pop(root_v)
+        return root_u
+
+    # make part (a set of nodes, all in one set, but not all of it) a set of its own
+    def split(self, part):
+        self.__size[self.find(next(iter(part)))] -= len(part)
+        root = None
+        for node in part:
+            self.__element[node] = self.__new_element(root)
+            root = self.__element[node] if root is None else root
+        self.__size[root] = len(part)
+
+
+class IncrementalGraphs:
+    def __init__(self, nodes, links, original_graph, mixed_graph):
+        self.__link_df = ingest.link_index(links)
+        self.original_graph = original_graph
+        self.mixed_graph = mixed_graph
+        self.subgraphs = LazySubgraphs(original_graph, links)
+
+        self.edge_counts = Counter(relationship for u, v, relationship in original_graph.edges(data='relationship'))
+        self.degree = dict(mixed_graph.degree())
+
+        # undirected projection of the mixed graph: node -> {neighbor: number of mixed edges between them},
+        # and its arcs: node -> {successor (predecessor): number of mixed edges to (from) it}
+        self.__neighbors = {node: {} for node in mixed_graph}
+        self.__successors = {node: {} for node in mixed_graph}
+        self.__predecessors = {node: {} for node in mixed_graph}
+        # per node, the ordered pairs of distinct successors with an arc from the first to the second
+        self.closed_triplets = dict.fromkeys(mixed_graph, 0)
+        self.components = UnionFind()
+        for node in mixed_graph:
+            self.components.add(node)
+        for u, v in mixed_graph.edges():
+            self.__link_projection(u, v)
+
+        # nodes and relationships whose expensive metrics must be recomputed
+        self.stale_nodes = set()
+        self.stale_relationships = set()
+
+    # apply a delta of relationship rows (data frames with Source, Target and Link columns,
+    # as in relationship.csv); removals are applied first. Returns the removed rows that
+    # matched no relationship, as (source, target, link), which are reported and skipped
+    def apply_delta(self, added_df=None, removed_df=None):
+        unmatched = []
+        if removed_df is not None and len(removed_df) > 0:
+            joined = ingest.join_links(removed_df, self.__link_df)
+            for source, target, link, directed in zip(joined['Source'].tolist(), joined['Target'].tolist(),
+                                                      joined['Link'].tolist(), joined['Directed'].tolist()):
+                if not self.remove_relationship(source, target, link, directed):
+                    unmatched.append((source, target, link))
+                    print(f'no {link} relationship between {source} and {target} to remove', file=sys.stderr)
+
+        if added_df is not None and len(added_df) > 0:
+            joined = ingest.join_links(added_df, self.__link_df)
+            for source, target, link, directed, weight in zip(joined['Source'].tolist(), joined['Target'].tolist(),
+                                                              joined['Link'].tolist(), joined['Directed'].tolist(),
+                                                              joined['Weight'].tolist()):
+                self.add_relationship(source, target, link, directed, weight)
+        return unmatched
+
+    # apply a delta read from csv files in the relationship.csv format
+    def apply_delta_files(self, added_file=None, removed_file=None):
+        return self.apply_delta(pd.read_csv(added_file) if added_file else None,
+                                pd.read_csv(removed_file) if removed_file else None)
+
+    def add_relationship(self, source, target, link, directed, weight):
+        for node in (source, target):
+            if node not in self.degree:
+                self.degree[node] = 0
+                self.__neighbors[node] = {}
+                self.__successors[node] = {}
+                self.__predecessors[node] = {}
+                self.closed_triplets[node] = 0
+                self.components.add(node)
+
+        data = {'directed': directed, 'weight': weight, 'relationship': link}
+        key = self.original_graph.add_edge(source, target, **data)
+        self.subgraphs.add_edge(source, target, key, self.original_graph[source][target][key])
+        self.edge_counts[link] += 1
+
+        # one link in the mixed graph, as in ingest.py, which shows it as directed edges
+        self.mixed_graph.add_link(source, target, link, weight, not directed)
+        mixed_edges = [(source, target)] if directed else [(source, target), (target, source)]
+        for u, v in mixed_edges:
+            self.degree[u] += 1
+            self.degree[v] += 1
+            self.__link_projection(u, v)
+
+        self.stale_nodes.update((source, target))
+        self.stale_relationships.add(link)
+
+    # remove one relationship (an undirected one given either way round); returns whether
+    # there was one
+    def remove_relationship(self, source, target, link, directed):
+        key = self.__find_edge_key(self.original_graph, source, target, link)
+        if key is None and not directed:
+            source, target = target, source
+            key = self.__find_edge_key(self.original_graph, source, target, link)
+        if key is None:
+            return False
+
+        self.original_graph.remove_edge(source, target, key)
+        self.subgraphs.remove_edge(source, target, key, link)
+        self.edge_counts[link] -= 1
+
+        # the stale components are those before any split
+        self.stale_nodes.update((source, target))
+        self.stale_relationships.add(link)
+
+        if not self.mixed_graph.remove_link(source, target, link, not directed):
+            return True
+        mixed_edges = [(source, target)] if directed else [(source, target), (target, source)]
+        for u, v in mixed_edges:
+            self.degree[u] -= 1
+            self.degree[v] -= 1
+            self.__unlink_projection(u, v)
+        return True
+
+    # degree centrality of the mixed graph, as networkx.degree_centrality computes it
+    def degree_centrality(self):
+        if len(self.degree) <= 1:
+            return {node: 1 for node in self.degree}
+        scale = 1.0 / (len(self.degree) - 1)
+        return {node: degree * scale for node, degree in self.degree.items()}
+
+    # (nodes, closed triplets, possible triplets) of the mixed graph, in its node order, as
+    # report.count_directed_triplets counts them
+    def directed_triplets(self):
+        nodes = list(self.mixed_graph)
+        out_degree = np.array([len(self.__successors[node]) for node in nodes], dtype=np.int64)
+        return nodes, np.array([self.closed_triplets[node] for node in nodes], dtype=np.int64), \
+            out_degree * (out_degree - 1)
+
+    # clustering coefficients of the mixed graph, as the report computes them for a multi-digraph
+    def clustering(self):
+        nodes, closed_triplets, possible_triplets = self.directed_triplets()
+        return {node: closed / possible if possible > 0 else 0.0
+                for node, closed, possible in zip(nodes, closed_triplets.tolist(), possible_triplets.tolist())}
+
+    # global transitivity of the mixed graph, as the report computes it for a multi-digraph
+    def transitivity(self):
+        nodes, closed_triplets, possible_triplets = self.directed_triplets()
+        total_possible = int(possible_triplets.sum())
+        return int(closed_triplets.sum()) / total_possible if total_possible > 0 else 0
+
+    # the maintained results of the mixed graph, by report.AnalysisContext result name, to seed
+    # its analysis with (see scheduler.analyze_graphs)
+    def known_results(self):
+        return {'Mixed Graph': {'degrees': {node: self.degree[node] for node in self.mixed_graph},
+                                'directed triplets': self.directed_triplets()}}
+
+    # (weakly) connected components of the mixed graph
+    def connected_components(self):
+        components = {}
+        for node in self.degree:
+            components.setdefault(self.components.find(node), set()).add(node)
+        return list(components.values())
+
+    # the components whose expensive metrics are stale after the deltas applied so far
+    def stale_components(self):
+        stale_roots = {self.components.find(node) for node in self.stale_nodes if node in self.degree}
+        return [component for component in self.connected_components()
+                if self.components.find(next(iter(component))) in stale_roots]
+
+    # call once the stale metrics have been recomputed
+    def clear_stale(self):
+        self.stale_nodes.clear()
+        self.stale_relationships.clear()
+
+    @staticmethod
+    def __find_edge_key(multi_graph, u, v, link):
+        for key, data in multi_graph.get_edge_data(u, v, default={}).items():
+            if data.get('relationship') == link:
+                return key
+        return None
+
+    # count one more mixed edge from u to v in the arcs and the undirected projection
+    def __link_projection(self, u, v):
+        arcs = self.__successors[u].get(v, 0)
+        if arcs == 0:
+            self.__successors[u][v] = self.__predecessors[v][u] = 1
+            self.__count_triplets(u, v, 1)
+        else:
+            self.__successors[u][v] = self.__predecessors[v][u] = arcs + 1
+
+        multiplicity = self.__neighbors[u].get(v, 0)
+        self.__neighbors[u][v] = multiplicity + 1
+        if u != v:
+            self.__neighbors[v][u] = multiplicity + 1
+        if multiplicity == 0 and u != v:
+            self.components.union(u, v)
+
+    # count one less mixed edge from u to v in the arcs and the undirected projection
+    def __unlink_projection(self, u, v):
+        arcs = self.__successors[u][v] - 1
+        if arcs == 0:
+            self.__count_triplets(u, v, -1)
+            del self.__successors[u][v], self.__predecessors[v][u]
+        else:
+            self.__successors[u][v] = self.__predecessors[v][u] = arcs
+
+        multiplicity = self.__neighbors[u][v] - 1
+        if multiplicity > 0:
+            self.__neighbors[u][v] = multiplicity
+            if u != v:
+                self.__neighbors[v][u] = multiplicity
+            return
+
+        del self.__neighbors[u][v]
+        if u == v:
+            return
+        del self.__neighbors[v][u]
+
+        # the component of u and v may have split: search from both ends until the searches
+        # meet, or one of them runs out and its nodes are the part split off
+        split_part = self.__split_part(u, v)
+        if split_part is not None:
+            self.components.split(split_part)
+
+    # add sign times the closed triplets through the arc u -> v (which must be there): those of u
+    # with v as the first successor (u -> v -> k) or as the second (u -> j -> v), and those of
+    # every other common predecessor i of u and v (i -> u -> v)
+    def __count_triplets(self, u, v, sign):
+        successors_u = self.__successors[u].keys()
+        closed = len(successors_u & self.__successors[v].keys()) + len(successors_u & self.__predecessors[v].keys())
+        self.closed_triplets[u] += sign * (closed - 2 * (v in successors_u and v in self.__successors[v]))
+        if u != v:
+            for node in self.__predecessors[u].keys() & self.__predecessors[v].keys():
+                if node != u:
+                    self.closed_triplets[node] += sign
+
+    # search from u and from v at once, always extending the search that has reached fewer
+    # nodes: None as soon as the searches meet (u and v are still connected), otherwise all
+    # the nodes reached by the search that ran out, a whole component
+    def __split_part(self, u, v):
+        searches = [({u}, [u]), ({v}, [v])]
+        while True:
+            for reached, frontier in searches:
+                if not frontier:
+                    return reached
+            searches.sort(key=lambda search: len(search[0]))
+            (reached, frontier), (other_reached, _) = searches
+            node = frontier.pop()
+            for neighbor in self.__neighbors[node]:
+                if neighbor in other_reached:
+                    return None
+                if neighbor not in reached:
+                    reached.add(neighbor)
+                    frontier.append(neighbor)
@@ -0,0 +1,99 @@
+# read the csv inputs into graphs using columnar (vectorized) pandas operations:
+# input/node.csv: the nodes
+# input/link.csv: the kinds of links and related properties like weight
+# input/relationship.csv: the links between any two given nodes
+from node import Node
+from link import Link
+from mixed import MixedGraph
+import networkx as graph
+import pandas as pd
+
+NODE_FILE = './input/node.csv'
+LINK_FILE = './input/link.csv'
+RELATIONSHIP_FILE = './input/relationship.csv'
+
+# assume these values for relationships whose link label is missing from link.csv
+DEFAULT_DIRECTED = False
+DEFAULT_WEIGHT = 1.0
+
+
+# instantiate node objects from the node csv, column by column
+def read_nodes(node_file=NODE_FILE):
+    node_df = pd.read_csv(node_file)
+    return [Node(label, ID=node_id) for label, node_id in
+            zip(node_df['Label'].tolist(), node_df['ID'].tolist())]
+
+
+# instantiate link objects from the link csv, column by column
+def read_links(link_file=LINK_FILE):
+    link_df = pd.read_csv(link_file)
+    return [Link(label, directed=directed, weight=weight, ID=link_id) for label, directed, weight, link_id in
+            zip(link_df['Label'].tolist(), link_df['Directed'].tolist(),
+                link_df['Weight'].tolist(), link_df['ID'].tolist())]
+
+
+# hash index of link attributes keyed by link label, ready to be merged on relationship['Link']
+# (the first link wins if a label is listed twice, as in a linear search)
+def link_index(links):
+    link_df = pd.DataFrame({'Link': [link.label for link in links],
+                            'Directed': [link.directed for link in links],
+                            'Weight': [link.weight for link in links]})
+    return link_df.drop_duplicates(subset='Link', keep='first').set_index('Link')
+
+
+# read the relationship csv whole, or as an iterator of data frames of chunk_size rows
+def read_relationships(relationship_file=RELATIONSHIP_FILE, chunk_size=None):
+    if chunk_size is None:
+        return [pd.read_csv(relationship_file)]
+    return pd.read_csv(relationship_file, chunksize=chunk_size)
+
+
+# join a block of relationships to their link attributes in one merge
+def join_links(relationship_df, link_df):
+    joined = relationship_df[['Source', 'Target', 'Link']].join(link_df, on='Link', how='left')
+    joined['Directed'] = joined['Directed'].fillna(float(DEFAULT_DIRECTED)).astype(bool)
+    joined['Weight'] = joined['Weight'].fillna(DEFAULT_WEIGHT)
+    return joined
+
+
+# add a block of joined relationships to the original and mixed graphs in bulk
+def add_relationships(original_graph, mixed_graph, joined):
+    sources = joined['Source'].tolist()
+    targets = joined['Target'].tolist()
+    links = joined['Link'].tolist()
+    directed = joined['Directed'].tolist()
+    weights = joined['Weight'].tolist()
+
+    original_graph.add_edges_from(
+        (source, target, {'directed': is_directed, 'weight': weight, 'relationship': link})
+        for source, target, link, is_directed, weight in zip(sources, targets, links, directed, weights))
+
+    # networkx does not support mixed graphs, so mixed_graph (see mixed.py) normalizes all edges to
+    # directed: an undirected edge becomes two directed edges, added right after each other
+    mixed_graph.add_links(joined['Source'].to_numpy(), joined['Target'].to_numpy(), joined['Link'].to_numpy(),
+                          joined['Weight'].to_numpy(), ~joined['Directed'].to_numpy())
+
+
+# build the original graph (undirected and directed edges as input) and the mixed graph
+# (all edges normalized to directed); pass a chunk_size to stream relationship files
+# that do not fit in memory, and a collection of link labels to keep only those relationships
+def load_graphs(node_file=NODE_FILE, link_file=LINK_FILE, relationship_file=RELATIONSHIP_FILE, chunk_size=None,
+                relationships=None):
+    nodes = read_nodes(node_file)
+    links = read_links(link_file)
+    if relationships is not None:
+        links = [link for link in links if link.label in relationships]
+    link_df = link_index(links)
+
+    # use a MultiDiGraph to represent both directed and undirected edges
+    original_graph = graph.MultiDiGraph()  # store the original undirected and directed edges
+    mixed_graph = MixedGraph()  # normalize all edges to directed
+
+    mixed_graph.add_nodes((node.label, {'entity': node}) for node in nodes)
+
+    for relationship_df in read_relationships(relationship_file, chunk_size):
+        if relationships is not None:
+            relationship_df = relationship_df[relationship_df['Link'].isin(list(relationships))]
+        add_relationships(original_graph, mixed_graph, join_links(relationship_df, link_df))
+
+    return nodes, links, original_graph, mixed_graph
@@ -0,0 +1,120 @@
+# Per-stage instrumentation of a run: wall time, CPU time and peak memory of every stage
+# (ingestion, sub-graph extraction, layout, each analysis family on each graph, each render).
+# Stages that run in worker processes are measured there and their records sent back.
+# The records go to a "Run metrics" section of the report and to METRICS_FILE (JSON); stages
+# slower than PROFILE_THRESHOLD seconds (main.py --profile) also leave a cProfile (pstats) dump in
+# PROFILE_DIRECTORY; main.py --memory sets TRACE_MEMORY
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+METRICS_FILE = './output/metrics.json'
+# trace Python (and numpy) allocations for each stage's peak memory; slows the stages down
+TRACE_MEMORY = False
+# profile every stage and keep the profiles of those that took longer than this many seconds;
+# None profiles nothing (profiling slows the stages down, too)
+PROFILE_THRESHOLD = None
+PROFILE_DIRECTORY = './output/profiles'
+
+# ru_maxrss is in kilobytes on Linux, in bytes on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+# peak resident memory of this process so far, in bytes; None where the resource module is
+# missing (Windows)
+def peak_rss():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+# a profile file name for a stage of a graph
+def profile_file_path(stage, network_name=None):
+    name = stage if network_name is None else f'{network_name}-{stage}'
+    name = ''.join(character if character.isalnum() else '-' for character in name)
+    return os.path.join(PROFILE_DIRECTORY, f'{name}.pstats')
+
+
+# measure the block as a stage (of a graph), appending its record to records:
+# wall and CPU seconds, the process' peak resident memory at the end of the stage and, with
+# TRACE_MEMORY, the stage's own peak of traced allocations
+@contextmanager
+def measure(stage, network_name=None, records=None):
+    record = {'stage': stage, 'graph': network_name, 'pid': os.getpid()}
+    tracing = TRACE_MEMORY and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if PROFILE_THRESHOLD is not None else None
+    if profiler is not None:
+        profiler.enable()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall'] = time.perf_counter() - wall_start
+        record['cpu'] = time.process_time() - cpu_start
+        if profiler is not None:
+            profiler.disable()
+            if record['wall'] > PROFILE_THRESHOLD:
+                os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+                record['profile'] = profile_file_path(stage, network_name)
+                profiler.dump_stats(record['profile'])
+        if tracing:
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        record['peak_rss'] = peak_rss()
+        if records is not None:
+            records.append(record)
+
+
+# call function(*args) as a measured stage; returns (result, record), so that a worker
+# process can send the record back along with the result
+def measured_call(stage, network_name, function, *args):
+    with measure(stage, network_name) as record:
+        result = function(*args)
+    return result, record
+
+
+# the stage records of a whole run
+class RunMetrics:
+    def __init__(self):
+        self.run = datetime.now().isoformat(timespec='seconds')
+        self.records = []
+
+    def stage(self, stage, network_name=None):
+        return measure(stage, network_name, self.records)
+
+    # a record measured elsewhere (e.g. in a worker process)
+    def add(self, record):
+        self.records.append(record)
+
+    def write_json(self, metrics_file=METRICS_FILE):
+        with open(metrics_file + '.tmp', 'w') as metrics_output:
+            json.dump({'run': self.run, 'trace_memory': TRACE_MEMORY, 'profile_threshold': PROFILE_THRESHOLD,
+                       'peak_rss': peak_rss(), 'stages': self.records}, metrics_output, indent=1)
+        os.replace(metrics_file + '.tmp', metrics_file)
+
+    # append the "Run metrics" section to the report (see report.ReportSink), pointing to the
+    # metrics_file that write_json writes
+    def write_report(self, sink, metrics_file=METRICS_FILE):
+        sink.write_section('** Run metrics', f'Stages of the run of {self.run}, in seconds and MiB '
+                                             f'(details in {metrics_file}):\n')
+        sink.write_table(('stage', 'graph', 'wall', 'cpu', 'peak traced', 'peak rss'),
+                         [(record['stage'], record['graph'] or '',
+                           f"{record['wall']:.3f}", f"{record['cpu']:.3f}",
+                           mebibytes(record.get('peak_memory')), mebibytes(record.get('peak_rss')))
+                          for record in self.records])
+
+
+def mebibytes(number_of_bytes):
+    return '' if number_of_bytes is None else f'{number_of_bytes / 1024 ** 2:.1f}'
@@ -0,0 +1,127 @@
+# Shared node positions for all renderers: one layout is computed for the full node set
+# (the mixed graph) and reused for every relationship sub-graph, so the same person sits
+# in the same place in every picture. The positions are saved to disk, so later runs
+# reuse them as they are, or warm-start from them when nodes were added
+import json
+import os
+import numpy as np
+import scipy.sparse as sparse
+
+LAYOUT_FILE = './output/layout.json'
+# above this many nodes, use the grid-approximated force-directed layout below
+LARGE_LAYOUT_NODES = 2000
+LAYOUT_ITERATIONS = 50
+WARM_START_ITERATIONS = 10  # when most nodes already have a position
+LAYOUT_GRID_SIZE = 16  # cells per side of the repulsion grid
+LAYOUT_CHUNK_SIZE = 65536  # nodes per vectorized repulsion step, to bound memory
+LAYOUT_SEED = 42
+
+
+# Fruchterman-Reingold with a one-level Barnes-Hut (particle-mesh) approximation: each node is
+# repelled by the centers of mass of the cells of a grid instead of by every other node,
+# so an iteration costs O(N * cells + E) instead of O(N^2). Nodes in the boolean mask fixed
+# (if given) repel and attract the others but do not move
+def grid_force_layout(adjacency, positions, iterations, grid_size=LAYOUT_GRID_SIZE, fixed=None):
+    number_of_nodes = positions.shape[0]
+    k = np.sqrt(1.0 / number_of_nodes)  # ideal edge length in a unit square
+    rows, columns = adjacency.nonzero()
+    temperature = 0.1
+
+    for iteration in range(iterations):
+        # cell masses and centers of mass
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        cell_width = np.maximum(high - low, 1e-9) / grid_size
+        cell_xy = np.minimum(((positions - low) / cell_width).astype(np.int64), grid_size - 1)
+        cell = cell_xy[:, 0] * grid_size + cell_xy[:, 1]
+        mass = np.bincount(cell, minlength=grid_size ** 2).astype(np.float64)
+        occupied = mass > 0
+        centers = np.stack([np.bincount(cell, positions[:, 0], minlength=grid_size ** 2),
+                            np.bincount(cell, positions[:, 1], minlength=grid_size ** 2)], axis=1)
+        centers, mass = centers[occupied] / mass[occupied, None], mass[occupied]
+
+        # repulsion k^2 / d from every cell, weighted by its mass
+        displacement = np.zeros_like(positions)
+        min_distance2 = (0.5 * cell_width.min()) ** 2
+        for start in range(0, number_of_nodes, LAYOUT_CHUNK_SIZE):
+            delta = positions[start:start + LAYOUT_CHUNK_SIZE, None, :] - centers[None, :, :]
+            distance2 = np.maximum((delta ** 2).sum(axis=2), min_distance2)
+            displacement[start:start + LAYOUT_CHUNK_SIZE] = \
+                (k ** 2 * (mass / distance2)[:, :, None] * delta).sum(axis=1)
+
+        # attraction d^2 / k along the edges
+        delta = positions[rows] - positions[columns]
+        attraction = delta * np.hypot(delta[:, 0], delta[:, 1])[:, None] / k
+        displacement[:, 0] -= np.bincount(rows, attraction[:, 0], minlength=number_of_nodes)
+        displacement[:, 1] -= np.bincount(rows, attraction[:, 1], minlength=number_of_nodes)
+
+        # move each node by at most the current temperature, then cool down
+        if fixed is not None:
+            displacement[fixed] = 0
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 1e-12)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= 0.1 / (iterations + 1)
+
+    return positions
+
+
+class LayoutService:
+    def __init__(self, layout_file=LAYOUT_FILE):
+        self.layout_file = layout_file
+        self.positions = self.load()
+
+    # saved positions, as {node: (x, y)}
+    def load(self):
+        if self.layout_file is None or not os.path.exists(self.layout_file):
+            return {}
+        with open(self.layout_file) as layout_input:
+            return {node: (x, y) for node, x, y in json.load(layout_input)}
+
+    def save(self):
+        if self.layout_file is None:
+            return
+        with open(self.layout_file + '.tmp', 'w') as layout_output:
+            json.dump([[node, x, y] for node, (x, y) in self.positions.items()], layout_output)
+        os.replace(self.layout_file + '.tmp', self.layout_file)
+
+    # positions for every node of graph_to_layout (normally the mixed graph); nodes placed
+    # before keep their place, new ones are warm-started next to their placed neighbors
+    def layout(self, graph, graph_to_layout):
+        new_nodes = [node for node in graph_to_layout if node not in self.positions]
+        if not new_nodes:
+            return {node: self.positions[node] for node in graph_to_layout}
+
+        undirected = graph.Graph(graph_to_layout) if graph_to_layout.is_directed() or \
+            graph_to_layout.is_multigraph() else graph_to_layout
+        warm_start = len(new_nodes) < len(undirected) / 2
+        iterations = WARM_START_ITERATIONS if warm_start else LAYOUT_ITERATIONS
+
+        if len(undirected) <= LARGE_LAYOUT_NODES:
+            known = {node: self.positions[node] for node in undirected if node in self.positions}
+            positions = graph.spring_layout(undirected, pos=known or None, fixed=list(known) or None,
+                                            iterations=iterations, seed=LAYOUT_SEED)
+        else:
+            nodes = list(undirected)
+            positions = self.initial_positions(undirected, nodes)
+            adjacency = graph.to_scipy_sparse_array(undirected, nodelist=nodes, weight=None, format='csr')
+            fixed = np.array([node in self.positions for node in nodes], dtype=bool)
+            positions = grid_force_layout(sparse.csr_matrix(adjacency), positions, iterations,
+                                          fixed=fixed if fixed.any() else None)
+            positions = dict(zip(nodes, positions))
+
+        self.positions.update({node: (float(x), float(y)) for node, (x, y) in positions.items()})
+        self.save()
+        return {node: self.positions[node] for node in graph_to_layout}
+
+    # known positions where available, otherwise the mean position of placed neighbors
+    # (plus jitter), otherwise random
+    def initial_positions(self, undirected, nodes):
+        random_state = np.random.default_rng(LAYOUT_SEED)
+        positions = random_state.random((len(nodes), 2))
+        for index, node in enumerate(nodes):
+            if node in self.positions:
+                positions[index] = self.positions[node]
+            else:
+                placed = [self.positions[neighbor] for neighbor in undirected[node] if neighbor in self.positions]
+                if placed:
+                    positions[index] = np.mean(placed, axis=0) + 0.01 * random_state.standard_normal(2)
+        return positions
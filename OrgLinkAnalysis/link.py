@@ -5,6 +5,8 @@ from entity import Entity
 
 
 class Link(Entity):
+    __slots__ = ('__directed', '__weight')
+
     # assume the edge is undirected (most common in org. networks):
     def __init__(self, label, directed=False, weight=1, **kwargs):
         super().__init__(label, **kwargs)
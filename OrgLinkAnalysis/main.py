@@ -1,145 +1,176 @@
-import graph_viz as draw_graph
-import report as report
-from node import Node
-from link import Link
+# command line entry point: read the inputs, analyze the mixed graph and each relationship
+# sub-graph into the report, and render them. Usage (run from this directory):
+#   python main.py [ingest|analyze|render|all] [--input DIR] [--output DIR] [--snapshot [DIR]]
+#                  [--relationships LINK ...] [--added FILE] [--removed FILE] [--profile SECONDS] [--memory]
+# The plotting libraries are only imported by the render stage, so ingest/analyze runs start faster
+import argparse
+from cache import ResultCache
+from incremental import IncrementalGraphs
+import ingest
+import instrument
+from instrument import RunMetrics
+import os
+from partition import LazySubgraphs
+import report
+from report import ReportSink, get_graph_type
+import scheduler
+import snapshot
 import networkx as graph
-import pandas as pd  # to read the csv input data
-
-# create new graph with mixed edge directions, but that can add multiple edges for two nodes
-# use a MultiDiGraph to represent both directed and undirected edges
-original_graph = graph.MultiDiGraph()  # store the original undirected and directed edges
-mixed_graph = graph.MultiDiGraph()  # normalize all edges to directed
-
-# read the source files:
-# input/node.csv: the nodes
-# input/link.csv: the kinds of links and related properties like weight
-# input/relationship.csv: the links between any two given nodes
-node_df = pd.read_csv('./input/node.csv')
-link_df = pd.read_csv('./input/link.csv')
-relationship_df = pd.read_csv('./input/relationship.csv')
-
-# instantiate node and link objects from input data:
-nodes = [Node(row['Label'], ID=row['ID']) for node_df_index, row in node_df.iterrows()]
-links = [Link(row['Label'], directed=row['Directed'],
-              weight=row['Weight'], ID=row['ID']) for link_df_index, row in link_df.iterrows()]
-
-# add the nodes to the mixed graph:
-for node in nodes:
-    mixed_graph.add_node(node.label, entity=node)
-
-# add the edges into the mixed_graph:
-for relationship_index, row in relationship_df.iterrows():
-    source_node = row['Source']
-    target_node = row['Target']
-    link_label = row['Link']
-
-    # given the link label in relationship_df, search for the corresponding record in links[]
-    # assume some default values in case:
-    directed = False
-    weight = 1.0
-    for link in links:
-        if link.label == link_label:
-            # fetch the directed and weight values from link[]
-            directed = link.directed
-            weight = link.weight
-            break
-
-    # add edge to original_graph:
-    original_graph.add_edge(source_node, target_node, directed=directed, weight=weight,
-                            relationship=link_label)
-
-    # if this is an undirected edge, create two directed edges because nextworkx
-    # does not support mixed graphs -- so normalize all edges to directed into mixed_graph:
-    if not directed:
-        mixed_graph.add_edge(source_node, target_node, directed=True, weight=weight,
-                             relationship=link_label)
-        mixed_graph.add_edge(target_node, source_node, directed=True, weight=weight,
-                             relationship=link_label)
-    else:
-        mixed_graph.add_edge(source_node, target_node, directed=True, weight=weight,
-                             relationship=link_label)
-
-
-# Return a sub-graph given a link
-def get_subgraph_from_link(main_graph, relationship, is_directed):
-    subgraph_edges = {(u, v, k) for u, v, k, data in main_graph.edges(keys=True, data=True) if
-                      data.get('relationship') == relationship}
-
-    # Create the subgraph
-    sub_graph = main_graph.edge_subgraph(subgraph_edges)
-
-    # Return as Graph or DiGraph (simple undirected or directed graph)
-    if is_directed:
-        return graph.DiGraph(sub_graph)
-    else:
-        return graph.Graph(sub_graph)
-
-
-# fetch a dictionary of sub-graphs for each link:
-# key: link label, value: sub-graph
-subgraphs = {}
-for link in links:
-    subgraphs[link.label] = get_subgraph_from_link(original_graph, link.label, link.directed)
-
-
-# Given a graph, analyze by running various algorithms and get a report
-def analyze_graph(networkx_graph, graph_to_analyze, network_name):
-    # fetch the graph type to pass it to the report generator below
-    # since some graph algorithms run on specific graph types
-    graph_type = ''
-    if '.Graph' in str(type(graph_to_analyze)):
-        graph_type = 'simple undirected'
-    elif '.DiGraph' in str(type(graph_to_analyze)):
-        graph_type = 'simple directed'
-    elif '.MultiGraph' in str(type(graph_to_analyze)):
-        graph_type = 'multi-graph'
-    elif '.MultiDiGraph' in str(type(graph_to_analyze)):
-        graph_type = 'multi-digraph'
-
-    # generate a report of the graph-algorithmic analysis
-    report.generate_analysis_report(networkx_graph, graph_type, graph_to_analyze, network_name)
-
-
-# analyze mixed graph:
-analyze_graph(graph, mixed_graph, 'Mixed Graph')
-
-# analyze all other subgraphs (link is the key, subgraph is the value):
-for link, subgraph in subgraphs.items():
-    analyze_graph(graph, subgraphs[link], link)
-
-
-# Visualize a graph. Here, network_name is the link label (advice, trust, etc.)
-def visualize_graph(networkx_graph, graph_to_visualize, network_name):
-    # fetch the graph type to pass it to the report generator below
-    # since some graph algorithms run on specific graph types
-    graph_type = ''
-    if '.Graph' in str(type(graph_to_visualize)):
-        graph_type = 'simple undirected'
-    elif '.DiGraph' in str(type(graph_to_visualize)):
-        graph_type = 'simple directed'
-    elif '.MultiGraph' in str(type(graph_to_visualize)):
-        graph_type = 'multi-graph'
-    elif '.MultiDiGraph' in str(type(graph_to_visualize)):
-        graph_type = 'multi-digraph'
-
-    # if simple graphs:
-    if graph_type in ('simple undirected', 'simple directed'):
-        # matplotlib (static):
-        draw_graph.build_static_network(networkx_graph, graph_to_visualize, graph_type, network_name)
-
-        # plotly (dynamic):
-    #    draw_graph.build_dynamic_network(networkx_graph, graph_to_visualize, graph_type, network_name)
-    else:  # multigraphs
-        # matplotlib (static):
-        draw_graph.build_static_multi_network(graph, mixed_graph, graph_type, network_name)
-
-        # plotly (dynamic):
-    #    draw_graph.build_dynamic_multi_network(graph, mixed_graph, graph_type, network_name)
-
-
-# visualize the mixed graph:
-visualize_graph(graph, mixed_graph, 'Mixed Graph')
-
-# visualize all other subgraphs (link is the key, subgraph is the value):
-for link, subgraph in subgraphs.items():
-    visualize_graph(graph, subgraphs[link], link)
+
+INPUT_DIRECTORY = './input'
+OUTPUT_DIRECTORY = './output'
+COMMANDS = ('ingest', 'analyze', 'render', 'all')
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description='Analyze and visualize an organizational link network.')
+    parser.add_argument('command', nargs='?', choices=COMMANDS, default='all',
+                        help='ingest only, ingest and analyze into the report, ingest and render, or all (default)')
+    parser.add_argument('--input', default=INPUT_DIRECTORY,
+                        help='directory of node.csv, link.csv and relationship.csv')
+    parser.add_argument('--output', default=OUTPUT_DIRECTORY,
+                        help='directory of the report, images, layout, metrics and cache')
+    parser.add_argument('--snapshot', nargs='?', const='', metavar='DIR',
+                        help='read the inputs through a memory-mapped snapshot (default DIR: OUTPUT/snapshot), '
+                             'rebuilt when the csv files change')
+    parser.add_argument('--relationships', nargs='+', metavar='LINK',
+                        help='only these link labels (e.g. Trust Advice)')
+    parser.add_argument('--added', metavar='FILE',
+                        help='relationship rows (in the relationship.csv format) to add to the inputs')
+    parser.add_argument('--removed', metavar='FILE',
+                        help='relationship rows (in the relationship.csv format) to remove from the inputs')
+    parser.add_argument('--workers', type=int, help='worker processes for analysis and rendering')
+    parser.add_argument('--no-cache', action='store_true', help='recompute (and re-render) everything')
+    parser.add_argument('--render-in-process', action='store_true',
+                        help='draw the images in this process, without the per-image timeout (for debugging)')
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help='profile every stage and keep cProfile dumps (in OUTPUT/profiles) of those slower '
+                             'than SECONDS')
+    parser.add_argument('--memory', action='store_true',
+                        help='also measure the peak traced memory of each stage (slower)')
+    return parser.parse_args(arguments)
+
+
+# read the source files (see ingest.py) and build the graphs:
+# original_graph stores the original undirected and directed edges,
+# mixed_graph normalizes all edges to directed. With a snapshot_directory, the csv files are
+# only parsed when the snapshot there is missing or out of date (see snapshot.py)
+def load(input_directory, relationships, metrics, snapshot_directory=None):
+    input_files = (os.path.join(input_directory, 'node.csv'),
+                   os.path.join(input_directory, 'link.csv'),
+                   os.path.join(input_directory, 'relationship.csv'))
+    with metrics.stage('ingest'):
+        if snapshot_directory is not None:
+            return snapshot.load_graphs(snapshot_directory, *input_files, relationships=relationships)
+        return ingest.load_graphs(*input_files, relationships=relationships)
+
+
+# the mixed graph, then each subgraph as (link, subgraph), built one at a time when needed
+def networks(mixed_graph, subgraphs, metrics):
+    yield 'Mixed Graph', mixed_graph
+    for link in subgraphs:
+        with metrics.stage('subgraph', link):
+            subgraph = subgraphs[link]
+        yield link, subgraph
+
+
+# analyze the mixed graph and all other subgraphs (link is the key, subgraph is the value)
+# across a pool of worker processes; the report keeps this order, and ends with how alike
+# the communities of the relationships are:
+# known_results are results already at hand, by network name (see scheduler.analyze_graphs)
+def analyze(mixed_graph, subgraphs, result_cache, metrics, sink, workers=None, known_results=None):
+    analysis_jobs = ((get_graph_type(graph_to_analyze), graph_to_analyze, network_name)
+                     for network_name, graph_to_analyze in networks(mixed_graph, subgraphs, metrics))
+
+    # keep only the communities of the compared relationships, out of those loaded
+    community_family = report.family_index('communities')
+    relationships = report.community_overlap_relationships(list(subgraphs))
+    partitions = {}
+
+    def keep_communities(network_name, family_reports):
+        if network_name in relationships:
+            partitions[network_name] = family_reports[community_family]['communities']
+
+    scheduler.analyze_graphs(analysis_jobs, workers=workers, result_cache=result_cache, metrics=metrics, sink=sink,
+                             on_report=keep_communities, known_results=known_results)
+    with metrics.stage('community overlap'):
+        report.write_community_overlap(partitions, sink, relationships)
+
+
+# render the mixed graph and all other subgraphs across a pool of headless worker processes
+# (see render.py), on one layout of all nodes, shared by every picture and saved for the next
+# run (see layout.py). Here, network_name is the link label (advice, trust, etc.)
+def render_images(mixed_graph, subgraphs, result_cache, metrics, output_directory, workers=None, in_process=None):
+    import render  # imports matplotlib and plotly, only needed here
+    from layout import LayoutService
+
+    with metrics.stage('layout'):
+        shared_pos = LayoutService(os.path.join(output_directory, 'layout.json')).layout(graph, mixed_graph)
+
+    render_jobs = ((get_graph_type(graph_to_visualize), graph_to_visualize, network_name)
+                   for network_name, graph_to_visualize in networks(mixed_graph, subgraphs, metrics))
+    return render.render_graphs(render_jobs, shared_pos, workers=workers, result_cache=result_cache,
+                                metrics=metrics, image_directory=output_directory, in_process=in_process)
+
+
+def main(arguments=None):
+    arguments = parse_arguments(arguments)
+    output_directory = arguments.output
+    os.makedirs(output_directory, exist_ok=True)
+    instrument.PROFILE_DIRECTORY = os.path.join(output_directory, 'profiles')
+    instrument.PROFILE_THRESHOLD = arguments.profile
+    instrument.TRACE_MEMORY = arguments.memory
+
+    # per-stage wall/CPU time and memory of this run (see instrument.py)
+    metrics = RunMetrics()
+    metrics_file = os.path.join(output_directory, 'metrics.json')
+    snapshot_directory = None if arguments.snapshot is None else \
+        arguments.snapshot or os.path.join(output_directory, 'snapshot')
+    nodes, links, original_graph, mixed_graph = load(arguments.input, arguments.relationships, metrics,
+                                                     snapshot_directory)
+
+    # apply the delta files to the graphs in place, keeping the cheap metrics of the mixed
+    # graph up to date for its analysis (see incremental.py)
+    incremental, known_results = None, None
+    if arguments.added or arguments.removed:
+        with metrics.stage('delta'):
+            incremental = IncrementalGraphs(nodes, links, original_graph, mixed_graph)
+            incremental.apply_delta_files(arguments.added, arguments.removed)
+            known_results = incremental.known_results()
+
+    # fetch a dictionary of sub-graphs for each link:
+    # key: link label, value: sub-graph (built on access from a single pass over the edges).
+    # 'all' analyzes and then renders every sub-graph, so each is built once and kept for both
+    subgraphs = LazySubgraphs(original_graph, links) if incremental is None else incremental.subgraphs
+    subgraphs.cache_size = len(links) if arguments.command == 'all' else 0
+
+    if arguments.command == 'ingest':
+        print(f'Mixed Graph: {mixed_graph}')
+        for link in subgraphs:
+            print(f'{link}: {subgraphs.number_of_edges(link)} edges')
+        if incremental is not None:
+            print(f'changed by the delta: {", ".join(sorted(incremental.stale_relationships))}, '
+                  f'{len(incremental.stale_components())} component(s) of the mixed graph')
+
+    # analysis results and rendered images are cached by graph fingerprint (see cache.py)
+    result_cache = ResultCache(os.path.join(output_directory, '.cache'), enabled=not arguments.no_cache)
+
+    if arguments.command in ('analyze', 'all'):
+        with ReportSink(os.path.join(output_directory, 'report.org'),
+                        os.path.join(output_directory, 'report.jsonl')) as sink:
+            analyze(mixed_graph, subgraphs, result_cache, metrics, sink, arguments.workers, known_results)
+            if arguments.command == 'all':
+                render_images(mixed_graph, subgraphs, result_cache, metrics, output_directory, arguments.workers,
+                              arguments.render_in_process)
+
+            # the run metrics, as the last section of the report:
+            metrics.write_report(sink, metrics_file)
+    elif arguments.command == 'render':
+        render_images(mixed_graph, subgraphs, result_cache, metrics, output_directory, arguments.workers,
+                      arguments.render_in_process)
+
+    metrics.write_json(metrics_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# The mixed graph (all relationships normalized to directed edges): a networkx MultiDiGraph in
+# which an undirected relationship is a pair of opposite edges, added right after each other, and
+# a directed one a single edge, as networkx would store them, so lookups stay dict lookups.
+# The edge data is stored once per relationship label and weight instead of once per edge: every
+# edge of a kind of link references the same read-only EdgeData, and the two edges of an
+# undirected relationship share one EdgeData object of their own (equal to the directed one, not
+# the same object), which is how remove_link tells them apart.
+# The graph changes through add_nodes, add_links, add_link and remove_link
+from copy import deepcopy
+import networkx as graph
+import numpy as np
+import pandas as pd
+
+
+# the data of an edge, shared by all edges of one relationship label and weight, hence
+# read-only; copies are plain dicts
+class EdgeData(dict):
+    def __read_only(self, *args, **kwargs):
+        raise TypeError('edge data of the mixed graph is read-only')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = __read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return dict(self)
+
+    def __reduce__(self):
+        return EdgeData, (dict(self),)
+
+
+class MixedGraph(graph.MultiDiGraph):
+    def __init__(self):
+        super().__init__()
+        # (label, weight) -> code, and the (directed, bidirectional) EdgeData of each code
+        self.__relationship_codes = {}
+        self.__edge_data = []
+
+    # named as the MultiDiGraph it is, so reports and image files keep their names
+    def __str__(self):
+        return super().__str__().replace(type(self).__name__, 'MultiDiGraph', 1)
+
+    # copies are plain MultiDiGraphs, with edge data of their own
+    def copy(self, as_view=False):
+        return graph.graphviews.generic_graph_view(self) if as_view else graph.MultiDiGraph(self)
+
+    def reverse(self, copy=True):
+        if not copy:
+            return graph.reverse_view(self)
+        reversed_graph = graph.MultiDiGraph()
+        reversed_graph.graph.update(deepcopy(self.graph))
+        reversed_graph.add_nodes_from((node, deepcopy(data)) for node, data in self._node.items())
+        reversed_graph.add_edges_from((v, u, key, dict(data)) for u, v, key, data in self.edges(keys=True, data=True))
+        return reversed_graph
+
+    def __changed(self):
+        self.__networkx_cache__.clear()
+
+    def __add_node(self, node):
+        self._succ[node] = self.adjlist_inner_dict_factory()
+        self._pred[node] = self.adjlist_inner_dict_factory()
+        self._node[node] = self.node_attr_dict_factory()
+
+    # add nodes from (node, data) pairs, updating the data of nodes already there
+    def add_nodes(self, nodes):
+        for node, data in nodes:
+            if node not in self._node:
+                self.__add_node(node)
+            self._node[node].update(data)
+        self.__changed()
+
+    # the (directed, bidirectional) EdgeData of a relationship label and weight
+    def __relationship_data(self, label, weight):
+        code = self.__relationship_codes.get((label, weight))
+        if code is None:
+            code = self.__relationship_codes[(label, weight)] = len(self.__edge_data)
+            self.__edge_data.append(tuple(EdgeData(directed=True, weight=weight, relationship=label)
+                                          for bidirectional in (False, True)))
+        return self.__edge_data[code]
+
+    # the next edge from u to v with the given data, keyed as networkx would key it
+    def __add_edge(self, u, v, data):
+        keydict = self._succ[u].get(v)
+        if keydict is None:
+            self._succ[u][v] = self._pred[v][u] = {0: data}  # the key dict is shared, as in networkx
+            return
+        key = len(keydict)
+        while key in keydict:
+            key += 1
+        keydict[key] = data
+
+    # add links in bulk: arrays (or lists) of source and target nodes, relationship labels,
+    # weights and bidirectional flags; new nodes are added in order of first appearance
+    def add_links(self, sources, targets, relationships, weights, bidirectional):
+        if len(sources) == 0:
+            return
+        endpoints = np.empty(2 * len(sources), dtype=object)
+        endpoints[0::2], endpoints[1::2] = sources, targets
+        for node in pd.unique(endpoints).tolist():
+            if node not in self._node:
+                self.__add_node(node)
+
+        relationship_df = pd.DataFrame({'label': relationships, 'weight': weights})
+        groups = relationship_df.groupby(['label', 'weight'], sort=False, dropna=False).ngroup().tolist()
+        first = relationship_df[~relationship_df.duplicated()]
+        edge_data = [self.__relationship_data(label, weight) for label, weight in
+                     zip(first['label'].tolist(), first['weight'].tolist())]
+
+        add_edge = self.__add_edge
+        for u, v, group, is_bidirectional in zip(endpoints[0::2].tolist(), endpoints[1::2].tolist(), groups,
+                                                 np.asarray(bidirectional, dtype=bool).tolist()):
+            data = edge_data[group][is_bidirectional]
+            add_edge(u, v, data)
+            if is_bidirectional:
+                add_edge(v, u, data)
+        self.__changed()
+
+    # add one link
+    def add_link(self, source, target, relationship, weight, bidirectional):
+        for node in (source, target):
+            if node not in self._node:
+                self.__add_node(node)
+        data = self.__relationship_data(relationship, weight)[bool(bidirectional)]
+        self.__add_edge(source, target, data)
+        if bidirectional:
+            self.__add_edge(target, source, data)
+        self.__changed()
+
+    # remove the first link from source to target (either way, if bidirectional) with the given
+    # relationship label and flag; returns whether there was one
+    def remove_link(self, source, target, relationship, bidirectional):
+        edge_data = [self.__edge_data[code][bool(bidirectional)]
+                     for (label, weight), code in self.__relationship_codes.items() if label == relationship]
+        key = self.__find_key(source, target, edge_data)
+        if key is None:
+            return False
+        data = self._succ[source][target][key]
+        self.__remove_edge(source, target, key)
+        if bidirectional:
+            self.__remove_edge(target, source, self.__find_key(target, source, [data]))
+        self.__changed()
+        return True
+
+    # the key of the first edge from u to v with one of the given EdgeData objects, or None
+    def __find_key(self, u, v, edge_data):
+        for key, data in self._succ.get(u, {}).get(v, {}).items():
+            if any(data is link_data for link_data in edge_data):
+                return key
+        return None
+
+    def __remove_edge(self, u, v, key):
+        keydict = self._succ[u][v]
+        del keydict[key]
+        if not keydict:
+            del self._succ[u][v], self._pred[v][u]
@@ -4,5 +4,7 @@ from entity import Entity
 
 
 class Node(Entity):
+    __slots__ = ()
+
     def __init__(self, label, **kwargs):
         super().__init__(label, **kwargs)
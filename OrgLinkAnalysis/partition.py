@@ -0,0 +1,77 @@
+# Partition the edges of a graph by relationship (link label) in a single traversal,
+# and hand out per-relationship sub-graphs that are only built when asked for
+from collections import OrderedDict
+from collections.abc import Mapping
+import networkx as graph
+
+
+# bucket the edges of main_graph by their 'relationship' attribute in one pass;
+# the buckets map (u, v, key) to a reference to the edge data, not a copy
+def partition_edges(main_graph):
+    edge_buckets = {}
+    for u, v, key, data in main_graph.edges(keys=True, data=True):
+        edge_buckets.setdefault(data.get('relationship'), {})[(u, v, key)] = data
+
+    return edge_buckets
+
+
+# Return a sub-graph, as Graph or DiGraph (simple undirected or directed graph),
+# from a bucket of edges; node_rank keeps the node order of the main graph
+def build_subgraph(edges, is_directed, node_rank):
+    sub_graph = graph.DiGraph() if is_directed else graph.Graph()
+
+    bucket_nodes = {node for u, v, key in edges for node in (u, v)}
+    sub_graph.add_nodes_from(sorted(bucket_nodes, key=node_rank.__getitem__))
+    sub_graph.add_edges_from((u, v, data) for (u, v, key), data in edges.items())
+
+    return sub_graph
+
+
+# A read-only dictionary of sub-graphs for each link: key: link label, value: sub-graph.
+# Each sub-graph is materialized on access, and by default not kept: every access builds it
+# again, so a run only ever holds the sub-graph currently being analyzed or rendered.
+# With cache_size, the last cache_size sub-graphs built are kept and handed out again (the
+# same object, so callers must not change it) until an edge of their relationship changes
+class LazySubgraphs(Mapping):
+    def __init__(self, main_graph, links, cache_size=0):
+        self.cache_size = cache_size
+        self.__cache = OrderedDict()
+        self.__links = {}
+        for link in links:
+            self.__links.setdefault(link.label, link)
+        self.__node_rank = {node: rank for rank, node in enumerate(main_graph)}
+        self.__edge_buckets = partition_edges(main_graph)
+
+    def __getitem__(self, relationship):
+        link = self.__links[relationship]
+        if relationship in self.__cache:
+            self.__cache.move_to_end(relationship)
+            return self.__cache[relationship]
+
+        sub_graph = build_subgraph(self.__edge_buckets.get(relationship, {}), link.directed, self.__node_rank)
+        if self.cache_size > 0:
+            self.__cache[relationship] = sub_graph
+            while len(self.__cache) > self.cache_size:
+                self.__cache.popitem(last=False)
+        return sub_graph
+
+    def __iter__(self):
+        return iter(self.__links)
+
+    def __len__(self):
+        return len(self.__links)
+
+    # the number of input edges of a relationship, without building its sub-graph
+    def number_of_edges(self, relationship):
+        return len(self.__edge_buckets.get(relationship, {}))
+
+    # keep the buckets in step with edges added to or removed from the main graph
+    def add_edge(self, u, v, key, data):
+        for node in (u, v):
+            self.__node_rank.setdefault(node, len(self.__node_rank))
+        self.__edge_buckets.setdefault(data.get('relationship'), {})[(u, v, key)] = data
+        self.__cache.pop(data.get('relationship'), None)
+
+    def remove_edge(self, u, v, key, relationship):
+        self.__edge_buckets.get(relationship, {}).pop((u, v, key), None)
+        self.__cache.pop(relationship, None)
@@ -0,0 +1,188 @@
+# Headless image rendering stage: the static (and optionally dynamic) visualization of the
+# mixed graph and of every relationship sub-graph is drawn in its own worker process, on a
+# non-interactive matplotlib backend, with at most RENDER_WORKERS images in flight. An image
+# that takes longer than RENDER_TIMEOUT seconds is abandoned (its process is terminated), and
+# graphs above RENDER_MAX_NODES nodes are drawn on their top nodes by degree only. Even with one
+# worker each image is drawn in a child process, so the timeout holds; RENDER_IN_PROCESS draws
+# them in this process instead, with no timeout (e.g. for debugging)
+import matplotlib
+
+matplotlib.use('Agg')  # before pyplot is first imported (by graph_viz)
+
+from cache import ResultCache, graph_fingerprint, module_settings
+import graph_viz as draw_graph
+from instrument import measured_call
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+import networkx as graph
+
+RENDER_WORKERS = os.cpu_count() or 1
+RENDER_TIMEOUT = 600  # seconds per image
+RENDER_MAX_NODES = 5000  # larger graphs are downsampled to their top nodes by degree
+RENDER_DYNAMIC = False  # also write the plotly html of each graph
+RENDER_IN_PROCESS = False  # draw in this process, one image at a time and without a timeout
+
+# fork where available: the workers inherit the graphs instead of receiving pickled copies
+POOL_CONTEXT = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() \
+    else multiprocessing.get_context()
+
+
+# the sub-graph induced by the max_nodes nodes of highest degree (ties keep the graph's node
+# order), or the graph itself if it is small enough
+def downsample(graph_to_render, max_nodes=RENDER_MAX_NODES):
+    if max_nodes is None or graph_to_render.number_of_nodes() <= max_nodes:
+        return graph_to_render
+
+    degree = dict(graph_to_render.degree())
+    ranked = sorted(graph_to_render, key=lambda node: -degree[node])
+    top_nodes = set(ranked[:max_nodes])
+    return graph_to_render.subgraph([node for node in graph_to_render if node in top_nodes])
+
+
+# the files a graph's rendering writes, named after the full (not downsampled) graph,
+# since the report links to them
+def output_files(graph_to_render, network_name, dynamic=RENDER_DYNAMIC,
+                 image_directory=draw_graph.IMAGE_DIRECTORY):
+    files = [draw_graph.image_file_path(graph_to_render, network_name, image_directory)]
+    if dynamic:
+        files.append(draw_graph.html_file_path(graph_to_render, network_name, image_directory))
+    return files
+
+
+# draw one graph (in a worker process)
+def render_graph(graph_type, graph_to_render, network_name, pos, files):
+    graph_to_draw = downsample(graph_to_render, RENDER_MAX_NODES)
+    if graph_to_draw is not graph_to_render:
+        network_name = f'{network_name}, top {graph_to_draw.number_of_nodes()} of ' \
+                       f'{graph_to_render.number_of_nodes()} nodes by degree'
+
+    # if simple graphs:
+    if graph_type in ('simple undirected', 'simple directed'):
+        # matplotlib (static):
+        draw_graph.build_static_network(graph, graph_to_draw, graph_type, network_name, pos, files[0])
+
+        # plotly (dynamic):
+        if len(files) > 1:
+            draw_graph.build_dynamic_network(graph, graph_to_draw, graph_type, network_name, pos, files[1])
+    else:  # multigraphs
+        # matplotlib (static):
+        draw_graph.build_static_multi_network(graph, graph_to_draw, graph_type, network_name, pos, files[0])
+
+        # plotly (dynamic):
+        if len(files) > 1:
+            draw_graph.build_dynamic_multi_network(graph, graph_to_draw, graph_type, network_name, pos, files[1])
+
+
+# draw one graph as a measured stage in a worker process, and send its stage record back
+def render_graph_process(record_sender, graph_type, graph_to_render, network_name, pos, files):
+    result, record = measured_call('render', network_name, render_graph, graph_type, graph_to_render, network_name,
+                                   pos, files)
+    record_sender.send(record)
+    record_sender.close()
+
+
+# render (graph type, graph, network name) jobs with the shared node positions pos; jobs can be
+# a lazy iterator. Images found in the result cache (keyed by the graph's fingerprint, the
+# positions and the drawing settings) are restored instead of drawn again.
+# Returns {network name: 'rendered', 'cached', 'failed' or 'timed out'}; the stage records of
+# the rendered graphs are added to metrics (an instrument.RunMetrics), if given. The files
+# go to image_directory (graph_viz.IMAGE_DIRECTORY by default). With in_process
+# (RENDER_IN_PROCESS by default), the images are drawn here, with no timeout
+def render_graphs(render_jobs, pos, workers=None, timeout=RENDER_TIMEOUT, result_cache=None, metrics=None,
+                  image_directory=None, in_process=None):
+    image_directory = draw_graph.IMAGE_DIRECTORY if image_directory is None else image_directory
+    workers = max(1, RENDER_WORKERS if workers is None else workers)
+    in_process = RENDER_IN_PROCESS if in_process is None else in_process
+    result_cache = ResultCache() if result_cache is None else result_cache
+
+    status = {}
+    # process sentinel -> (process, deadline, network name, files, cache key, record receiver)
+    running = {}
+    try:
+        for graph_type, graph_to_render, network_name in render_jobs:
+            files = output_files(graph_to_render, network_name, RENDER_DYNAMIC, image_directory)
+            cache_key = result_cache.key(graph_fingerprint(graph_to_render), graph_type, network_name, 'static',
+                                         module_settings(draw_graph), RENDER_MAX_NODES, RENDER_DYNAMIC,
+                                         [pos[node] for node in graph_to_render]) if result_cache.enabled else None
+            if cache_key is not None and all(result_cache.restore_file(cache_key, file) for file in files):
+                status[network_name] = 'cached'
+                continue
+
+            if in_process:
+                status[network_name] = render_in_process(graph_type, graph_to_render, network_name, pos, files,
+                                                         result_cache, cache_key, metrics)
+                continue
+
+            while len(running) >= workers:
+                wait_for_renders(running, status, result_cache, metrics)
+            record_receiver, record_sender = POOL_CONTEXT.Pipe(duplex=False)
+            process = POOL_CONTEXT.Process(target=render_graph_process,
+                                           args=(record_sender, graph_type, graph_to_render, network_name, pos, files))
+            process.start()
+            record_sender.close()  # the worker holds the sending end now
+            running[process.sentinel] = (process, time.monotonic() + timeout, network_name, files, cache_key,
+                                         record_receiver)
+
+        while running:
+            wait_for_renders(running, status, result_cache, metrics)
+    finally:
+        for process, deadline, network_name, files, cache_key, record_receiver in running.values():
+            process.terminate()
+            process.join()
+            record_receiver.close()
+
+    return status
+
+
+# draw one graph in this process; returns its status, 'rendered' or 'failed'
+def render_in_process(graph_type, graph_to_render, network_name, pos, files, result_cache, cache_key, metrics=None):
+    try:
+        result, record = measured_call('render', network_name, render_graph, graph_type, graph_to_render,
+                                       network_name, pos, files)
+    except Exception as error:
+        print(f'rendering {network_name} failed ({error!r})', file=sys.stderr)
+        return 'failed'
+    store_files(result_cache, cache_key, files)
+    if metrics is not None:
+        metrics.add(record)
+    return 'rendered'
+
+
+# wait until at least one render finishes or times out, and collect it
+def wait_for_renders(running, status, result_cache, metrics=None):
+    next_deadline = min(deadline for process, deadline, network_name, files, cache_key, record_receiver
+                        in running.values())
+    multiprocessing.connection.wait(list(running), timeout=max(0, next_deadline - time.monotonic()))
+
+    now = time.monotonic()
+    for sentinel, (process, deadline, network_name, files, cache_key, record_receiver) in list(running.items()):
+        if process.is_alive() and deadline > now:
+            continue
+
+        del running[sentinel]
+        if process.is_alive():
+            process.terminate()
+            process.join()
+            status[network_name] = 'timed out'
+            print(f'rendering {network_name} timed out', file=sys.stderr)
+        elif process.exitcode != 0:
+            process.join()
+            status[network_name] = 'failed'
+            print(f'rendering {network_name} failed (exit code {process.exitcode})', file=sys.stderr)
+        else:
+            process.join()
+            store_files(result_cache, cache_key, files)
+            status[network_name] = 'rendered'
+            if metrics is not None and record_receiver.poll():
+                metrics.add(record_receiver.recv())
+        record_receiver.close()
+
+
+def store_files(result_cache, cache_key, files):
+    if cache_key is None:
+        return
+    for file in files:
+        result_cache.store_file(cache_key, file)
@@ -1,59 +1,444 @@
 # output of graph algorithms into an org-mode file for report generation
+from betweenness import parallel_betweenness_centrality
+import communities
+from datetime import datetime
+import heapq
+import json
+import math
+import os
+import random
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse import csgraph
+import shutil
+import spectral
+import time
 
 REPORT_FILE = './output/report.org'
+# the written part of the report (theoretical background and setup), which a new report starts with
+REPORT_PREAMBLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_preamble.org')
+# machine-readable companion of the report, with the full per-node metrics (JSON Lines)
+REPORT_DATA_FILE = './output/report.jsonl'
+# per-node tables in the org report are truncated to the top k nodes
+REPORT_TOP_K = 10
+REPORT_BUFFER_SIZE = 1024 * 1024
+# per-analysis results keyed by value (not by node), written in full
+DISTRIBUTION_METRICS = ('eccentricity_distribution', 'path_length_histogram')
+
+# above either size, analyze_centrality switches from exact to sampled (pivot-based)
+# betweenness and closeness centrality
+APPROXIMATE_CENTRALITY_NODES = 10000
+APPROXIMATE_CENTRALITY_EDGES = 200000
+# number of sampled pivot nodes; if None, it is derived from CENTRALITY_TARGET_ERROR
+CENTRALITY_SAMPLE_SIZE = None
+CENTRALITY_TARGET_ERROR = 0.05
+CENTRALITY_SEED = 42
+# above this size, exact betweenness is split across worker processes (see betweenness.py)
+PARALLEL_BETWEENNESS_NODES = 1000
+
+# the BFS sweep of all nodes (see AnalysisContext.distance_sweep) runs on blocks of sources,
+# holding this many distances at a time (float64: 32 MiB)
+SWEEP_BLOCK_ENTRIES = 2 ** 22
+
+# seconds that the edge connectivity of a multi-graph may take; when they run out, lower and
+# upper bounds are reported instead of the exact value. None runs to the exact value
+EDGE_CONNECTIVITY_TIME_BUDGET = 60.0
+# metrics only found in family reports cut short by a time budget, which are not cached
+PARTIAL_RESULT_METRICS = ('edge connectivity lower bound', 'edge connectivity upper bound')
+
+# relationships whose communities are compared with each other (see write_community_overlap);
+# None compares every loaded relationship
+COMMUNITY_OVERLAP_RELATIONSHIPS = None
+
+# path analysis mode: 'stream' runs one BFS per source and keeps only aggregates (memory O(N)),
+# 'full' also keeps all shortest paths between all pairs of nodes (memory O(N^2), small graphs only)
+PATH_ANALYSIS_MODE = 'stream'
+# in stream mode, keep the full shortest paths only from these source nodes (node labels)
+PATH_SOURCES = []
+
+
+# Given a graph, fetch the graph type to pass it to the report generator
+# since some graph algorithms run on specific graph types
+def get_graph_type(graph_to_analyze):
+    if graph_to_analyze.is_multigraph():
+        return 'multi-digraph' if graph_to_analyze.is_directed() else 'multi-graph'
+    return 'simple directed' if graph_to_analyze.is_directed() else 'simple undirected'
+
+
+# intermediate results of one graph, shared by the analysis families that run on it: each is
+# computed on first use and then kept (components, connectivity, the undirected projection,
+# degrees, the weighted adjacency matrix, directed triplets and one BFS sweep from every node).
+# known_results, if given, are results already at hand by name (e.g. maintained by incremental.py)
+class AnalysisContext:
+    def __init__(self, graph, mixed_graph, known_results=None):
+        self.graph = graph
+        self.mixed_graph = mixed_graph
+        self.__results = dict(known_results or {})
+
+    # the result of compute(), computed only the first time name is asked for
+    def memoized(self, name, compute):
+        if name not in self.__results:
+            self.__results[name] = compute()
+        return self.__results[name]
+
+    def connected_components(self):
+        return self.memoized('CC', lambda: list(self.graph.connected_components(self.mixed_graph)))
+
+    def strongly_connected_components(self):
+        return self.memoized('SCC', lambda: list(self.graph.strongly_connected_components(self.mixed_graph)))
+
+    def weakly_connected_components(self):
+        return self.memoized('WCC', lambda: list(self.graph.weakly_connected_components(self.mixed_graph)))
+
+    # from the components; networkx raises on the null graph, so that is left to it
+    def is_strongly_connected(self):
+        if len(self.mixed_graph) == 0:
+            return self.graph.is_strongly_connected(self.mixed_graph)
+        return len(self.strongly_connected_components()) == 1
+
+    def is_weakly_connected(self):
+        if len(self.mixed_graph) == 0:
+            return self.graph.is_weakly_connected(self.mixed_graph)
+        return len(self.weakly_connected_components()) == 1
+
+    def undirected(self):
+        return self.memoized('undirected', self.mixed_graph.to_undirected)
+
+    def degrees(self):
+        return self.memoized('degrees', lambda: dict(self.mixed_graph.degree()))
+
+    def in_degrees(self):
+        return self.memoized('in degrees', lambda: dict(self.mixed_graph.in_degree()))
+
+    def out_degrees(self):
+        return self.memoized('out degrees', lambda: dict(self.mixed_graph.out_degree()))
+
+    # (nodes, adjacency) of spectral.weighted_adjacency
+    def weighted_adjacency(self):
+        return self.memoized('weighted adjacency', lambda: spectral.weighted_adjacency(self.mixed_graph))
+
+    # (nodes, closed triplets, possible triplets) of count_directed_triplets
+    def directed_triplets(self):
+        return self.memoized('directed triplets',
+                             lambda: count_directed_triplets(self.mixed_graph, self.weighted_adjacency()))
+
+    # one BFS from every node, keeping aggregates only (memory O(N)): per source, the number of
+    # other nodes it reaches and its eccentricity; per target, the number of other nodes reaching
+    # it and the sum of their distances to it; the histogram and total of all path lengths
+    def distance_sweep(self):
+        return self.memoized('distance sweep', self.__distance_sweep)
+
+    # the BFS runs in scipy, on the binary adjacency matrix, for blocks of sources at a time
+    def __distance_sweep(self):
+        nodes, adjacency = self.weighted_adjacency()
+        adjacency = adjacency.copy()
+        adjacency.data[:] = 1  # every edge, whatever its weight, is one hop
+
+        number_of_nodes = len(nodes)
+        reach = np.zeros(number_of_nodes, dtype=np.int64)
+        eccentricity = np.zeros(number_of_nodes, dtype=np.int64)
+        in_reach = np.full(number_of_nodes, -1, dtype=np.int64)  # not counting the node itself
+        in_distance = np.zeros(number_of_nodes, dtype=np.int64)
+        path_length_histogram = np.zeros(1, dtype=np.int64)
+        block_size = max(1, SWEEP_BLOCK_ENTRIES // max(number_of_nodes, 1))
+        for start in range(0, number_of_nodes, block_size):
+            sources = np.arange(start, min(start + block_size, number_of_nodes))
+            distances = csgraph.shortest_path(adjacency, method='D', unweighted=True, indices=sources)
+            reached = np.isfinite(distances)
+            distances = np.where(reached, distances, 0).astype(np.int64)
+
+            reach[sources] = reached.sum(axis=1) - 1
+            eccentricity[sources] = distances.max(axis=1)
+            in_reach += reached.sum(axis=0)
+            in_distance += distances.sum(axis=0)
+            block_histogram = np.bincount(distances[distances > 0])
+            if len(block_histogram) > len(path_length_histogram):
+                path_length_histogram = np.pad(path_length_histogram,
+                                               (0, len(block_histogram) - len(path_length_histogram)))
+            path_length_histogram[:len(block_histogram)] += block_histogram
+
+        return {'reach': dict(zip(nodes, reach.tolist())),
+                'eccentricity': dict(zip(nodes, eccentricity.tolist())),
+                'in_reach': dict(zip(nodes, in_reach.tolist())),
+                'in_distance': dict(zip(nodes, in_distance.tolist())),
+                'path_length_histogram': {length: count for length, count in
+                                          enumerate(path_length_histogram.tolist()) if count > 0},
+                'total_length': int(in_distance.sum())}
+
+    # as graph.degree_centrality
+    def degree_centrality(self):
+        degrees = self.degrees()
+        if len(degrees) <= 1:
+            return {node: 1 for node in degrees}
+        scale = 1.0 / (len(degrees) - 1.0)
+        return {node: degree * scale for node, degree in degrees.items()}
+
+    # as graph.closeness_centrality (incoming distances, Wasserman-Faust scaling), from the sweep
+    def closeness_centrality(self):
+        sweep = self.distance_sweep()
+        number_of_nodes = len(self.mixed_graph)
+        closeness = {}
+        for node in self.mixed_graph:
+            reached_by, distance_sum = sweep['in_reach'][node], sweep['in_distance'][node]
+            closeness[node] = 0.0
+            if distance_sum > 0 and number_of_nodes > 1:
+                closeness[node] = reached_by / distance_sum * (reached_by / (number_of_nodes - 1))
+        return closeness
+
+    # as graph.average_shortest_path_length (which raises unless every node reaches every
+    # other node), from the sweep
+    def average_shortest_path_length(self):
+        number_of_nodes = len(self.mixed_graph)
+        if number_of_nodes == 0:
+            return self.graph.average_shortest_path_length(self.mixed_graph)
+        if number_of_nodes == 1:
+            return 0
+        sweep = self.distance_sweep()
+        if sum(sweep['reach'].values()) != number_of_nodes * (number_of_nodes - 1):
+            raise self.graph.NetworkXError('Graph is not strongly connected.' if self.mixed_graph.is_directed()
+                                           else 'Graph is not connected.')
+        return sweep['total_length'] / (number_of_nodes * (number_of_nodes - 1))
+
+
+# the number of pivots for sampled centrality: O(log(n) / error^2) pivots estimate
+# the (normalized) centralities within +/- error with high probability
+def centrality_sample_size(number_of_nodes, sample_size=None, target_error=None):
+    if sample_size is None:
+        target_error = CENTRALITY_TARGET_ERROR if target_error is None else target_error
+        sample_size = math.ceil(math.log(max(number_of_nodes, 2)) / target_error ** 2)
+    return max(1, min(sample_size, number_of_nodes))
+
+
+# the estimated error of sampled centrality for a given number of pivots
+def centrality_sample_error(number_of_nodes, sample_size):
+    if sample_size >= number_of_nodes:
+        return 0.0
+    return math.sqrt(math.log(max(number_of_nodes, 2)) / sample_size)
+
+
+# closeness centrality estimated from BFS runs out of sampled pivot nodes only (Eppstein-Wang);
+# like networkx, this uses incoming distances and the Wasserman-Faust scaling for
+# nodes that are not reached by every other node
+def sampled_closeness_centrality(graph, mixed_graph, pivots):
+    distance_sum = dict.fromkeys(mixed_graph, 0)
+    reached_by = dict.fromkeys(mixed_graph, 0)
+    for pivot in pivots:
+        for node, distance in graph.single_source_shortest_path_length(mixed_graph, pivot).items():
+            if distance > 0:
+                distance_sum[node] += distance
+                reached_by[node] += 1
+
+    pivots = set(pivots)
+    closeness = {}
+    for node in mixed_graph:
+        other_pivots = len(pivots) - (node in pivots)
+        if reached_by[node] == 0 or other_pivots == 0:
+            closeness[node] = 0.0
+        else:
+            # fraction of nodes reaching this node / their average distance to it
+            closeness[node] = (reached_by[node] / other_pivots) / (distance_sum[node] / reached_by[node])
+
+    return closeness
 
 
-def analyze_centrality(graph, graph_type, mixed_graph):
+# the analyze_* functions share intermediate results through context (an AnalysisContext of
+# mixed_graph); without one, each makes its own
+def analyze_centrality(graph, graph_type, mixed_graph, context=None):
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
     centrality_analysis = {}
 
-    centrality_analysis['degree'] = graph.degree_centrality(mixed_graph)
+    centrality_analysis['degree'] = context.degree_centrality()
+
+    # eigenvector and PageRank centrality by sparse linear algebra, for all graph types:
+    # parallel edges are collapsed into one entry weighted by the sum of their Link weights,
+    # and the weighted in-degree warm-starts the iterations
+    nodes, adjacency = context.weighted_adjacency()
+    in_weight = np.asarray(adjacency.sum(axis=0)).ravel() + 1.0
+    centrality_analysis['eigenvector'] = spectral.eigenvector_centrality(nodes, adjacency, warm_start=in_weight)
+    centrality_analysis['pagerank'] = spectral.pagerank(nodes, adjacency, warm_start=in_weight)
+
+    number_of_nodes = mixed_graph.number_of_nodes()
+    if number_of_nodes > APPROXIMATE_CENTRALITY_NODES or mixed_graph.number_of_edges() > APPROXIMATE_CENTRALITY_EDGES:
+        # sampled betweenness (Brandes-Pich) and closeness over k pivot nodes:
+        sample_size = centrality_sample_size(number_of_nodes, CENTRALITY_SAMPLE_SIZE)
+        pivots = random.Random(CENTRALITY_SEED).sample(list(mixed_graph), sample_size)
+
+        centrality_analysis['closeness'] = sampled_closeness_centrality(graph, mixed_graph, pivots)
 
-    if graph_type in ('simple directed', 'simple undirected'):
-        try:
-            centrality_analysis['eigenvector'] = graph.eigenvector_centrality(mixed_graph)
-        except graph.PowerIterationFailedConvergence:
-            centrality_analysis['eigenvector'] = 'power iteration convergence failure for eigenvector'
+        centrality_analysis['betweenness'] = graph.betweenness_centrality(mixed_graph, k=sample_size,
+                                                                          seed=CENTRALITY_SEED)
+
+        centrality_analysis['mode'] = 'approximate'
+        centrality_analysis['sample size'] = sample_size
+        centrality_analysis['estimated error'] = centrality_sample_error(number_of_nodes, sample_size)
     else:
-        centrality_analysis['eigenvector'] = 'no eigenvector for mixed graphs'
+        centrality_analysis['closeness'] = context.closeness_centrality()
 
-    centrality_analysis['closeness'] = graph.closeness_centrality(mixed_graph)
+        if number_of_nodes > PARALLEL_BETWEENNESS_NODES:
+            centrality_analysis['betweenness'] = parallel_betweenness_centrality(mixed_graph)
+        else:
+            centrality_analysis['betweenness'] = graph.betweenness_centrality(mixed_graph)
 
-    centrality_analysis['betweenness'] = graph.betweenness_centrality(mixed_graph)
+        centrality_analysis['mode'] = 'exact'
+        centrality_analysis['estimated error'] = 0.0
 
     return centrality_analysis
 
 
-def analyze_connectivity(graph, graph_type, mixed_graph):
+# True if a strongly connected digraph, given by its csr matrix of arcs (an undirected graph has
+# arcs both ways), stays strongly connected without any one of its arcs, i.e. has no strong
+# bridge. With every arc u -> v split in two (u -> midpoint -> v), the arc is a bridge from node 0
+# if its midpoint dominates v; the strong bridges are the bridges from node 0 in the digraph and
+# in its reverse (Italiano, Laura and Santaroni). Costs two dominator trees, O(E) nodes each.
+# None (undecided) if the deadline (a time.perf_counter() value) has passed before either of them
+def has_no_strong_bridge(graph, arcs, deadline=None):
+    entries = arcs.tocoo()
+    midpoints = (arcs.shape[0] + np.arange(len(entries.row))).tolist()
+    for sources, targets in ((entries.row.tolist(), entries.col.tolist()), (entries.col.tolist(), entries.row.tolist())):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        split_graph = graph.DiGraph()
+        split_graph.add_edges_from(zip(sources, midpoints))
+        split_graph.add_edges_from(zip(midpoints, targets))
+        dominators = graph.immediate_dominators(split_graph, 0)
+        if any(dominators.get(target) == midpoint for target, midpoint in zip(targets, midpoints)):
+            return False
+    return True
+
+
+# (lower, upper) bounds of the edge connectivity of a multi-graph or multi-digraph, counting parallel
+# edges once, as graph.edge_connectivity does. Cheap checks come first: 0 unless (strongly)
+# connected, at most the fewest distinct in- or out-neighbors of any node, and 1 if an edge is a
+# bridge (see has_no_strong_bridge), otherwise at least 2. Only then do max flows run (in scipy,
+# on unit capacities), from each node to the next around a cycle of all nodes: every cut
+# separates some node from the next. The bounds are equal (exact) unless time_budget seconds run
+# out first, which is checked between the steps; a partial cycle of flows only lowers the upper
+# bound, so the lower bound is then 2, or 1 if the time ran out before the bridge check was done
+def edge_connectivity_bounds(graph, mixed_graph, context, time_budget=None):
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    if len(mixed_graph) <= 1:  # as networkx has it (it raises for these)
+        edge_connectivity = graph.edge_connectivity(mixed_graph)
+        return edge_connectivity, edge_connectivity
+    if mixed_graph.is_directed():
+        is_connected = context.is_strongly_connected()
+    else:
+        is_connected = len(context.connected_components()) == 1
+    if not is_connected:
+        return 0, 0
+
+    # a unit capacity from each node to each of its distinct neighbors (both ways if undirected)
+    nodes, adjacency = context.weighted_adjacency()
+    entries = adjacency.tocoo()
+    arcs = entries.row != entries.col
+    capacity = sparse.csr_matrix((np.ones(np.count_nonzero(arcs), dtype=np.int32),
+                                  (entries.row[arcs], entries.col[arcs])), shape=adjacency.shape)
+    out_neighbors, in_neighbors = np.diff(capacity.indptr), np.diff(capacity.tocsc().indptr)
+    lower, upper = 1, int(min(out_neighbors.min(), in_neighbors.min()))
+    if upper > lower:
+        no_strong_bridge = has_no_strong_bridge(graph, capacity, deadline)
+        if no_strong_bridge is None:
+            return lower, upper
+        if not no_strong_bridge:
+            return 1, 1
+        lower = 2
+
+    for index in range(len(nodes)):
+        if upper == lower:
+            break
+        if deadline is not None and time.perf_counter() > deadline:
+            return lower, upper
+        upper = min(upper, int(csgraph.maximum_flow(capacity, index, (index + 1) % len(nodes)).flow_value))
+    return upper, upper
+
+
+# True if a family report was cut short by a time budget, so a run with more time may complete it
+def is_partial(family_report):
+    return any(metric in family_report for metric in PARTIAL_RESULT_METRICS)
+
+
+def analyze_connectivity(graph, graph_type, mixed_graph, context=None):
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
     connectivity_analysis = {}
 
     if graph_type == 'simple undirected':
         # Find connected components
-        connectivity_analysis['connected components'] = list(graph.connected_components(mixed_graph))
+        connectivity_analysis['connected components'] = context.connected_components()
 
     elif graph_type == 'simple directed':
         # Find strongly connected components (SCC)
-        connectivity_analysis['SCC'] = list(graph.strongly_connected_components(mixed_graph))
+        connectivity_analysis['SCC'] = context.strongly_connected_components()
 
         # Find weakly connected components (WCC)
-        connectivity_analysis['WCC'] = list(graph.weakly_connected_components(mixed_graph))
+        connectivity_analysis['WCC'] = context.weakly_connected_components()
 
         # Check reachability
-        connectivity_analysis['reachability'] = 'strong' if graph.is_strongly_connected(mixed_graph) else 'weak'
+        connectivity_analysis['reachability'] = 'strong' if context.is_strongly_connected() else 'weak'
 
     elif graph_type == 'multi-graph' or graph_type == 'multi-digraph':
-        # Compute edge connectivity for multi-graphs and multi-diGraphs
-        connectivity_analysis['edge connectivity'] = graph.edge_connectivity(mixed_graph)
+        # Compute edge connectivity for multi-graphs and multi-diGraphs (bounds, if it takes too long)
+        lower, upper = edge_connectivity_bounds(graph, mixed_graph, context, EDGE_CONNECTIVITY_TIME_BUDGET)
+        if lower == upper:
+            connectivity_analysis['edge connectivity'] = lower
+        else:
+            connectivity_analysis['edge connectivity lower bound'] = lower
+            connectivity_analysis['edge connectivity upper bound'] = upper
 
         # Find strongly connected components (SCC) for multi-diGraphs
         if graph_type == 'multi-digraph':
-            connectivity_analysis['SCC'] = list(graph.strongly_connected_components(mixed_graph))
+            connectivity_analysis['SCC'] = context.strongly_connected_components()
 
     return connectivity_analysis
 
 
-def analyze_paths(graph, graph_type, mixed_graph):
+# stream shortest path statistics from the BFS sweep of the context (see
+# AnalysisContext.distance_sweep), keeping only aggregates
+def stream_path_statistics(graph, mixed_graph, path_sources=(), context=None):
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
+    number_of_nodes = mixed_graph.number_of_nodes()
+    path_sources = set(path_sources)
+
+    sweep = context.distance_sweep()
+    reach = sweep['reach']  # per node: the number of other nodes it can reach
+    path_length_histogram = sweep['path_length_histogram']  # path length -> number of (source, target) pairs
+    total_length = sweep['total_length']
+    eccentricity_distribution = {}  # eccentricity (within reach) -> number of nodes
+    for eccentricity in sweep['eccentricity'].values():
+        eccentricity_distribution[eccentricity] = eccentricity_distribution.get(eccentricity, 0) + 1
+    # full paths, only from path_sources
+    shortest_paths = {source: graph.single_source_shortest_path(mixed_graph, source)
+                      for source in mixed_graph if source in path_sources}
+
+    reachable_pairs = sum(reach.values())
+    path_statistics = {}
+
+    # the average over all pairs is only defined if every node reaches every other node
+    # (connected, or strongly connected for directed graphs)
+    if number_of_nodes > 0 and reachable_pairs == number_of_nodes * (number_of_nodes - 1):
+        path_statistics['average_shortest_path_length'] = \
+            total_length / reachable_pairs if reachable_pairs > 0 else 0
+    else:
+        path_statistics['average_shortest_path_length'] = float('inf')
+    path_statistics['average_reachable_path_length'] = \
+        total_length / reachable_pairs if reachable_pairs > 0 else 0
+    path_statistics['diameter'] = max(path_length_histogram, default=0)  # over reachable pairs
+    path_statistics['eccentricity_distribution'] = dict(sorted(eccentricity_distribution.items()))
+    path_statistics['path_length_histogram'] = dict(sorted(path_length_histogram.items()))
+    path_statistics['reach'] = dict(reach)
+    if shortest_paths:
+        path_statistics['shortest_paths'] = shortest_paths
+
+    return path_statistics
+
+
+def analyze_paths(graph, graph_type, mixed_graph, mode=None, path_sources=None, context=None):
     # Shortest Paths: Computes the shortest paths between nodes, which can indicate communication
     # efficiency or how quickly information can spread through the network.
+    mode = PATH_ANALYSIS_MODE if mode is None else mode
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
+    if mode == 'stream':
+        return stream_path_statistics(graph, mixed_graph, PATH_SOURCES if path_sources is None else path_sources,
+                                      context)
+
     path_analysis = {}
 
     if graph_type in ['simple undirected', 'simple directed']:
@@ -62,10 +447,10 @@ def analyze_paths(graph, graph_type, mixed_graph):
 
         # Check if the graph is weakly connected (for directed graphs)
         if graph_type == 'simple directed':
-            if not graph.is_strongly_connected(mixed_graph):
+            if not context.is_strongly_connected():
                 try:
                     # Average shortest path length (only if the graph is strongly connected)
-                    path_analysis['average_shortest_path_length'] = graph.average_shortest_path_length(mixed_graph)
+                    path_analysis['average_shortest_path_length'] = context.average_shortest_path_length()
                 except graph.NetworkXError:
                     path_analysis['average_shortest_path_length'] = float('inf')  # Handle error case
         else:
@@ -76,9 +461,9 @@ def analyze_paths(graph, graph_type, mixed_graph):
         path_analysis['all_pairs_shortest_paths'] = dict(graph.all_pairs_shortest_path(mixed_graph))
 
         # Average shortest path length (only if the graph is weakly connected or multi-graph)
-        if not graph.is_weakly_connected(mixed_graph) or graph_type == 'multi-graph':
+        if not context.is_weakly_connected() or graph_type == 'multi-graph':
             try:
-                path_analysis['average_shortest_path_length'] = graph.average_shortest_path_length(mixed_graph)
+                path_analysis['average_shortest_path_length'] = context.average_shortest_path_length()
             except graph.NetworkXError:
                 path_analysis['average_shortest_path_length'] = float('inf')  # Handle error case
         else:
@@ -87,24 +472,55 @@ def analyze_paths(graph, graph_type, mixed_graph):
     return path_analysis
 
 
-def compute_clustering_coefficient_multidigraph(graph):
-    clustering_coefficients = {}
-    for node in graph.nodes():
-        neighbors = list(graph.neighbors(node))
-        if len(neighbors) < 2:
-            clustering_coefficients[node] = 0.0
-        else:
-            num_triangles = 0
-            possible_triangles = len(neighbors) * (len(neighbors) - 1)
-            for neighbor1 in neighbors:
-                for neighbor2 in neighbors:
-                    if neighbor1 != neighbor2 and graph.has_edge(neighbor1, neighbor2):
-                        num_triangles += 1
-            clustering_coefficients[node] = num_triangles / possible_triangles if possible_triangles > 0 else 0.0
-    return clustering_coefficients
+# rows of the adjacency matrix handled per sparse product, to bound the memory of A @ A
+CLUSTERING_BLOCK_SIZE = 4096
+
+
+# count, per node, the ordered pairs of distinct out-neighbors (neighbor1, neighbor2) with an edge
+# neighbor1 -> neighbor2 (closed triplets), and the number of such pairs (possible triplets),
+# from the binary adjacency matrix A of the multi-digraph (parallel edges count once):
+#   closed[i] = sum_j,k A[i,j] A[j,k] A[i,k] - sum_j A[i,j] A[j,j]   (row sums of (A @ A) * A, minus j == k)
+# A is taken from the weighted adjacency (nodes, matrix) of spectral.weighted_adjacency, if given
+def count_directed_triplets(graph, weighted_adjacency=None):
+    if weighted_adjacency is None:
+        nodes = list(graph.nodes())
+        node_index = {node: index for index, node in enumerate(nodes)}
+        edges = np.array([(node_index[u], node_index[v]) for u, v in graph.edges()], dtype=np.int64).reshape(-1, 2)
+        adjacency = sparse.csr_matrix((np.ones(len(edges), dtype=np.int64), (edges[:, 0], edges[:, 1])),
+                                      shape=(len(nodes), len(nodes)))
+    else:
+        nodes, adjacency = weighted_adjacency
+        adjacency = adjacency.astype(np.int64)
+    adjacency.data[:] = 1  # duplicate (parallel) entries were summed
+
+    closed_triplets = np.zeros(len(nodes), dtype=np.int64)
+    for start in range(0, len(nodes), CLUSTERING_BLOCK_SIZE):
+        rows = adjacency[start:start + CLUSTERING_BLOCK_SIZE]
+        closed_triplets[start:start + rows.shape[0]] = np.asarray((rows @ adjacency).multiply(rows).sum(axis=1)).ravel()
+    closed_triplets -= adjacency @ adjacency.diagonal()
 
+    out_degree = np.diff(adjacency.indptr)
+    possible_triplets = out_degree * (out_degree - 1)
 
-def analyze_clustering(graph, graph_type, mixed_graph):
+    return nodes, closed_triplets, possible_triplets
+
+
+def compute_clustering_coefficient_multidigraph(graph, directed_triplets=None):
+    nodes, closed_triplets, possible_triplets = directed_triplets or count_directed_triplets(graph)
+    return {node: num_triangles / possible_triangles if possible_triangles > 0 else 0.0
+            for node, num_triangles, possible_triangles in
+            zip(nodes, closed_triplets.tolist(), possible_triplets.tolist())}
+
+
+# global transitivity of a multi-digraph: closed over possible directed triplets, across all nodes
+def compute_transitivity_multidigraph(graph, directed_triplets=None):
+    nodes, closed_triplets, possible_triplets = directed_triplets or count_directed_triplets(graph)
+    total_possible = int(possible_triplets.sum())
+    return int(closed_triplets.sum()) / total_possible if total_possible > 0 else 0
+
+
+def analyze_clustering(graph, graph_type, mixed_graph, context=None):
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
     clustering_analysis = {}
 
     if graph_type == 'simple undirected':
@@ -116,54 +532,241 @@ def analyze_clustering(graph, graph_type, mixed_graph):
 
     elif graph_type == 'simple directed':
         # Clustering coefficient for directed graph
-        clustering_analysis['clustering_coefficient'] = graph.clustering(mixed_graph.to_undirected())
+        clustering_analysis['clustering_coefficient'] = graph.clustering(context.undirected())
 
         # Transitivity for directed graphs
-        clustering_analysis['transitivity'] = graph.transitivity(mixed_graph.to_undirected())
+        clustering_analysis['transitivity'] = graph.transitivity(context.undirected())
 
     elif graph_type == 'multi-graph':
         # Clustering coefficient for multi-graph (undirected)
         clustering_analysis['clustering_coefficient'] = graph.clustering(mixed_graph)
 
         # Transitivity for multi-graph (undirected)
-        clustering_analysis['transitivity'] = graph.transitivity(mixed_graph.to_undirected())
+        clustering_analysis['transitivity'] = graph.transitivity(context.undirected())
 
     elif graph_type == 'multi-digraph':
         # Clustering coefficient for multi-diGraph (convert to undirected)
-        clustering_analysis['clustering_coefficient'] = compute_clustering_coefficient_multidigraph(mixed_graph)
+        directed_triplets = context.directed_triplets()
+        clustering_analysis['clustering_coefficient'] = compute_clustering_coefficient_multidigraph(mixed_graph,
+                                                                                                   directed_triplets)
+
+        # Transitivity for multi-diGraph (closed over possible directed triplets)
+        clustering_analysis['transitivity'] = compute_transitivity_multidigraph(mixed_graph, directed_triplets)
 
     return clustering_analysis
 
 
-def analyze_assortativity(graph, graph_type, mixed_graph):
+# degree assortativity as graph.degree_assortativity_coefficient computes it (the same mixing
+# matrix, so the same value), from the degrees of the context: the Pearson correlation between
+# the x-degree of the source and the y-degree of the target of every edge (undirected edges
+# count both ways). x and y ('in' or 'out') only apply to directed graphs
+def degree_assortativity_coefficient(context, x='out', y='in'):
+    mixed_graph = context.mixed_graph
+    if mixed_graph.is_directed():
+        direction = {'in': context.in_degrees(), 'out': context.out_degrees()}
+        x_degrees, y_degrees = direction[x], direction[y]
+        degrees = set.union(set(direction['in'].values()) if 'in' in (x, y) else set(),
+                            set(direction['out'].values()) if 'out' in (x, y) else set())
+    else:
+        x_degrees = y_degrees = context.degrees()
+        degrees = set(x_degrees.values())
+    mapping = {degree: index for index, degree in enumerate(degrees)}
+
+    edges = list(mixed_graph.edges())
+    if not mixed_graph.is_directed():
+        edges += [(v, u) for u, v in edges if u != v]
+    mixing = np.zeros((len(mapping), len(mapping)))
+    np.add.at(mixing, (np.array([mapping[x_degrees[u]] for u, v in edges], dtype=np.int64),
+                       np.array([mapping[y_degrees[v]] for u, v in edges], dtype=np.int64)), 1)
+    mixing = mixing / mixing.sum()
+    if mixing.sum() != 1.0:  # normalized again, as networkx does, for the same rounding
+        mixing = mixing / mixing.sum()
+
+    degree_values = np.array(list(mapping.keys()))
+    index = list(mapping.values())
+    a, b = mixing.sum(axis=0), mixing.sum(axis=1)
+    variance_a = (a[index] * degree_values ** 2).sum() - ((a[index] * degree_values).sum()) ** 2
+    variance_b = (b[index] * degree_values ** 2).sum() - ((b[index] * degree_values).sum()) ** 2
+    products = np.outer(degree_values, degree_values)
+    expected = np.outer(a[index], b[index])
+    return float((products * (mixing - expected)).sum() / np.sqrt(variance_a * variance_b))
+
+
+def analyze_assortativity(graph, graph_type, mixed_graph, context=None):
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
     assortativity_analysis = {}
 
     if graph_type in ['simple undirected', 'multi-graph']:
         # Assortativity coefficient
-        assortativity_analysis['assortativity'] = graph.degree_assortativity_coefficient(mixed_graph)
+        assortativity_analysis['assortativity'] = degree_assortativity_coefficient(context)
 
     elif graph_type in ['simple directed', 'multi-digraph']:
         # In-degree assortativity coefficient
-        assortativity_analysis['in_degree_assortativity'] = graph.degree_assortativity_coefficient(mixed_graph, x='in',
-                                                                                                   y='in')
-        assortativity_analysis['out_degree_assortativity'] = graph.degree_assortativity_coefficient(mixed_graph,
-                                                                                                    x='out', y='out')
+        assortativity_analysis['in_degree_assortativity'] = degree_assortativity_coefficient(context, x='in', y='in')
+        assortativity_analysis['out_degree_assortativity'] = degree_assortativity_coefficient(context, x='out',
+                                                                                              y='out')
 
     return assortativity_analysis
 
 
-# function to append analysis output for each graph analyzed
-def insert_output_to_file(report_file, section_header, output_text, output_graph=''):
-    with open(report_file, 'a') as output_file:
-        output_file.write(f"\n{section_header}\n")
-        output_file.write(output_text)
+# communities (informal teams) of any graph type, from the weighted adjacency matrix (see
+# communities.py): Louvain modularity optimization, and label propagation as a faster, rougher
+# alternative. Edge directions are ignored; parallel edges add up their Link weights
+def analyze_communities(graph, graph_type, mixed_graph, context=None):
+    context = AnalysisContext(graph, mixed_graph) if context is None else context
+    community_analysis = {}
 
-        if len(output_graph) > 0:  # insert corresponding graph figure
-            output_file.write(output_graph)
+    nodes, adjacency = context.weighted_adjacency()
+    weights = communities.undirected_weights(adjacency, mixed_graph.is_directed())
+
+    labels, modularity, levels = communities.louvain(weights)
+    community_analysis['communities'] = communities.node_sets(nodes, labels)
+    community_analysis['modularity'] = modularity
+    community_analysis['levels'] = levels
 
+    labels = communities.label_propagation(weights)
+    community_analysis['label propagation communities'] = communities.node_sets(nodes, labels)
+    community_analysis['label propagation modularity'] = communities.modularity(weights, labels)
 
-# main function to run and report on the various networkx graph algorithms
-def generate_analysis_report(graph, graph_type, graph_to_analyze, network_name):
+    return community_analysis
+
+
+# a buffered report sink, open for a whole run: sections are streamed into the org report
+# (per-node tables truncated to the top REPORT_TOP_K rows), and the full per-node metrics
+# go to a machine-readable JSON Lines companion file. A new report starts with the preamble
+class ReportSink:
+    def __init__(self, report_file=REPORT_FILE, data_file=REPORT_DATA_FILE, top_k=REPORT_TOP_K,
+                 preamble_file=REPORT_PREAMBLE_FILE):
+        self.top_k = top_k
+        self.run = datetime.now().isoformat(timespec='seconds')
+        self.data_file = data_file
+        if preamble_file is not None and not os.path.exists(report_file):
+            shutil.copyfile(preamble_file, report_file)
+        self.__report_file = open(report_file, 'a', buffering=REPORT_BUFFER_SIZE)
+        self.__data_file = open(data_file, 'a', buffering=REPORT_BUFFER_SIZE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.__report_file.close()
+        self.__data_file.close()
+
+    # append a section to the org report
+    def write_section(self, section_header, output_text, output_graph=''):
+        self.__report_file.write(f"\n{section_header}\n")
+        self.__report_file.write(output_text)
+
+        if len(output_graph) > 0:  # insert corresponding graph figure
+            self.__report_file.write(output_graph)
+
+    # append a record to the JSON Lines companion (strict JSON: infinite and NaN values as null)
+    def write_record(self, record):
+        self.__data_file.write(json.dumps(finite_values({'run': self.run, **record}), default=str, allow_nan=False))
+        self.__data_file.write('\n')
+
+    # stream the report of one analysis family: scalars as list items, per-node metrics as
+    # top-k tables, components as a table of the largest ones
+    def write_family_report(self, network_name, family, family_report):
+        node_metrics = {}
+        for metric, value in family_report.items():
+            if isinstance(value, dict) and metric in DISTRIBUTION_METRICS:
+                self.__report_file.write(f"- {metric}:\n")
+                self.write_table(('value', 'count'), sorted(value.items()))
+                self.write_record({'network': network_name, 'family': family, 'metric': metric,
+                                   'distribution': list(value.items())})
+            elif isinstance(value, dict) and any(isinstance(item, dict) for item in value.values()):
+                # nested per-node results (e.g. shortest paths from chosen sources)
+                self.__report_file.write(f"- {metric}: {len(value)} nodes (see {self.data_file})\n")
+                for node, node_value in value.items():
+                    self.write_record({'network': network_name, 'family': family, 'metric': metric,
+                                       'node': node, 'value': node_value})
+            elif isinstance(value, dict):
+                self.__report_file.write(f"- {metric} (top {min(self.top_k, len(value))} of {len(value)}):\n")
+                self.write_table(('node', metric), heapq.nlargest(self.top_k, value.items(), key=sort_value))
+                for node, node_value in value.items():
+                    node_metrics.setdefault(node, {})[metric] = node_value
+            elif isinstance(value, list):  # components
+                sizes = sorted((len(component) for component in value), reverse=True)
+                self.__report_file.write(f"- {metric}: {len(value)} (largest: {sizes[:self.top_k]})\n")
+                largest = heapq.nlargest(self.top_k, value, key=len)
+                self.write_table(('size', 'members'), [(len(component), truncated_members(component, self.top_k))
+                                                       for component in largest])
+                self.write_record({'network': network_name, 'family': family, 'metric': metric,
+                                   'components': [sorted(map(str, component)) for component in value]})
+            else:
+                self.__report_file.write(f"- {metric}: {value}\n")
+                self.write_record({'network': network_name, 'family': family, 'metric': metric, 'value': value})
+
+        for node, metrics in node_metrics.items():
+            self.write_record({'network': network_name, 'family': family, 'node': node, **metrics})
+
+    # write an org table, row by row
+    def write_table(self, header, rows):
+        self.__report_file.write('| ' + ' | '.join(header) + ' |\n')
+        self.__report_file.write('|' + '|'.join('-' * (len(column) + 2) for column in header) + '|\n')
+        for row in rows:
+            self.__report_file.write('| ' + ' | '.join(str(cell) for cell in row) + ' |\n')
+
+
+# value with its infinite and NaN floats (also within dicts, lists and tuples) replaced by None,
+# which JSON has no numbers for
+def finite_values(value):
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: finite_values(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite_values(item) for item in value]
+    return value
+
+
+# sort per-node values descending; non-numbers last
+def sort_value(node_value):
+    value = node_value[1]
+    return value if isinstance(value, (int, float)) else float('-inf')
+
+
+def truncated_members(component, top_k):
+    members = sorted(map(str, component))
+    return ', '.join(members[:top_k]) + (', ...' if len(members) > top_k else '')
+
+
+# the independent analysis families, in report order:
+# (section header, report title, analysis function)
+ANALYSIS_FAMILIES = [
+    ('*** Centrality Analysis', 'Centrality Report', analyze_centrality),
+    ('*** Connectivity Analysis', 'Connectivity Report', analyze_connectivity),
+    ('*** Path Analysis', 'Path Analysis Report', analyze_paths),
+    ('*** Clustering Analysis', 'Clustering Report', analyze_clustering),
+    ('*** Assortativity Analysis', 'Assortativity Report', analyze_assortativity),
+    ('*** Community Analysis', 'Community Report', analyze_communities),
+]
+
+
+# the name of an analysis family, as in the report data: analyze_communities -> 'communities'
+def family_name(analyze_function):
+    return analyze_function.__name__.replace('analyze_', '')
+
+
+# the position in ANALYSIS_FAMILIES (and in the family reports of a graph) of a family, by name
+def family_index(name):
+    return [family_name(analyze_function) for section_header, report_title, analyze_function in
+            ANALYSIS_FAMILIES].index(name)
+
+
+# the relationships whose communities are compared, out of the loaded link labels
+def community_overlap_relationships(link_labels):
+    if COMMUNITY_OVERLAP_RELATIONSHIPS is None:
+        return list(link_labels)
+    return [relationship for relationship in COMMUNITY_OVERLAP_RELATIONSHIPS if relationship in link_labels]
+
+
+# write the reports of all analysis families (in ANALYSIS_FAMILIES order) for one graph
+def write_analysis_report(graph_type, graph_to_analyze, network_name, family_reports, sink):
     # print graph information as a new section:
     graph_info_text = f"** Graph properties: {graph_to_analyze} ({graph_type})\n----------------"
 
@@ -171,43 +774,48 @@ def generate_analysis_report(graph, graph_type, graph_to_analyze, network_name):
     image_file_name = network_name.replace(' ', '-') + '-' + image_file_name
     output_graph = f"\n#+ATTR_HTML: :width 800px\n[[file:{image_file_name}.png]]\n"
 
-    insert_output_to_file(REPORT_FILE,
-                          graph_info_text,
-                          '',
-                          output_graph)
-
-    # Centrality Algorithms:
-    centrality_report = analyze_centrality(graph, graph_type, graph_to_analyze)
-    output_text = f'Centrality Report for {graph_to_analyze}:\n {centrality_report} \n\n'
-    insert_output_to_file(REPORT_FILE,
-                          '*** Centrality Analysis',
-                          output_text)
-
-    # Connectivity Algorithms
-    connectivity_report = analyze_connectivity(graph, graph_type, graph_to_analyze)
-    output_text = f'Connectivity Report for {graph_to_analyze}:\n {connectivity_report} \n\n'
-    insert_output_to_file(REPORT_FILE,
-                          '*** Connectivity Analysis',
-                          output_text)
-
-    # Path Algorithms:
-    path_report = analyze_paths(graph, graph_type, graph_to_analyze)
-    output_text = f'Path Analysis Report for {graph_to_analyze}:\n {path_report} \n\n'
-    insert_output_to_file(REPORT_FILE,
-                          '*** Path Analysis',
-                          output_text)
-
-    # Clustering Algorithms:
-    clustering_report = analyze_clustering(graph, graph_type, graph_to_analyze)
-    output_text = f'Clustering Report for {graph_to_analyze}:\n {clustering_report} \n\n'
-    insert_output_to_file(REPORT_FILE,
-                          '*** Clustering Analysis',
-                          output_text)
-
-    # Assortativity Algorithms:
-    assortativity_report = analyze_assortativity(graph, graph_type, graph_to_analyze)
-    output_text = f'Assortativity Report for {graph_to_analyze}:\n {assortativity_report} \n\n'
-    output_text += f"End of analysis for: {graph_to_analyze}\n----------------\n"
-    insert_output_to_file(REPORT_FILE,
-                          '*** Assortativity Analysis',
-                          output_text)
+    sink.write_section(graph_info_text,
+                       '',
+                       output_graph)
+    sink.write_record({'network': network_name, 'graph': str(graph_to_analyze), 'graph type': graph_type})
+
+    for (section_header, report_title, analyze_function), family_report in zip(ANALYSIS_FAMILIES, family_reports):
+        sink.write_section(section_header,
+                           f'{report_title} for {graph_to_analyze}:\n')
+        sink.write_family_report(network_name, family_name(analyze_function), family_report)
+    sink.write_section('', f"End of analysis for: {graph_to_analyze}\n----------------\n")
+
+
+# append how alike the communities of the relationships are (see communities.partition_overlap),
+# for each pair of them; partitions maps a network name to its communities (see analyze_communities),
+# and only the relationships among them are compared (all relationships in partitions, if None)
+def write_community_overlap(partitions, sink, relationships=None):
+    relationships = list(partitions) if relationships is None else \
+        [relationship for relationship in relationships if relationship in partitions]
+    pairs = [(first, second) for index, first in enumerate(relationships) for second in relationships[index + 1:]]
+    if not pairs:
+        return
+
+    sink.write_section('** Community overlap across relationships',
+                       'Normalized mutual information (NMI) and adjusted Rand index (ARI) of the communities, '
+                       'over the nodes in both relationships:\n')
+    rows = []
+    for first, second in pairs:
+        overlap = communities.partition_overlap(partitions[first], partitions[second])
+        rows.append((first, second, overlap['common nodes'], f"{overlap['NMI']:.3f}", f"{overlap['ARI']:.3f}"))
+        sink.write_record({'family': 'community overlap', 'networks': [first, second], **overlap})
+    sink.write_table(('relationship', 'other relationship', 'common nodes', 'NMI', 'ARI'), rows)
+
+
+# main function to run and report on the various networkx graph algorithms;
+# the analysis families share one AnalysisContext of the graph
+def generate_analysis_report(graph, graph_type, graph_to_analyze, network_name, sink=None):
+    context = AnalysisContext(graph, graph_to_analyze)
+    family_reports = [analyze_function(graph, graph_type, graph_to_analyze, context=context)
+                      for section_header, report_title, analyze_function in ANALYSIS_FAMILIES]
+
+    if sink is None:
+        with ReportSink() as sink:
+            write_analysis_report(graph_type, graph_to_analyze, network_name, family_reports, sink)
+    else:
+        write_analysis_report(graph_type, graph_to_analyze, network_name, family_reports, sink)
@@ -0,0 +1,145 @@
+# Fan the analysis families (see report.ANALYSIS_FAMILIES) of the mixed graph and of every
+# relationship sub-graph out across a pool of worker processes; the results are collected
+# and written to the report in submission order, so the report is deterministic.
+# The families of one graph run as one task by default, sharing intermediate results
+# (components, BFS sweep, ...) through a report.AnalysisContext
+from collections import deque
+from cache import ResultCache, graph_fingerprint, named_settings
+import communities
+from concurrent.futures import Future, ProcessPoolExecutor
+from instrument import measured_call
+import multiprocessing
+import os
+import networkx as graph
+import report
+import spectral
+
+# number of worker processes; 1 runs everything in this process
+ANALYSIS_WORKERS = os.cpu_count() or 1
+# run the (uncached) families of a graph as one task with a shared analysis context; False runs
+# each family as a task of its own, recomputing shared work but spreading few large graphs wider
+SHARE_ANALYSIS_CONTEXT = True
+
+# fork where available: workers inherit the loaded modules and any changed report settings,
+# and the script that started the run is not imported again
+POOL_CONTEXT = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+# part of every result cache key: change it whenever the analyses change their results in a
+# way the settings below do not show, so results cached by older code are not reused
+ANALYSIS_VERSION = '3'
+# the settings that change analysis results, by module; presentation (report files, top-k)
+# and execution tuning (block sizes, when to go parallel) are left out, so changing them
+# keeps the cached results. Time budgets are left out too: results cut short by one are not
+# cached (see report.is_partial), and complete results do not depend on them. So are the
+# compared relationships of the community overlap: it is computed from the cached communities
+RESULT_SETTINGS = [
+    (report, ('APPROXIMATE_CENTRALITY_NODES', 'APPROXIMATE_CENTRALITY_EDGES', 'CENTRALITY_SAMPLE_SIZE',
+              'CENTRALITY_TARGET_ERROR', 'CENTRALITY_SEED', 'PATH_ANALYSIS_MODE',
+              'PATH_SOURCES')),
+    (spectral, ('DENSE_EIGENVECTOR_NODES', 'EIGENVALUE_TOLERANCE', 'PAGERANK_ALPHA', 'PAGERANK_TOLERANCE',
+                'MAX_ITERATIONS')),
+    (communities, ('COMMUNITY_SEED', 'COMMUNITY_RESOLUTION', 'MODULARITY_TOLERANCE', 'MAX_COMMUNITY_ROUNDS',
+                   'MOVE_FRACTION')),
+]
+
+
+# the analysis version and the current values of the result settings, to key cached results on
+def result_settings():
+    return ANALYSIS_VERSION, [(module.__name__, named_settings(module, names)) for module, names in RESULT_SETTINGS]
+
+
+# run analysis families on one graph (in a worker process), each measured as a stage, on one
+# analysis context (seeded with known_results): returns [(family index, family report, stage record)]
+def run_analysis_families(family_indices, graph_type, graph_to_analyze, network_name=None, known_results=None):
+    context = report.AnalysisContext(graph, graph_to_analyze, known_results)
+    results = []
+    for family_index in family_indices:
+        analyze_function = report.ANALYSIS_FAMILIES[family_index][2]
+        family_report, record = measured_call(analyze_function.__name__, network_name,
+                                              lambda: analyze_function(graph, graph_type, graph_to_analyze,
+                                                                       context=context))
+        results.append((family_index, family_report, record))
+    return results
+
+
+# analyze and report on (graph type, graph, network name) jobs; jobs can be a lazy iterator:
+# at most 'workers' graphs are in flight at any time, so lazily built sub-graphs are
+# released as soon as their reports are written. Results found in the result cache
+# (keyed by the graph's fingerprint and the result settings) are not recomputed. The stage
+# records of the computed families are added to metrics (an instrument.RunMetrics), if given.
+# The reports go to sink (a report.ReportSink, kept open), or to a new sink on the default files;
+# on_report, if given, is called with the network name and family reports of each graph.
+# known_results maps network names to results already at hand for their analysis context
+# (see incremental.IncrementalGraphs.known_results)
+def analyze_graphs(analysis_jobs, workers=None, result_cache=None, metrics=None, sink=None, on_report=None,
+                   known_results=None):
+    workers = ANALYSIS_WORKERS if workers is None else workers
+    result_cache = ResultCache() if result_cache is None else result_cache
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) if workers > 1 else None
+    own_sink = sink is None
+    sink = report.ReportSink() if own_sink else sink
+    try:
+        in_flight = deque()
+        for graph_type, graph_to_analyze, network_name in analysis_jobs:
+            fingerprint = graph_fingerprint(graph_to_analyze) if result_cache.enabled else None
+            cache_keys, futures, pending = [], [], []
+            for family_index, (section_header, report_title, analyze_function) in enumerate(report.ANALYSIS_FAMILIES):
+                cache_key = result_cache.key(fingerprint, graph_type, analyze_function.__name__,
+                                             result_settings())
+                is_cached, family_report = result_cache.get(cache_key)
+                if is_cached:
+                    cache_key = None  # nothing to store
+                    futures.append(completed_future([(family_index, family_report, None)]))
+                else:
+                    pending.append(family_index)
+                cache_keys.append(cache_key)
+
+            tasks = [pending] if SHARE_ANALYSIS_CONTEXT and pending else [[family_index] for family_index in pending]
+            graph_results = (known_results or {}).get(network_name)
+            for family_indices in tasks:
+                if executor is None:
+                    futures.append(completed_future(run_analysis_families(family_indices, graph_type,
+                                                                          graph_to_analyze, network_name,
+                                                                          graph_results)))
+                else:
+                    futures.append(executor.submit(run_analysis_families, family_indices, graph_type,
+                                                   graph_to_analyze, network_name, graph_results))
+            in_flight.append((graph_type, str(graph_to_analyze), network_name, futures, cache_keys, result_cache, sink,
+                              metrics, on_report))
+
+            if len(in_flight) >= workers:
+                write_graph_report(*in_flight.popleft())
+
+        while in_flight:
+            write_graph_report(*in_flight.popleft())
+    finally:
+        if own_sink:
+            sink.close()
+        if executor is not None:
+            executor.shutdown()
+
+
+def completed_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+# wait for the analysis families of one graph, cache the new complete results and write them
+# to the report
+def write_graph_report(graph_type, graph_description, network_name, futures, cache_keys, result_cache, sink,
+                       metrics=None, on_report=None):
+    family_reports = [None] * len(cache_keys)
+    for future in futures:
+        for family_index, family_report, record in future.result():
+            family_reports[family_index] = family_report
+            if metrics is not None and record is not None:
+                metrics.add(record)
+    for cache_key, family_report in zip(cache_keys, family_reports):
+        if cache_key is not None and not report.is_partial(family_report):
+            result_cache.put(cache_key, family_report)
+
+    report.write_analysis_report(graph_type, graph_description, network_name, family_reports, sink)
+    if on_report is not None:
+        on_report(network_name, family_reports)
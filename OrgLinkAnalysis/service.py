@@ -0,0 +1,292 @@
+# Long-running local query service: the inputs are loaded once, the mixed graph and every
+# relationship sub-graph stay in memory, and targeted questions are answered over HTTP
+# (asyncio, JSON responses), e.g.:
+#   GET /networks                                      -- the networks and their sizes
+#   GET /brokers?network=Advice&k=10                   -- top-k nodes by betweenness centrality
+#   GET /ego?network=Trust&node=Will&hops=2            -- the k-hop ego network of a node
+#   GET /path?network=Mixed%20Graph&source=Will&target=Bob -- a shortest chain between two nodes
+# Betweenness vectors and BFS trees are kept in an LRU cache; on large networks betweenness is
+# sampled as in report.py. The input csv files are polled and the graphs reloaded (and the cache
+# cleared) when they change; a failed reload keeps the current graphs and is retried.
+# Usage: python service.py [--input DIR] [--port PORT] [--snapshot DIR]
+import argparse
+import asyncio
+from collections import OrderedDict
+import heapq
+import ingest
+import json
+import networkx as graph
+import os
+from partition import LazySubgraphs
+import report
+import snapshot
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+QUERY_CACHE_SIZE = 128  # cached betweenness vectors and BFS trees
+RELOAD_INTERVAL = 2.0  # seconds between checks of the input files
+DEFAULT_TOP_K = 10
+DEFAULT_HOPS = 1
+MIXED_GRAPH = 'Mixed Graph'
+
+
+# a query that cannot be answered: HTTP status and message
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# least recently used cache of at most max_size entries
+class LRUCache:
+    def __init__(self, max_size=QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self.__entries = OrderedDict()
+
+    def get(self, key):
+        value = self.__entries.get(key)
+        if value is not None:
+            self.__entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def pop(self, key):
+        self.__entries.pop(key, None)
+
+    def clear(self):
+        self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+# breadth-first search from source along out-edges: {node: (hops, parent)}
+def bfs_tree(graph_to_search, source):
+    tree = {source: (0, None)}
+    frontier = [source]
+    hops = 0
+    while frontier:
+        hops += 1
+        next_frontier = []
+        for node in frontier:
+            for neighbor in graph_to_search[node]:
+                if neighbor not in tree:
+                    tree[neighbor] = (hops, node)
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return tree
+
+
+# betweenness centrality of the network, sampled over pivot nodes (Brandes-Pich) above the sizes
+# at which report.py samples it: {'mode', 'betweenness'}. Runs in a worker thread, so it stays
+# serial (no process pool)
+def broker_centrality(graph_to_query):
+    number_of_nodes = graph_to_query.number_of_nodes()
+    if number_of_nodes > report.APPROXIMATE_CENTRALITY_NODES or \
+            graph_to_query.number_of_edges() > report.APPROXIMATE_CENTRALITY_EDGES:
+        sample_size = report.centrality_sample_size(number_of_nodes, report.CENTRALITY_SAMPLE_SIZE)
+        return {'mode': 'approximate', 'sample size': sample_size,
+                'betweenness': graph.betweenness_centrality(graph_to_query, k=sample_size,
+                                                            seed=report.CENTRALITY_SEED)}
+    return {'mode': 'exact', 'betweenness': graph.betweenness_centrality(graph_to_query)}
+
+
+class GraphService:
+    def __init__(self, input_directory='./input', snapshot_directory=None, cache_size=QUERY_CACHE_SIZE):
+        self.input_files = (os.path.join(input_directory, 'node.csv'),
+                            os.path.join(input_directory, 'link.csv'),
+                            os.path.join(input_directory, 'relationship.csv'))
+        self.snapshot_directory = snapshot_directory
+        self.cache = LRUCache(cache_size)
+        self.networks = {}
+        self.stamps = None
+        self.install(*self.load())
+
+    # load the inputs and build all networks (blocking, so it may run in a worker thread):
+    # (networks, stamps), to be installed by the caller
+    def load(self):
+        stamps = snapshot.source_stamps(self.input_files)
+        if self.snapshot_directory is not None:
+            nodes, links, original_graph, mixed_graph = snapshot.load_graphs(self.snapshot_directory,
+                                                                             *self.input_files)
+        else:
+            nodes, links, original_graph, mixed_graph = ingest.load_graphs(*self.input_files)
+
+        subgraphs = LazySubgraphs(original_graph, links)
+        networks = {MIXED_GRAPH: mixed_graph}
+        networks.update(subgraphs.items())
+        return networks, stamps
+
+    # swap in the new graphs at once; cached answers were about the old ones. Only called on
+    # the thread running the event loop, which is the only one touching the cache
+    def install(self, networks, stamps):
+        self.networks, self.stamps = networks, stamps
+        self.cache.clear()
+
+    def inputs_changed(self):
+        try:
+            return snapshot.source_stamps(self.input_files) != self.stamps
+        except OSError:  # a file is being replaced: check again later
+            return False
+
+    def network(self, network_name):
+        if network_name not in self.networks:
+            raise QueryError(404, f'unknown network: {network_name}')
+        return self.networks[network_name]
+
+    @staticmethod
+    def node(graph_to_query, node):
+        if node not in graph_to_query:
+            raise QueryError(404, f'unknown node: {node}')
+        return node
+
+    # the cached result of function(*args) under key, computed in a worker thread on a miss;
+    # concurrent queries for the same key share one computation. Workers must not fork
+    # processes: forking a threaded process can copy locks held by other threads
+    async def cached(self, key, function, *args):
+        future = self.cache.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(None, function, *args)
+            self.cache.put(key, future)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self.cache.pop(key)
+            raise
+
+    async def betweenness(self, network_name):
+        graph_to_query = self.network(network_name)
+        return await self.cached(('betweenness', network_name), broker_centrality, graph_to_query)
+
+    async def bfs_tree(self, network_name, source):
+        graph_to_query = self.network(network_name)
+        return await self.cached(('bfs', network_name, self.node(graph_to_query, source)), bfs_tree,
+                                 graph_to_query, source)
+
+    async def list_networks(self, query):
+        return {'networks': [{'network': network_name, 'nodes': graph_to_query.number_of_nodes(),
+                              'edges': graph_to_query.number_of_edges(), 'directed': graph_to_query.is_directed()}
+                             for network_name, graph_to_query in self.networks.items()]}
+
+    async def brokers(self, query):
+        network_name = parameter(query, 'network')
+        top_k = parameter(query, 'k', int, DEFAULT_TOP_K)
+        centrality = await self.betweenness(network_name)
+        return {'network': network_name, 'mode': centrality['mode'],
+                'brokers': heapq.nlargest(top_k, centrality['betweenness'].items(),
+                                          key=lambda node_value: node_value[1])}
+
+    # nodes within the given number of hops of a node (following edge directions), and the
+    # edges among them
+    async def ego(self, query):
+        network_name = parameter(query, 'network')
+        node = parameter(query, 'node')
+        hops = parameter(query, 'hops', int, DEFAULT_HOPS)
+        tree = await self.bfs_tree(network_name, node)
+
+        ego_nodes = [other for other, (distance, parent) in tree.items() if distance <= hops]
+        ego_graph = self.network(network_name).subgraph(ego_nodes)
+        return {'network': network_name, 'node': node, 'hops': hops, 'nodes': ego_nodes,
+                'edges': [[u, v] for u, v in ego_graph.edges()]}
+
+    async def path(self, query):
+        network_name = parameter(query, 'network')
+        source = parameter(query, 'source')
+        target = self.node(self.network(network_name), parameter(query, 'target'))
+        tree = await self.bfs_tree(network_name, source)
+
+        if target not in tree:
+            return {'network': network_name, 'source': source, 'target': target, 'path': None}
+        chain = [target]
+        while chain[-1] != source:
+            chain.append(tree[chain[-1]][1])
+        return {'network': network_name, 'source': source, 'target': target, 'path': chain[::-1]}
+
+    # the handler of each path
+    def routes(self):
+        return {'/networks': self.list_networks, '/brokers': self.brokers, '/ego': self.ego, '/path': self.path}
+
+
+# a query string parameter, converted by kind; missing parameters without a default are errors
+def parameter(query, name, kind=str, default=None):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise QueryError(400, f'missing parameter: {name}')
+        return default
+    try:
+        return kind(values[0])
+    except ValueError:
+        raise QueryError(400, f'invalid parameter: {name}={values[0]}')
+
+
+# answer one HTTP request per connection
+async def handle_connection(service, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):  # skip the headers
+            pass
+
+        status, response = 200, None
+        try:
+            if len(request_line) < 2:
+                raise QueryError(400, 'bad request')
+            if request_line[0] != 'GET':
+                raise QueryError(405, f'method not allowed: {request_line[0]}')
+            url = urlsplit(request_line[1])
+            handler = service.routes().get(url.path)
+            if handler is None:
+                raise QueryError(404, f'unknown query: {url.path}')
+            response = await handler(parse_qs(url.query))
+        except QueryError as error:
+            status, response = error.status, {'error': str(error)}
+        except Exception as error:
+            status, response = 500, {'error': repr(error)}
+
+        body = json.dumps(response, default=str).encode()
+        writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                     f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+                     f'Connection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+# reload the graphs whenever the input files change; if loading fails (e.g. a file is only
+# half written), the current graphs stay in place and the load is retried at the next check
+async def watch_inputs(service, interval=RELOAD_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        if service.inputs_changed():
+            try:
+                service.install(*await asyncio.get_running_loop().run_in_executor(None, service.load))
+            except Exception as error:
+                print(f'reload failed, keeping the current graphs: {error!r}', file=sys.stderr)
+
+
+async def serve(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer), host, port)
+    watcher = asyncio.create_task(watch_inputs(service))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Answer graph queries over HTTP from resident graphs.')
+    parser.add_argument('--input', default='./input', help='directory of node.csv, link.csv and relationship.csv')
+    parser.add_argument('--snapshot', metavar='DIR', help='load through a memory-mapped snapshot (see snapshot.py)')
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    arguments = parser.parse_args()
+
+    asyncio.run(serve(GraphService(arguments.input, arguments.snapshot), arguments.host, arguments.port))
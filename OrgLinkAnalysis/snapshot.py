@@ -0,0 +1,209 @@
+# Binary snapshot of the ingested inputs: a directory of .npy files that are opened memory-mapped,
+# so repeated runs on the same dataset skip parsing the csv files:
+#   nodes_label, nodes_id                          -- the rows of node.csv
+#   links_label, links_directed, links_weight, links_id -- the rows of link.csv
+#   node_labels                                    -- label of each node code (node.csv labels
+#                                                     first, then those only found in relationships)
+#   link_labels, link_directed, link_weights       -- label and attributes of each link code
+#   sources, targets, relationships, weights       -- one entry per relationship, in input order
+#   snapshot.json                                  -- sizes and the csv files it was built from
+# Labels (and other text) are stored as their UTF-8 bytes one after the other in one array, with
+# the offset where each ends in a second one (name_ends), so no label is padded. The numeric arrays
+# are used in place (zero copy); the label tables are decoded into strings once, when opened.
+# A snapshot builds the same networkx graphs as ingest.load_graphs, or feeds a CompactGraph
+from compact import CompactGraph, code_type, intern_labels
+import ingest
+import json
+from link import Link
+from mixed import MixedGraph
+from node import Node
+import os
+import networkx as graph
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 3
+SNAPSHOT_FILE = 'snapshot.json'
+# relationships added to networkx per block, to bound the temporary memory
+SNAPSHOT_BLOCK_SIZE = 1000000
+SNAPSHOT_ARRAYS = ('nodes_label', 'nodes_id', 'links_label', 'links_directed', 'links_weight', 'links_id',
+                   'node_labels', 'link_labels', 'link_directed', 'link_weights',
+                   'sources', 'targets', 'relationships', 'weights')
+
+
+# a label (or id) column as {name: array} that np.save can write without pickling: numbers keep
+# their type, anything else becomes text, as bytes (name) and end offsets (name_ends)
+def column_arrays(name, values):
+    array = np.asarray(values)
+    if array.dtype != object and array.dtype.kind not in 'SU':
+        return {name: array}
+    encoded = [str(value).encode() for value in array.tolist()]
+    return {name: np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            name + '_ends': np.cumsum([len(value) for value in encoded], dtype=np.int64)}
+
+
+# the strings of a text column, as an object array
+def text_column(text_bytes, ends):
+    text = text_bytes.tobytes()
+    ends = ends.tolist()
+    column = np.empty(len(ends), dtype=object)
+    column[:] = [text[start:end].decode() for start, end in zip([0] + ends[:-1], ends)]
+    return column
+
+
+# size and modification time of the input files, to tell when a snapshot is out of date
+def source_stamps(files):
+    stamps = []
+    for file in files:
+        file_stat = os.stat(file)
+        stamps.append([os.path.abspath(file), file_stat.st_size, file_stat.st_mtime_ns])
+    return stamps
+
+
+# True if the snapshot in snapshot_directory was built from the files as they are now
+def is_current(snapshot_directory, node_file=ingest.NODE_FILE, link_file=ingest.LINK_FILE,
+               relationship_file=ingest.RELATIONSHIP_FILE):
+    try:
+        with open(os.path.join(snapshot_directory, SNAPSHOT_FILE)) as snapshot_input:
+            description = json.load(snapshot_input)
+    except (OSError, ValueError):
+        return False
+
+    return description.get('version') == SNAPSHOT_VERSION and \
+        description.get('sources') == source_stamps((node_file, link_file, relationship_file))
+
+
+# parse the csv inputs (relationships in chunks of chunk_size rows, if given) into a snapshot
+def write_snapshot(snapshot_directory, node_file=ingest.NODE_FILE, link_file=ingest.LINK_FILE,
+                   relationship_file=ingest.RELATIONSHIP_FILE, chunk_size=None):
+    stamps = source_stamps((node_file, link_file, relationship_file))
+    node_df = pd.read_csv(node_file)
+    link_df = pd.read_csv(link_file)
+    link_attributes = ingest.link_index(ingest.read_links(link_file))
+
+    # codes: node.csv (and link.csv) labels first, the first of any duplicates wins, as in ingest.py
+    node_index = pd.Index(node_df['Label']).drop_duplicates()
+    link_index = link_attributes.index
+    sources, targets, relationships, weights = [], [], [], []
+    for relationship_df in ingest.read_relationships(relationship_file, chunk_size):
+        joined = ingest.join_links(relationship_df, link_attributes)
+        source_codes, node_index = intern_labels(joined['Source'].to_numpy(), node_index)
+        target_codes, node_index = intern_labels(joined['Target'].to_numpy(), node_index)
+        link_codes, link_index = intern_labels(joined['Link'].to_numpy(), link_index)
+        sources.append(source_codes)
+        targets.append(target_codes)
+        relationships.append(link_codes)
+        weights.append(joined['Weight'].to_numpy())
+
+    # links only found in relationship.csv get the default link values
+    missing_links = len(link_index) - len(link_attributes)
+    link_directed = np.concatenate([link_attributes['Directed'].to_numpy(dtype=bool),
+                                    np.full(missing_links, ingest.DEFAULT_DIRECTED)])
+    link_weights = np.concatenate([link_attributes['Weight'].to_numpy(dtype=np.float64),
+                                   np.full(missing_links, ingest.DEFAULT_WEIGHT)])
+
+    index_type = np.int32 if len(node_index) < np.iinfo(np.int32).max else np.int64
+    link_type = code_type(len(link_index))
+    arrays = {**column_arrays('nodes_label', node_df['Label']), **column_arrays('nodes_id', node_df['ID']),
+              **column_arrays('links_label', link_df['Label']), 'links_directed': link_df['Directed'].to_numpy(),
+              'links_weight': link_df['Weight'].to_numpy(), **column_arrays('links_id', link_df['ID']),
+              **column_arrays('node_labels', node_index), **column_arrays('link_labels', link_index),
+              'link_directed': link_directed, 'link_weights': link_weights,
+              'sources': np.concatenate(sources).astype(index_type) if sources else np.zeros(0, index_type),
+              'targets': np.concatenate(targets).astype(index_type) if targets else np.zeros(0, index_type),
+              'relationships': np.concatenate(relationships).astype(link_type) if relationships else
+              np.zeros(0, link_type),
+              'weights': np.concatenate(weights) if weights else np.zeros(0)}
+
+    # the description is written last, so an interrupted write leaves no current snapshot
+    os.makedirs(snapshot_directory, exist_ok=True)
+    description_file = os.path.join(snapshot_directory, SNAPSHOT_FILE)
+    if os.path.exists(description_file):
+        os.remove(description_file)
+    for name, array in arrays.items():
+        np.save(os.path.join(snapshot_directory, name + '.npy'), array, allow_pickle=False)
+    for name in SNAPSHOT_ARRAYS:  # a column that was text in an earlier snapshot may not be now
+        if name + '_ends' not in arrays and os.path.exists(os.path.join(snapshot_directory, name + '_ends.npy')):
+            os.remove(os.path.join(snapshot_directory, name + '_ends.npy'))
+    with open(description_file + '.tmp', 'w') as snapshot_output:
+        json.dump({'version': SNAPSHOT_VERSION, 'sources': stamps, 'nodes': len(node_index),
+                   'links': len(link_index), 'relationships': len(arrays['sources'])}, snapshot_output)
+    os.replace(description_file + '.tmp', description_file)
+
+
+class Snapshot:
+    # open the arrays of a snapshot memory-mapped (read only); only the text columns are read now
+    def __init__(self, snapshot_directory):
+        self.directory = snapshot_directory
+        for name in SNAPSHOT_ARRAYS:
+            array = self.__load(name)
+            ends_file = os.path.join(snapshot_directory, name + '_ends.npy')
+            setattr(self, name, text_column(array, self.__load(name + '_ends')) if os.path.exists(ends_file) else array)
+
+    def __load(self, name):
+        return np.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r', allow_pickle=False)
+
+    # node and link objects, as ingest.read_nodes and ingest.read_links make them
+    def nodes(self):
+        return [Node(label, ID=node_id) for label, node_id in zip(self.nodes_label.tolist(), self.nodes_id.tolist())]
+
+    def links(self):
+        return [Link(label, directed=directed, weight=weight, ID=link_id) for label, directed, weight, link_id in
+                zip(self.links_label.tolist(), self.links_directed.tolist(), self.links_weight.tolist(),
+                    self.links_id.tolist())]
+
+    # positions of the relationships of the given link labels (all if None)
+    def selected_relationships(self, relationships=None):
+        if relationships is None:
+            return slice(None)
+        link_codes = np.flatnonzero(np.isin(self.link_labels, list(relationships)))
+        return np.flatnonzero(np.isin(self.relationships, link_codes))
+
+    # the (nodes, links, original_graph, mixed_graph) of ingest.load_graphs, built from the arrays
+    def to_graphs(self, relationships=None):
+        nodes = self.nodes()
+        links = self.links()
+        if relationships is not None:
+            links = [link for link in links if link.label in relationships]
+
+        original_graph = graph.MultiDiGraph()
+        mixed_graph = MixedGraph()
+        mixed_graph.add_nodes((node.label, {'entity': node}) for node in nodes)
+
+        # one string object per label, shared by all of its edges (hashed once)
+        node_labels, link_labels = self.node_labels, self.link_labels
+
+        selected = self.selected_relationships(relationships)
+        sources, targets = self.sources[selected], self.targets[selected]
+        link_codes, weights = self.relationships[selected], self.weights[selected]
+        for start in range(0, len(sources), SNAPSHOT_BLOCK_SIZE):
+            block = slice(start, start + SNAPSHOT_BLOCK_SIZE)
+            codes = np.asarray(link_codes[block])
+            joined = pd.DataFrame({'Source': node_labels[sources[block]],
+                                   'Target': node_labels[targets[block]],
+                                   'Link': link_labels[codes],
+                                   'Directed': self.link_directed[codes],
+                                   'Weight': weights[block]})
+            ingest.add_relationships(original_graph, mixed_graph, joined)
+
+        return nodes, links, original_graph, mixed_graph
+
+    # a compact (CSR) graph straight from the arrays, without networkx
+    def to_compact(self, relationships=None):
+        selected = self.selected_relationships(relationships)
+
+        # the ID of each node code: from the first node.csv row with its label, if any
+        first_rows = np.sort(np.unique(self.nodes_label, return_index=True)[1])
+        node_ids = self.nodes_id[first_rows].tolist() + [None] * (len(self.node_labels) - len(first_rows))
+
+        return CompactGraph(self.node_labels, node_ids, self.link_labels, self.link_directed, self.link_weights,
+                            self.sources[selected], self.targets[selected], self.relationships[selected])
+
+
+# the graphs of ingest.load_graphs, through a snapshot in snapshot_directory that is
+# (re)built from the csv files when missing or out of date
+def load_graphs(snapshot_directory, node_file=ingest.NODE_FILE, link_file=ingest.LINK_FILE,
+                relationship_file=ingest.RELATIONSHIP_FILE, chunk_size=None, relationships=None):
+    if not is_current(snapshot_directory, node_file, link_file, relationship_file):
+        write_snapshot(snapshot_directory, node_file, link_file, relationship_file, chunk_size)
+    return Snapshot(snapshot_directory).to_graphs(relationships)
@@ -0,0 +1,105 @@
+# Sparse linear-algebra centralities (eigenvector, PageRank) for simple graphs and
+# for the mixed multi-digraph: parallel edges are collapsed into one weighted entry
+# of a CSR adjacency matrix, using the Link weights
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sparse
+import scipy.sparse.linalg
+
+# below this many nodes, solve the eigenproblem densely (ARPACK needs at least 3 nodes)
+DENSE_EIGENVECTOR_NODES = 100
+# a leading eigenvalue at or below this has no meaningful eigenvector (e.g. an acyclic network)
+EIGENVALUE_TOLERANCE = 1e-9
+PAGERANK_ALPHA = 0.85
+PAGERANK_TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+
+# weighted adjacency matrix (scipy csr) in node order; parallel edges have their weights summed,
+# undirected edges are entered in both directions
+def weighted_adjacency(graph_to_analyze, weight='weight'):
+    nodes = list(graph_to_analyze)
+    node_index = {node: index for index, node in enumerate(nodes)}
+
+    sources, targets, weights = [], [], []
+    for u, v, edge_weight in graph_to_analyze.edges(data=weight, default=1):
+        sources.append(node_index[u])
+        targets.append(node_index[v])
+        weights.append(edge_weight)
+        if not graph_to_analyze.is_directed() and u != v:
+            sources.append(node_index[v])
+            targets.append(node_index[u])
+            weights.append(edge_weight)
+
+    adjacency = sparse.csr_matrix((np.asarray(weights, dtype=np.float64), (sources, targets)),
+                                  shape=(len(nodes), len(nodes)))
+    adjacency.sum_duplicates()
+    return nodes, adjacency
+
+
+# eigenvector centrality: the leading left eigenvector of the adjacency matrix (a node is
+# central if it is pointed at by central nodes), normalized like networkx (unit Euclidean
+# norm, positive sum); warm_start is an optional starting vector in node order
+def eigenvector_centrality(nodes, adjacency, warm_start=None):
+    if len(nodes) == 0:
+        return {}
+
+    transposed = adjacency.T.tocsr()
+    if len(nodes) <= DENSE_EIGENVECTOR_NODES:
+        eigenvalues, eigenvectors = scipy.linalg.eig(transposed.toarray())
+        leading = np.argmax(eigenvalues.real)
+        eigenvalue, eigenvector = eigenvalues[leading], eigenvectors[:, leading]
+    else:
+        try:
+            eigenvalues, eigenvectors = scipy.sparse.linalg.eigs(transposed, k=1, which='LR', v0=warm_start,
+                                                                  maxiter=MAX_ITERATIONS)
+            eigenvalue, eigenvector = eigenvalues[0], eigenvectors[:, 0]
+        except scipy.sparse.linalg.ArpackNoConvergence:
+            eigenvalue, eigenvector = power_iteration(transposed, warm_start)
+
+    if eigenvalue.real <= EIGENVALUE_TOLERANCE:
+        return 'no dominant eigenvalue (acyclic network) for eigenvector'
+
+    eigenvector = eigenvector.real
+    norm = np.sign(eigenvector.sum()) * np.linalg.norm(eigenvector)
+    return dict(zip(nodes, (eigenvector / norm).tolist()))
+
+
+# vectorized power iteration (shifted by the identity so periodic graphs converge too)
+def power_iteration(matrix, warm_start=None):
+    vector = np.ones(matrix.shape[0]) if warm_start is None else np.asarray(warm_start, dtype=np.float64)
+    vector = vector / np.linalg.norm(vector)
+    for iteration in range(MAX_ITERATIONS):
+        next_vector = matrix @ vector + vector
+        next_vector /= np.linalg.norm(next_vector)
+        if np.abs(next_vector - vector).sum() < len(vector) * EIGENVALUE_TOLERANCE:
+            vector = next_vector
+            break
+        vector = next_vector
+
+    return vector @ (matrix @ vector), vector
+
+
+# PageRank by vectorized power iteration over the weighted adjacency matrix, with the
+# networkx conventions (dangling nodes spread their rank uniformly, L1 stopping rule);
+# warm_start is an optional starting vector in node order
+def pagerank(nodes, adjacency, alpha=PAGERANK_ALPHA, warm_start=None):
+    number_of_nodes = len(nodes)
+    if number_of_nodes == 0:
+        return {}
+
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    transition = sparse.diags(np.divide(1.0, out_weight, out=np.zeros(number_of_nodes), where=~dangling)) @ adjacency
+    transition = transition.T.tocsr()
+
+    rank = np.full(number_of_nodes, 1.0 / number_of_nodes) if warm_start is None else np.asarray(warm_start,
+                                                                                                  dtype=np.float64)
+    rank = rank / rank.sum()
+    for iteration in range(MAX_ITERATIONS):
+        previous_rank = rank
+        rank = alpha * (transition @ rank + rank[dangling].sum() / number_of_nodes) + (1 - alpha) / number_of_nodes
+        if np.abs(rank - previous_rank).sum() < number_of_nodes * PAGERANK_TOLERANCE:
+            break
+
+    return dict(zip(nodes, rank.tolist()))
@@ -0,0 +1,7 @@
+# the modules are imported flat, as main.py imports them when run from this directory
+import os
+import sys
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INPUT_DIRECTORY = os.path.join(PACKAGE_DIRECTORY, 'input')
+sys.path.insert(0, PACKAGE_DIRECTORY)
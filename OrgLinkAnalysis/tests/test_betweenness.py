@@ -0,0 +1,24 @@
+# parallel betweenness centrality against networkx, on every kind of graph it is run on
+from betweenness import parallel_betweenness_centrality
+from conftest import INPUT_DIRECTORY
+import ingest
+import networkx as graph
+import os
+import pytest
+
+
+def graphs():
+    nodes, links, original_graph, mixed_graph = ingest.load_graphs(
+        *(os.path.join(INPUT_DIRECTORY, name) for name in ('node.csv', 'link.csv', 'relationship.csv')))
+    return [graph.gnm_random_graph(60, 150, seed=1), graph.gnm_random_graph(60, 150, seed=1, directed=True),
+            mixed_graph, graph.MultiDiGraph(mixed_graph)]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('normalized', [True, False])
+def test_matches_networkx(workers, normalized):
+    for graph_to_analyze in graphs():
+        expected = graph.betweenness_centrality(graph_to_analyze, normalized=normalized)
+        betweenness = parallel_betweenness_centrality(graph_to_analyze, normalized=normalized, workers=workers)
+        assert list(betweenness) == list(expected)
+        assert betweenness == pytest.approx(expected, rel=1e-12, abs=1e-12)
@@ -0,0 +1,61 @@
+# the compact graph built from the csv inputs against the graphs of ingest.py
+from collections import Counter
+from compact import CompactGraph
+import generate
+import ingest
+import numpy as np
+import pandas as pd
+from partition import LazySubgraphs
+import pytest
+
+
+def edges(multi_graph):
+    return Counter((u, v, relationship) for u, v, relationship in multi_graph.edges(data='relationship'))
+
+
+@pytest.fixture
+def network(tmp_path):
+    files = generate.write_network(str(tmp_path), 300, average_degree=6, seed=11)
+    return files, ingest.load_graphs(*files)
+
+
+# the edges of a node may come in another order (networkx groups them by target)
+def test_from_csv_matches_from_networkx(network):
+    files, (nodes, links, original_graph, mixed_graph) = network
+    from_csv = CompactGraph.from_csv(*files)
+    from_networkx = CompactGraph.from_networkx(nodes, links, original_graph)
+    for name in ('node_labels', 'node_ids', 'link_labels', 'link_directed', 'link_weights', 'indptr'):
+        assert np.array_equal(getattr(from_csv, name), getattr(from_networkx, name)), name
+    assert sorted(zip(from_csv.sources().tolist(), from_csv.indices.tolist(), from_csv.relationship.tolist(),
+                      from_csv.weight.tolist())) == \
+        sorted(zip(from_networkx.sources().tolist(), from_networkx.indices.tolist(),
+                   from_networkx.relationship.tolist(), from_networkx.weight.tolist()))
+
+
+def test_round_trip_to_networkx(network):
+    files, (nodes, links, original_graph, mixed_graph) = network
+    compact_graph = CompactGraph.from_csv(*files)
+    assert edges(compact_graph.to_networkx()) == edges(mixed_graph)
+    assert dict(zip(compact_graph.node_labels.tolist(), compact_graph.degree().tolist())) == dict(mixed_graph.degree())
+
+    subgraphs = LazySubgraphs(original_graph, links)
+    for link in subgraphs:
+        subgraph, compact_subgraph = subgraphs[link], compact_graph.to_networkx(link)
+        assert set(compact_subgraph.nodes()) == set(subgraph.nodes())
+        if subgraph.is_directed():
+            assert set(compact_subgraph.edges()) == set(subgraph.edges())
+        else:
+            assert set(map(frozenset, compact_subgraph.edges())) == set(map(frozenset, subgraph.edges()))
+
+
+# link codes past the int16 range keep their labels
+def test_many_link_labels(tmp_path):
+    number_of_links = 40000
+    pd.DataFrame({'ID': [1, 2], 'Label': ['a', 'b']}).to_csv(tmp_path / 'node.csv', index=False)
+    pd.DataFrame({'ID': range(1, number_of_links + 1), 'Label': [f'Link {code}' for code in range(number_of_links)],
+                  'Directed': 1, 'Weight': 1}).to_csv(tmp_path / 'link.csv', index=False)
+    pd.DataFrame({'Source': ['a', 'b'], 'Target': ['b', 'a'],
+                  'Link': ['Link 39999', 'Link 5']}).to_csv(tmp_path / 'relationship.csv', index=False)
+
+    compact_graph = CompactGraph.from_csv(tmp_path / 'node.csv', tmp_path / 'link.csv', tmp_path / 'relationship.csv')
+    assert compact_graph.link_labels[compact_graph.relationship].tolist() == ['Link 39999', 'Link 5']
@@ -0,0 +1,32 @@
+# synthetic networks: reproducible by seed, with the promised link types, hubs and parallel edges
+import generate
+import ingest
+import pandas as pd
+
+
+def test_same_seed_same_network():
+    first, second = generate.generate_network(2000, seed=7), generate.generate_network(2000, seed=7)
+    for first_df, second_df in zip(first, second):
+        pd.testing.assert_frame_equal(first_df, second_df)
+    assert not generate.generate_network(2000, seed=8)[2].equals(first[2])
+
+
+def test_network_shape(tmp_path):
+    files = generate.write_network(str(tmp_path), 5000)
+    nodes, links, original_graph, mixed_graph = ingest.load_graphs(*files)
+    relationship_df = ingest.read_relationships(files[2])[0]
+
+    assert len(nodes) == 5000
+    assert set(relationship_df['Link']) == {label for label, directed, weight, share in generate.GENERATED_LINKS}
+    assert not (relationship_df['Source'] == relationship_df['Target']).any()
+
+    # about the average degree, with hubs far above it
+    degrees = [degree for node, degree in original_graph.degree()]
+    assert abs(2 * len(relationship_df) / len(nodes) - generate.AVERAGE_DEGREE) < 0.1 * generate.AVERAGE_DEGREE
+    assert max(degrees) > 10 * generate.AVERAGE_DEGREE
+
+    # pairs related more than once, each time by another link type
+    pairs = relationship_df.groupby(['Source', 'Target'])['Link']
+    repeated = pairs.size() > 1
+    assert repeated.mean() > 0.5 * generate.PARALLEL_EDGE_SHARE
+    assert (pairs.nunique() == pairs.size()).all()
@@ -0,0 +1,36 @@
+# static rendering labels only the highest-degree nodes, and edges among them, past the label limits
+import generate
+import graph_viz
+import ingest
+from layout import LayoutService
+import networkx as graph
+import pytest
+
+
+@pytest.fixture
+def drawn_axes(monkeypatch):
+    drawn = []
+    monkeypatch.setattr(graph_viz, 'save_static_figure',
+                        lambda fig, ax, *args, **kwargs: (drawn.append(ax), graph_viz.plt.close(fig)))
+    return drawn
+
+
+def test_labelled_nodes():
+    star = graph.star_graph(5)
+    assert graph_viz.labelled_nodes(star, limit=10) == set(star)
+    assert graph_viz.labelled_nodes(star, limit=1) == {0}
+
+
+def test_static_labels_capped(tmp_path, monkeypatch, drawn_axes):
+    monkeypatch.setattr(graph_viz, 'STATIC_NODE_LABEL_LIMIT', 20)
+    monkeypatch.setattr(graph_viz, 'EDGE_LABEL_LIMIT', 15)
+    files = generate.write_network(str(tmp_path), 300, average_degree=6, seed=3)
+    nodes, links, original_graph, mixed_graph = ingest.load_graphs(*files)
+    pos = LayoutService(layout_file=None).layout(graph, mixed_graph)
+
+    graph_viz.build_static_multi_network(graph, mixed_graph, 'multi-digraph', 'Mixed Graph', pos)
+    labelled = graph_viz.labelled_nodes(mixed_graph, 20)
+    texts = [text.get_text() for text in drawn_axes[-1].texts]
+    node_labels = [text for text in texts if text in labelled]
+    assert len(node_labels) == 20
+    assert len(texts) - len(node_labels) == 15
@@ -0,0 +1,113 @@
+# deltas applied by IncrementalGraphs against the graphs and metrics of a full rebuild
+from collections import Counter
+from conftest import INPUT_DIRECTORY
+import generate
+from incremental import IncrementalGraphs
+import ingest
+import networkx as graph
+import os
+import pandas as pd
+from partition import LazySubgraphs
+import pytest
+import report
+
+
+def load(directory, relationship_df):
+    relationship_file = os.path.join(directory, 'delta-relationship.csv')
+    relationship_df.to_csv(relationship_file, index=False)
+    return ingest.load_graphs(os.path.join(directory, 'node.csv'), os.path.join(directory, 'link.csv'),
+                              relationship_file)
+
+
+# the edges of a graph, an undirected one as the set of its ends
+def edges(multi_graph):
+    return Counter(((u, v) if data.get('directed', True) else frozenset((u, v)), data['relationship'])
+                   for u, v, data in multi_graph.edges(data=True))
+
+
+# the graphs and maintained metrics of incremental_graphs match those of rebuilt graphs
+def assert_rebuilt(incremental_graphs, rebuilt_graphs):
+    nodes, links, original_graph, mixed_graph = rebuilt_graphs
+    assert edges(incremental_graphs.original_graph) == edges(original_graph)
+    assert edges(incremental_graphs.mixed_graph) == edges(mixed_graph)
+    assert incremental_graphs.degree == dict(mixed_graph.degree())
+    assert +incremental_graphs.edge_counts == Counter(relationship for u, v, relationship in
+                                                      original_graph.edges(data='relationship'))
+    assert sorted(map(sorted, incremental_graphs.connected_components())) == \
+        sorted(map(sorted, graph.weakly_connected_components(mixed_graph)))
+    assert incremental_graphs.clustering() == report.compute_clustering_coefficient_multidigraph(mixed_graph)
+    assert incremental_graphs.transitivity() == report.compute_transitivity_multidigraph(mixed_graph)
+    for link in incremental_graphs.subgraphs:
+        subgraph = incremental_graphs.subgraphs[link]
+        rebuilt_subgraph = LazySubgraphs(original_graph, links)[link]
+        assert set(subgraph.nodes()) == set(rebuilt_subgraph.nodes())
+        assert {frozenset(edge) if not subgraph.is_directed() else edge for edge in subgraph.edges()} == \
+            {frozenset(edge) if not subgraph.is_directed() else edge for edge in rebuilt_subgraph.edges()}
+
+
+@pytest.fixture
+def network(tmp_path):
+    generate.write_network(str(tmp_path), 300, average_degree=6, seed=7)
+    return tmp_path, pd.read_csv(tmp_path / 'relationship.csv')
+
+
+# rows added and removed (undirected ones partly given the other way round) in several deltas
+def test_deltas_match_rebuild(network):
+    directory, relationship_df = network
+    held_out = relationship_df.sample(frac=0.2, random_state=1)
+    base_df = relationship_df.drop(held_out.index)
+    incremental_graphs = IncrementalGraphs(*load(directory, base_df))
+
+    current_df = base_df
+    for step, added_df in enumerate(held_out.groupby(pd.RangeIndex(len(held_out)) % 3)):
+        added_df = added_df[1]
+        removed_df = current_df.sample(frac=0.05, random_state=step)
+        current_df = pd.concat([current_df.drop(removed_df.index), added_df])
+
+        undirected = removed_df['Link'].isin(['Trust', 'Chat'])
+        swapped = removed_df.copy()
+        swapped.loc[undirected, ['Source', 'Target']] = removed_df.loc[undirected, ['Target', 'Source']].to_numpy()
+        assert incremental_graphs.apply_delta(added_df, swapped) == []
+        assert_rebuilt(incremental_graphs, load(directory, current_df))
+
+
+# removing every relationship leaves isolated nodes only, and adding them back restores the graphs
+def test_remove_all_and_restore(network):
+    directory, relationship_df = network
+    incremental_graphs = IncrementalGraphs(*load(directory, relationship_df))
+    incremental_graphs.apply_delta(removed_df=relationship_df)
+    assert_rebuilt(incremental_graphs, load(directory, relationship_df.iloc[:0]))
+    incremental_graphs.apply_delta(added_df=relationship_df)
+    assert_rebuilt(incremental_graphs, load(directory, relationship_df))
+
+
+# an undirected relationship is removed given either way round; rows matching nothing are returned
+def test_remove_undirected_either_way():
+    input_files = [os.path.join(INPUT_DIRECTORY, name) for name in ('node.csv', 'link.csv', 'relationship.csv')]
+    incremental_graphs = IncrementalGraphs(*ingest.load_graphs(*input_files))
+    removed_df = pd.DataFrame({'Source': ['Wilma', 'Wilma'], 'Target': ['Will', 'Alice'], 'Link': ['Chat', 'Chat']})
+    assert incremental_graphs.apply_delta(removed_df=removed_df) == [('Wilma', 'Alice', 'Chat')]
+    assert incremental_graphs.original_graph.number_of_edges() == 9
+    assert incremental_graphs.mixed_graph.number_of_edges() == 13
+    assert incremental_graphs.stale_relationships == {'Chat'}
+
+
+# self-loops and parallel relationships, added and removed one by one on the sample input
+def test_self_loops_and_parallel_relationships(tmp_path):
+    input_files = [os.path.join(INPUT_DIRECTORY, name) for name in ('node.csv', 'link.csv', 'relationship.csv')]
+    relationship_df = pd.read_csv(input_files[2])
+    for name in ('node.csv', 'link.csv'):
+        (tmp_path / name).write_text(open(os.path.join(INPUT_DIRECTORY, name)).read())
+    incremental_graphs = IncrementalGraphs(*ingest.load_graphs(*input_files))
+
+    rows = pd.DataFrame({'Source': ['Will', 'Bob', 'Will', 'Willa', 'Joe', 'Wilma'],
+                         'Target': ['Will', 'Bob', 'Wilma', 'Will', 'Joe', 'Will'],
+                         'Link': ['Advice', 'Chat', 'Chat', 'Advice', 'Trust', 'Advice']})
+    for row in range(len(rows)):
+        relationship_df = pd.concat([relationship_df, rows.iloc[[row]]], ignore_index=True)
+        incremental_graphs.apply_delta(added_df=rows.iloc[[row]])
+        assert_rebuilt(incremental_graphs, load(tmp_path, relationship_df))
+    for row in range(len(rows)):
+        relationship_df = relationship_df.drop(relationship_df.index[-1])
+        incremental_graphs.apply_delta(removed_df=rows.iloc[[len(rows) - 1 - row]])
+        assert_rebuilt(incremental_graphs, load(tmp_path, relationship_df))
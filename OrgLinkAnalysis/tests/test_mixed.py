@@ -0,0 +1,114 @@
+# the mixed graph against a plain MultiDiGraph with one edge per direction, as networkx stores
+# the relationships when each is added as edges of its own
+import generate
+import ingest
+from mixed import EdgeData, MixedGraph
+import networkx as graph
+import pickle
+import pytest
+import random
+
+CHECK_SAMPLE_SIZE = 20
+CHECK_SEED = 42
+
+
+# a plain MultiDiGraph of the relationships: an undirected one as two directed edges, added
+# right after each other, each with an attribute dict of its own
+def plain_graph(nodes, relationship_df, link_df):
+    plain = graph.MultiDiGraph()
+    plain.add_nodes_from((node.label, {'entity': node}) for node in nodes)
+    joined = ingest.join_links(relationship_df, link_df)
+    for source, target, link, directed, weight in zip(joined['Source'].tolist(), joined['Target'].tolist(),
+                                                      joined['Link'].tolist(), joined['Directed'].tolist(),
+                                                      joined['Weight'].tolist()):
+        plain.add_edge(source, target, directed=True, weight=weight, relationship=link)
+        if not directed:
+            plain.add_edge(target, source, directed=True, weight=weight, relationship=link)
+    return plain
+
+
+# the results that differ between the mixed graph and a plain graph: nodes, edges, degrees,
+# and shortest paths, betweenness and closeness centrality from sampled source nodes
+def differing_results(mixed_graph, plain, sample_size=CHECK_SAMPLE_SIZE, seed=CHECK_SEED):
+    sources = random.Random(seed).sample(list(mixed_graph), min(sample_size, len(mixed_graph)))
+    results = {
+        'nodes': lambda graph_to_check: list(graph_to_check),
+        'edges': lambda graph_to_check: [(u, v, key, dict(data)) for u, v, key, data in
+                                         graph_to_check.edges(keys=True, data=True)],
+        'degrees': lambda graph_to_check: (dict(graph_to_check.degree()), dict(graph_to_check.in_degree()),
+                                           dict(graph_to_check.out_degree()),
+                                           dict(graph_to_check.degree(weight='weight'))),
+        'shortest paths': lambda graph_to_check: [graph.single_source_shortest_path(graph_to_check, source)
+                                                  for source in sources],
+        'betweenness': lambda graph_to_check: graph.betweenness_centrality(graph_to_check, k=len(sources),
+                                                                           seed=seed),
+        'closeness': lambda graph_to_check: [graph.closeness_centrality(graph_to_check, source)
+                                             for source in sources],
+    }
+    return [name for name, result in results.items() if result(mixed_graph) != result(plain)]
+
+
+@pytest.fixture
+def network(tmp_path):
+    files = generate.write_network(str(tmp_path), 400, average_degree=6, seed=3)
+    nodes, links, original_graph, mixed_graph = ingest.load_graphs(*files)
+    relationship_df = ingest.read_relationships(files[2])[0]
+    return nodes, links, relationship_df, mixed_graph
+
+
+def test_same_results_as_plain_graph(network):
+    nodes, links, relationship_df, mixed_graph = network
+    assert differing_results(mixed_graph, plain_graph(nodes, relationship_df, ingest.link_index(links))) == []
+
+
+# both directions of an undirected relationship share one EdgeData, and pickling keeps that
+def test_edge_data_shared(network):
+    nodes, links, relationship_df, mixed_graph = network
+    for u, v, key, data in mixed_graph.edges(keys=True, data=True):
+        assert isinstance(data, EdgeData)
+        assert 'bidirectional' not in data
+    source, target = next((u, v) for u, v, data in mixed_graph.edges(data=True) if mixed_graph.has_edge(v, u))
+    with pytest.raises(TypeError):
+        mixed_graph[source][target][0]['weight'] = 0
+
+    unpickled = pickle.loads(pickle.dumps(mixed_graph))
+    assert str(unpickled) == str(mixed_graph)
+    assert [dict(data) for u, v, data in unpickled.edges(data=True)] == \
+        [dict(data) for u, v, data in mixed_graph.edges(data=True)]
+    assert len({id(data) for u, v, data in unpickled.edges(data=True)}) == \
+        len({id(data) for u, v, data in mixed_graph.edges(data=True)})
+
+
+# links added and removed one at a time keep the mixed graph equal to the plain graph
+def test_add_and_remove_links(network):
+    nodes, links, relationship_df, mixed_graph = network
+    link_df = ingest.link_index(links)
+    removed = relationship_df.sample(frac=0.3, random_state=5)
+    kept_df = relationship_df.drop(removed.index)
+
+    for source, target, link, directed in zip(removed['Source'].tolist(), removed['Target'].tolist(),
+                                              removed['Link'].tolist(),
+                                              link_df.loc[removed['Link'], 'Directed'].tolist()):
+        assert mixed_graph.remove_link(source, target, link, not directed)
+    assert not mixed_graph.remove_link(nodes[0].label, nodes[0].label, 'Trust', True)
+    plain = plain_graph(nodes, kept_df, link_df)
+    assert sorted((u, v, dict(data)['relationship']) for u, v, data in mixed_graph.edges(data=True)) == \
+        sorted((u, v, data['relationship']) for u, v, data in plain.edges(data=True))
+    assert dict(mixed_graph.degree()) == dict(plain.degree())
+
+    fresh = MixedGraph()
+    fresh.add_nodes((node.label, {'entity': node}) for node in nodes)
+    for source, target, link, directed, weight in zip(relationship_df['Source'].tolist(),
+                                                      relationship_df['Target'].tolist(),
+                                                      relationship_df['Link'].tolist(),
+                                                      link_df.loc[relationship_df['Link'], 'Directed'].tolist(),
+                                                      link_df.loc[relationship_df['Link'], 'Weight'].tolist()):
+        fresh.add_link(source, target, link, weight, not directed)
+    assert differing_results(fresh, plain_graph(nodes, relationship_df, link_df)) == []
+
+
+def test_named_as_multidigraph():
+    mixed_graph = MixedGraph()
+    mixed_graph.add_link('a', 'b', 'Trust', 5, True)
+    assert str(mixed_graph) == 'MultiDiGraph with 2 nodes and 2 edges'
+    assert type(mixed_graph.copy()) is graph.MultiDiGraph
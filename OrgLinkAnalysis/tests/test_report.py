@@ -0,0 +1,56 @@
+# families are found by name, the community overlap follows the loaded relationships, and a
+# new report starts with its preamble
+import report
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+
+    def write_section(self, *texts):
+        pass
+
+    def write_table(self, header, rows):
+        pass
+
+    def write_record(self, record):
+        self.records.append(record)
+
+
+def test_family_index():
+    for index, (section_header, report_title, analyze_function) in enumerate(report.ANALYSIS_FAMILIES):
+        assert report.family_index(report.family_name(analyze_function)) == index
+    assert report.ANALYSIS_FAMILIES[report.family_index('communities')][2] is report.analyze_communities
+
+
+def test_community_overlap_relationships(monkeypatch):
+    assert report.community_overlap_relationships(['Mentor', 'Trust']) == ['Mentor', 'Trust']
+    monkeypatch.setattr(report, 'COMMUNITY_OVERLAP_RELATIONSHIPS', ('Trust', 'Advice'))
+    assert report.community_overlap_relationships(['Mentor', 'Trust']) == ['Trust']
+
+
+def test_write_community_overlap_all_partitions():
+    partitions = {'Mentor': [{'a', 'b'}, {'c'}], 'Trust': [{'a'}, {'b', 'c'}], 'Chat': [{'a', 'b', 'c'}]}
+    sink = ListSink()
+    report.write_community_overlap(partitions, sink)
+    assert [record['networks'] for record in sink.records] == [['Mentor', 'Trust'], ['Mentor', 'Chat'],
+                                                               ['Trust', 'Chat']]
+
+    sink = ListSink()
+    report.write_community_overlap(partitions, sink, ['Chat', 'Advice', 'Trust'])
+    assert [record['networks'] for record in sink.records] == [['Chat', 'Trust']]
+
+
+# a new report starts with the written preamble; later runs append to it
+def test_new_report_starts_with_preamble(tmp_path):
+    report_file, data_file = tmp_path / 'report.org', tmp_path / 'report.jsonl'
+    with report.ReportSink(str(report_file), str(data_file)) as sink:
+        sink.write_section('** First run', '')
+    with report.ReportSink(str(report_file), str(data_file)) as sink:
+        sink.write_section('** Second run', '')
+
+    with open(report.REPORT_PREAMBLE_FILE) as preamble_file:
+        preamble = preamble_file.read()
+    text = report_file.read_text()
+    assert text.startswith(preamble) and text.count('* Theoretical Background') == 1
+    assert text.index('** First run') < text.index('** Second run')
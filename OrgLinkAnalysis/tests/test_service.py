@@ -0,0 +1,42 @@
+# the query service keeps answering when a reload fails, and samples betweenness on large networks
+import asyncio
+from conftest import INPUT_DIRECTORY
+import networkx as graph
+import report
+import service
+
+
+def test_failed_reload_keeps_graphs(monkeypatch):
+    graph_service = service.GraphService(INPUT_DIRECTORY)
+    networks = graph_service.networks
+    checks = []
+
+    def inputs_changed():
+        checks.append(True)
+        if len(checks) == 3:
+            raise asyncio.CancelledError
+        return True
+
+    def load():
+        raise ValueError('half-written input')
+
+    monkeypatch.setattr(graph_service, 'inputs_changed', inputs_changed)
+    monkeypatch.setattr(graph_service, 'load', load)
+    try:
+        asyncio.run(service.watch_inputs(graph_service, interval=0))
+    except asyncio.CancelledError:
+        pass
+    assert len(checks) == 3  # retried after the failure
+    assert graph_service.networks is networks
+
+
+def test_broker_centrality_sampled(monkeypatch):
+    path_graph = graph.path_graph(20)
+    assert service.broker_centrality(path_graph) == {'mode': 'exact',
+                                                     'betweenness': graph.betweenness_centrality(path_graph)}
+
+    monkeypatch.setattr(report, 'APPROXIMATE_CENTRALITY_NODES', 10)
+    monkeypatch.setattr(report, 'CENTRALITY_SAMPLE_SIZE', 5)
+    centrality = service.broker_centrality(path_graph)
+    assert centrality['mode'] == 'approximate' and centrality['sample size'] == 5
+    assert set(centrality['betweenness']) == set(path_graph)
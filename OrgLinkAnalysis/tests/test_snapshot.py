@@ -0,0 +1,61 @@
+# graphs read through a snapshot against those of ingest.py
+from collections import Counter
+from compact import CompactGraph
+import generate
+import ingest
+import numpy as np
+import pandas as pd
+import pytest
+import snapshot
+from snapshot import Snapshot
+
+
+def edges(multi_graph):
+    return [(u, v, key, dict(data)) for u, v, key, data in multi_graph.edges(keys=True, data=True)]
+
+
+@pytest.fixture
+def network(tmp_path):
+    files = generate.write_network(str(tmp_path / 'input'), 300, average_degree=6, seed=13)
+    return tmp_path / 'snapshot', files
+
+
+@pytest.mark.parametrize('relationships', [None, ('Trust', 'Advice')])
+def test_round_trip(network, relationships):
+    snapshot_directory, files = network
+    nodes, links, original_graph, mixed_graph = ingest.load_graphs(*files, relationships=relationships)
+    snapshot_nodes, snapshot_links, snapshot_original, snapshot_mixed = \
+        snapshot.load_graphs(str(snapshot_directory), *files, relationships=relationships)
+
+    assert [(node.label, node.get_attribute('ID')) for node in snapshot_nodes] == \
+        [(node.label, node.get_attribute('ID')) for node in nodes]
+    assert [(link.label, link.directed, link.weight) for link in snapshot_links] == \
+        [(link.label, link.directed, link.weight) for link in links]
+    assert list(snapshot_original) == list(original_graph)
+    assert edges(snapshot_original) == edges(original_graph)
+    assert list(snapshot_mixed) == list(mixed_graph)
+    assert edges(snapshot_mixed) == edges(mixed_graph)
+
+
+def test_to_compact(network):
+    snapshot_directory, files = network
+    snapshot.write_snapshot(str(snapshot_directory), *files)
+    from_snapshot = Snapshot(str(snapshot_directory)).to_compact()
+    from_csv = CompactGraph.from_csv(*files)
+    for name in CompactGraph.__slots__:
+        assert np.array_equal(getattr(from_snapshot, name), getattr(from_csv, name)), name
+
+
+# link codes past the int16 range keep their labels
+def test_many_link_labels(tmp_path):
+    number_of_links = 40000
+    pd.DataFrame({'ID': [1, 2], 'Label': ['a', 'b']}).to_csv(tmp_path / 'node.csv', index=False)
+    pd.DataFrame({'ID': range(1, number_of_links + 1), 'Label': [f'Link {code}' for code in range(number_of_links)],
+                  'Directed': 1, 'Weight': 1}).to_csv(tmp_path / 'link.csv', index=False)
+    pd.DataFrame({'Source': ['a', 'b'], 'Target': ['b', 'a'],
+                  'Link': ['Link 39999', 'Link 5']}).to_csv(tmp_path / 'relationship.csv', index=False)
+
+    nodes, links, original_graph, mixed_graph = snapshot.load_graphs(
+        str(tmp_path / 'snapshot'), tmp_path / 'node.csv', tmp_path / 'link.csv', tmp_path / 'relationship.csv')
+    assert Counter(relationship for u, v, relationship in original_graph.edges(data='relationship')) == \
+        Counter({'Link 39999': 1, 'Link 5': 1})